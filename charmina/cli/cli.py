@@ -6,7 +6,7 @@ import yaml
 from rich.console import Console
 from rich.syntax import Syntax
 from charmina.config import Config
-from charmina.cli import cli_projects, cli_runners, cli_utils
+from charmina.cli import cli_bench, cli_projects, cli_runners, cli_utils, cli_watch
 
 
 app = typer.Typer(cls=cli_utils.OrderedCommandsTyperGroup, no_args_is_help=True)
@@ -98,3 +98,16 @@ app.add_typer(
     help="Run pipeline stages: download, extract, transform and scribe",
     epilog="* Require an active project",
 )
+
+app.command(
+    "watch",
+    help="Watch the sources of the active project and run the new or changed files through extract, transform and scribe",
+    epilog="* Require an active project",
+)(cli_watch.watch_command)
+
+app.add_typer(
+    cli_bench.app,
+    name="bench",
+    help="Benchmark pipeline settings on this machine",
+    epilog="* Require an active project",
+)
@@ -0,0 +1,152 @@
+import logging
+from pathlib import Path
+from typing import List, Optional
+from typing_extensions import Annotated
+import typer
+from rich.console import Console
+from rich.table import Table
+from charmina.libs.enums import LogColors
+from charmina.config import Config
+from charmina.cli import cli_utils
+
+
+_global_config = Config.instance()
+
+_REFERENCE_CLIP_EXTENSIONS = [".mp3", ".mp4"]
+
+app = typer.Typer()
+
+
+@app.command(
+    "whisper",
+    help="Benchmark whisper transcription settings (compute type, threads, beam size and workers) and save the fastest profile in the project config",
+)
+def bench_whisper_command(
+    clip: Annotated[
+        Optional[Path],
+        typer.Argument(
+            help="Reference audio clip. If not specified, use the first audio file in the project sources"
+        ),
+    ] = None,
+    duration: Annotated[
+        float,
+        typer.Option("--duration", help="Seconds of the reference clip to transcribe"),
+    ] = 60,
+    compute_types: Annotated[
+        Optional[str],
+        typer.Option(
+            "--compute-types",
+            help="Comma-separated compute types. Default: int8,int8_float32,float32",
+        ),
+    ] = None,
+    threads: Annotated[
+        Optional[str],
+        typer.Option(
+            "--threads",
+            help="Comma-separated CPU threads per worker. Default: powers of 2 up to the CPU count",
+        ),
+    ] = None,
+    beam_sizes: Annotated[
+        Optional[str],
+        typer.Option("--beam-sizes", help="Comma-separated beam sizes. Default: 1,5"),
+    ] = None,
+    workers: Annotated[
+        Optional[str],
+        typer.Option(
+            "--workers",
+            help="Comma-separated numbers of worker processes. Default: 1,2",
+        ),
+    ] = None,
+    dry_run: cli_utils.DryRunOption = False,
+):
+    cli_utils.validate_confirm_active_project()
+
+    clip = clip or find_reference_clip()
+    if not clip or not clip.is_file():
+        logging.error(
+            "No reference clip found. Pass the path of an audio file as argument"
+        )
+        raise typer.Abort()
+
+    # Module local import (speed up CLI start time)
+    from charmina.modules.bench.whisper_bench import WhisperBench
+
+    project_config = _global_config.get_project_config()
+    bench = WhisperBench(
+        model_name=(project_config["transform"] or {}).get("model_name"),
+        compute_types=split_values(compute_types),
+        cpu_threads=split_values(threads, int),
+        beam_sizes=split_values(beam_sizes, int),
+        workers=split_values(workers, int),
+    )
+
+    typer.echo(
+        f"\nBenchmarking {len(bench.get_profiles())} profiles with {LogColors.URL}{clip}{LogColors.ENDC}"
+    )
+    tqdm_holder = cli_utils.TqdmHolder(desc="Completed", ncols=80)
+    bench.on("start", tqdm_holder.start)
+    bench.on("update", tqdm_holder.update)
+    bench.on("write", tqdm_holder.write)
+    bench.on("close", tqdm_holder.close)
+
+    try:
+        results, errors = bench.run(clip_path=str(clip), duration=duration)
+    except Exception as e:
+        logging.error("Unexpected error benchmarking whisper")
+        raise e
+
+    tqdm_holder.close()
+
+    if len(errors) > 0:
+        logging.error(
+            "Errors occurred while benchmarking whisper. Last error:\n",
+            exc_info=errors[-1],
+        )
+
+    if not results:
+        return
+
+    table = Table("compute_type", "threads", "beam_size", "workers", "RTF")
+    for result in results:
+        table.add_row(
+            result.compute_type,
+            str(result.cpu_threads),
+            str(result.beam_size),
+            str(result.workers),
+            f"{result.rtf:.3f}",
+        )
+    Console().print(table)
+
+    best_transform_config = results[0].get_transform_config()
+    if dry_run:
+        typer.echo(f"\n[Dry run] Fastest profile: {best_transform_config}")
+        return
+
+    config_file_path = Config.update_project_config(
+        _global_config.get_project_base_path(),
+        section="transform",
+        values=best_transform_config,
+    )
+    typer.echo(
+        f"\nFastest profile {best_transform_config} saved in {LogColors.URL}{config_file_path}{LogColors.ENDC}"
+    )
+
+
+def find_reference_clip() -> Path | None:
+    """First audio file in the sources of the active project."""
+    project_source_documents_path = Path(
+        _global_config.get_project_base_path(),
+        Config._PROJECT_SOURCE_DOCUMENTS_DIRECTORYNAME,
+    )
+    for file_path in sorted(project_source_documents_path.rglob("*")):
+        if file_path.suffix.lower() in _REFERENCE_CLIP_EXTENSIONS:
+            return file_path
+
+    return None
+
+
+def split_values(values: str | None, value_type: type = str) -> List | None:
+    if not values:
+        return None
+
+    return [value_type(value.strip()) for value in values.split(",") if value.strip()]
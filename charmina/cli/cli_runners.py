@@ -1,9 +1,16 @@
+import time
 import logging
 from pathlib import Path
+from contextlib import nullcontext
+from typing import List
 import typer
+from typing_extensions import Annotated
 from charmina.libs.enums import LogColors
 from charmina.config import Config
 from charmina.libs.helpers import get_filtered_directories
+from charmina.libs.build_manifest import BuildManifest
+from charmina.libs.source_index import SourceIndex
+from charmina.libs.work_queue import WorkQueue
 from charmina.cli import cli_utils
 
 
@@ -110,9 +117,12 @@ def run_extract_command(
             Config._PROJECT_SOURCE_DOCUMENTS_DIRECTORYNAME,
         )
 
+        # Walk the sources once (cached listing, reused by the runner)
+        source_index = SourceIndex(project_source_documents_path)
         source_directories = get_filtered_directories(
             directory_filter=directory_filter,
             base_path=project_source_documents_path,
+            source_index=source_index,
         )
 
         if not source_directories:
@@ -131,38 +141,43 @@ def run_extract_command(
             **project_config["extract"],
         )
 
-        for source_directory in source_directories:
-            typer.echo(
-                f"\nExtracting {LogColors.URL}{source_directory}{LogColors.ENDC}"
-            )
-            tqdm_holder = cli_utils.TqdmHolder(desc="Completed", ncols=80)
-            runner.on("start", tqdm_holder.start)
-            runner.on("update", tqdm_holder.update)
-            runner.on("write", tqdm_holder.write)
-            runner.on("close", tqdm_holder.close)
-
-            results, errors = runner.run(
-                source_directory=str(source_directory),
-                source_root_path=Path(
-                    _global_config.get_project_base_path(),
-                    Config._PROJECT_SOURCE_DOCUMENTS_DIRECTORYNAME,
-                ),
-                dry_run=dry_run,
-                limit=limit,
-                overwrite=overwrite,
-            )
-
-            tqdm_holder.close()
-            typer.echo(
-                f"\n{'[Dry run] ' if dry_run else ''}{len(results)} files extracted successfully with {len(errors)} errors...."
-            )
+        with cli_utils.open_project_manifest(
+            _global_config.get_project_base_path()
+        ) as manifest:
+            for source_directory in source_directories:
+                typer.echo(
+                    f"\nExtracting {LogColors.URL}{source_directory}{LogColors.ENDC}"
+                )
+                tqdm_holder = cli_utils.TqdmHolder(desc="Completed", ncols=80)
+                runner.on("start", tqdm_holder.start)
+                runner.on("update", tqdm_holder.update)
+                runner.on("write", tqdm_holder.write)
+                runner.on("close", tqdm_holder.close)
+
+                results, errors = runner.run(
+                    source_directory=str(source_directory),
+                    source_root_path=Path(
+                        _global_config.get_project_base_path(),
+                        Config._PROJECT_SOURCE_DOCUMENTS_DIRECTORYNAME,
+                    ),
+                    dry_run=dry_run,
+                    limit=limit,
+                    overwrite=overwrite,
+                    manifest=manifest,
+                    source_index=source_index,
+                )
 
-            if len(errors) > 0:
-                logging.error(
-                    "Errors occurred while extracting source files. Last error:\n",
-                    exc_info=errors[-1],
+                tqdm_holder.close()
+                typer.echo(
+                    f"\n{'[Dry run] ' if dry_run else ''}{len(results)} files extracted successfully with {len(errors)} errors...."
                 )
 
+                if len(errors) > 0:
+                    logging.error(
+                        "Errors occurred while extracting source files. Last error:\n",
+                        exc_info=errors[-1],
+                    )
+
     except Exception as e:
         logging.error("Unexpected error extracting source files")
         raise e
@@ -180,18 +195,32 @@ def run_transform_command(
     dry_run: cli_utils.DryRunOption = False,
     limit: cli_utils.LimitOption = None,
     overwrite: cli_utils.OverwriteOption = False,
+    workers: cli_utils.WorkersOption = None,
+    order: cli_utils.OrderOption = None,
+    worker: Annotated[
+        bool,
+        typer.Option(
+            "--worker",
+            help="Run as a worker node sharing the project directory: claim the files with leases (skip the files of other nodes) until no file is pending",
+        ),
+    ] = False,
 ):
     cli_utils.validate_confirm_active_project()
 
+    runner = None
+    interrupted = False
     try:
         project_source_documents_path = Path(
             _global_config.get_project_base_path(),
             Config._PROJECT_SOURCE_DOCUMENTS_DIRECTORYNAME,
         )
 
+        # Walk the sources once (cached listing, reused by the runner)
+        source_index = SourceIndex(project_source_documents_path)
         source_directories = get_filtered_directories(
             directory_filter=directory_filter,
             base_path=project_source_documents_path,
+            source_index=source_index,
         )
 
         if not source_directories:
@@ -204,47 +233,117 @@ def run_transform_command(
         from charmina.modules.transform.transform_runner import TransformRunner
 
         project_config = _global_config.get_project_config()
+        transform_config = dict(project_config["transform"] or {})
+        if workers:
+            transform_config["workers"] = workers
+        if order:
+            transform_config["order"] = order
+
+        # Workers keep the pools between passes (warm models)
         runner = TransformRunner(
-            **project_config["transform"],
+            **transform_config,
+            persistent_workers=worker,
         )
-
-        for source_directory in source_directories:
-            typer.echo(
-                f"\nTransforming {LogColors.URL}{source_directory}{LogColors.ENDC}"
-            )
-            tqdm_holder = cli_utils.TqdmHolder(desc="Completed", ncols=80)
-            runner.on("start", tqdm_holder.start)
-            runner.on("update", tqdm_holder.update)
-            runner.on("write", tqdm_holder.write)
-            runner.on("close", tqdm_holder.close)
-
-            results, errors = runner.run(
-                source_directory=str(source_directory),
-                source_root_path=Path(
+        tqdm_holder = cli_utils.TqdmHolder(desc="Completed", ncols=80)
+        runner.on("start", tqdm_holder.start)
+        runner.on("update", tqdm_holder.update)
+        runner.on("write", tqdm_holder.write)
+        runner.on("close", tqdm_holder.close)
+
+        work_queue = (
+            WorkQueue(
+                Path(
                     _global_config.get_project_base_path(),
-                    Config._PROJECT_SOURCE_DOCUMENTS_DIRECTORYNAME,
-                ),
-                dry_run=dry_run,
-                limit=limit,
-                overwrite=overwrite,
-            )
-
-            tqdm_holder.close()
-            typer.echo(
-                f"\n{'[Dry run] ' if dry_run else ''}{len(results)} files transformed successfully with {len(errors)} errors...."
+                    Config._PROJECT_LEASES_DIRECTORYNAME,
+                )
             )
+            if worker and not dry_run
+            else None
+        )
 
-            if len(errors) > 0:
-                logging.error(
-                    "Errors occurred while transforming source files. Last error:\n",
-                    exc_info=errors[-1],
+        with cli_utils.open_project_manifest(
+            _global_config.get_project_base_path(), node_local=work_queue is not None
+        ) as manifest, work_queue or nullcontext():
+            if work_queue is not None:
+                typer.echo(f"Running as worker node {work_queue.node_id}")
+
+            while True:
+                claimed_count = work_queue.claimed_count if work_queue else 0
+                _run_transform_directories(
+                    runner,
+                    tqdm_holder,
+                    source_directories,
+                    dry_run=dry_run,
+                    limit=limit,
+                    overwrite=overwrite,
+                    manifest=manifest,
+                    source_index=source_index,
+                    work_queue=work_queue,
                 )
+                if work_queue is None:
+                    break
+
+                # Pass without claims: wait for the files of the other nodes (their leases may expire)
+                if work_queue.claimed_count == claimed_count:
+                    if not work_queue.has_active_leases("transform"):
+                        break
+                    time.sleep(work_queue.lease_seconds / 3)
+
+                # Find the files added meanwhile
+                source_index.scan()
 
     except Exception as e:
         logging.error("Unexpected error transforming source files")
         raise e
     except SystemExit:
         raise typer.Abort()
+    except KeyboardInterrupt:
+        interrupted = True
+        raise
+    finally:
+        if runner is not None:
+            # Stop the running transformations when interrupted
+            runner.close(cancel=interrupted)
+
+
+def _run_transform_directories(
+    runner,
+    tqdm_holder: cli_utils.TqdmHolder,
+    source_directories: List[Path],
+    dry_run: bool,
+    limit: int,
+    overwrite: bool,
+    manifest: BuildManifest,
+    source_index: SourceIndex,
+    work_queue: WorkQueue = None,
+):
+    for source_directory in source_directories:
+        typer.echo(f"\nTransforming {LogColors.URL}{source_directory}{LogColors.ENDC}")
+
+        results, errors = runner.run(
+            source_directory=str(source_directory),
+            source_root_path=Path(
+                _global_config.get_project_base_path(),
+                Config._PROJECT_SOURCE_DOCUMENTS_DIRECTORYNAME,
+            ),
+            dry_run=dry_run,
+            limit=limit,
+            overwrite=overwrite,
+            manifest=manifest,
+            source_index=source_index,
+            work_queue=work_queue,
+        )
+
+        tqdm_holder.close()
+        typer.echo(
+            f"\n{'[Dry run] ' if dry_run else ''}{len(results)} files transformed successfully with {len(errors)} errors...."
+        )
+
+        if len(errors) > 0:
+            logging.error(
+                "Errors occurred while transforming source files. Last error:\n",
+                exc_info=errors[-1],
+            )
 
 
 @app.command(
@@ -266,9 +365,12 @@ def run_scribe_command(
             Config._PROJECT_SOURCE_DOCUMENTS_DIRECTORYNAME,
         )
 
+        # Walk the sources once (cached listing, reused by the runner)
+        source_index = SourceIndex(project_source_documents_path)
         source_directories = get_filtered_directories(
             directory_filter=directory_filter,
             base_path=project_source_documents_path,
+            source_index=source_index,
         )
 
         if not source_directories:
@@ -286,42 +388,169 @@ def run_scribe_command(
             **project_config["scribe"],
         )
 
-        for source_directory in source_directories:
-            typer.echo(f"\nScribing {LogColors.URL}{source_directory}{LogColors.ENDC}")
-            tqdm_holder = cli_utils.TqdmHolder(desc="Completed", ncols=80)
-            runner.on("start", tqdm_holder.start)
-            runner.on("update", tqdm_holder.update)
-            runner.on("write", tqdm_holder.write)
-            runner.on("close", tqdm_holder.close)
-
-            results, errors = runner.run(
-                source_directory=str(source_directory),
-                source_root_path=Path(
-                    _global_config.get_project_base_path(),
-                    Config._PROJECT_SOURCE_DOCUMENTS_DIRECTORYNAME,
-                ),
-                output_root_path=Path(
-                    _global_config.get_project_base_path(),
-                    Config._PROJECT_OUTPUT_DOCUMENTS_DIRECTORYNAME,
-                ),
-                dry_run=dry_run,
-                limit=limit,
-                overwrite=overwrite,
-            )
+        with cli_utils.open_project_manifest(
+            _global_config.get_project_base_path()
+        ) as manifest:
+            for source_directory in source_directories:
+                typer.echo(
+                    f"\nScribing {LogColors.URL}{source_directory}{LogColors.ENDC}"
+                )
+                tqdm_holder = cli_utils.TqdmHolder(desc="Completed", ncols=80)
+                runner.on("start", tqdm_holder.start)
+                runner.on("update", tqdm_holder.update)
+                runner.on("write", tqdm_holder.write)
+                runner.on("close", tqdm_holder.close)
+
+                results, errors = runner.run(
+                    source_directory=str(source_directory),
+                    source_root_path=Path(
+                        _global_config.get_project_base_path(),
+                        Config._PROJECT_SOURCE_DOCUMENTS_DIRECTORYNAME,
+                    ),
+                    output_root_path=Path(
+                        _global_config.get_project_base_path(),
+                        Config._PROJECT_OUTPUT_DOCUMENTS_DIRECTORYNAME,
+                    ),
+                    dry_run=dry_run,
+                    limit=limit,
+                    overwrite=overwrite,
+                    manifest=manifest,
+                    source_index=source_index,
+                )
 
-            tqdm_holder.close()
-            typer.echo(
-                f"\n{'[Dry run] ' if dry_run else ''}{len(results)} files scribed successfully with {len(errors)} errors...."
+                tqdm_holder.close()
+                typer.echo(
+                    f"\n{'[Dry run] ' if dry_run else ''}{len(results)} files scribed successfully with {len(errors)} errors...."
+                )
+
+                if len(errors) > 0:
+                    logging.error(
+                        "Errors occurred while scribing source files. Last error:\n",
+                        exc_info=errors[-1],
+                    )
+
+    except Exception as e:
+        logging.error("Unexpected error scribing source files")
+        raise e
+    except SystemExit:
+        raise typer.Abort()
+
+
+@app.command(
+    "all",
+    help="Run extract, transform and scribe file by file, writing the final files (.md) as soon as each source is transformed",
+)
+def run_all_command(
+    directory_filter: cli_utils.DirectoryFilterArgument = None,
+    limit: cli_utils.LimitOption = None,
+    overwrite: cli_utils.OverwriteOption = False,
+    workers: cli_utils.WorkersOption = None,
+    queue_size: Annotated[
+        int,
+        typer.Option(
+            "--queue-size",
+            help="Maximum number of files waiting or running in each stage",
+        ),
+    ] = None,
+):
+    cli_utils.validate_confirm_active_project()
+
+    transform_runner = None
+    interrupted = False
+    try:
+        project_source_documents_path = Path(
+            _global_config.get_project_base_path(),
+            Config._PROJECT_SOURCE_DOCUMENTS_DIRECTORYNAME,
+        )
+
+        # Walk the sources once (cached listing, reused by the runner)
+        source_index = SourceIndex(project_source_documents_path)
+        source_directories = get_filtered_directories(
+            directory_filter=directory_filter,
+            base_path=project_source_documents_path,
+            source_index=source_index,
+        )
+
+        if not source_directories:
+            logging.warning(
+                f"No source directories found matching the filter '{directory_filter}'"
             )
+            return
 
-            if len(errors) > 0:
-                logging.error(
-                    "Errors occurred while scribing source files. Last error:\n",
-                    exc_info=errors[-1],
+        # Module local import (speed up CLI start time)
+        from charmina.modules.extract.extract_runner import ExtractRunner
+        from charmina.modules.transform.transform_runner import TransformRunner
+        from charmina.modules.scribe.scribe_runner import ScribeRunner
+        from charmina.modules.pipeline.pipeline_runner import PipelineRunner
+
+        project_config = _global_config.get_project_config()
+        transform_config = dict(project_config["transform"] or {})
+        if workers:
+            transform_config["workers"] = workers
+
+        # Keep the worker pools between directories (warm models)
+        transform_runner = TransformRunner(**transform_config, persistent_workers=True)
+        runner = PipelineRunner(
+            extract_runner=ExtractRunner(
+                prompts=project_config["prompts"],
+                openai=project_config["openai"],
+                **project_config["extract"],
+            ),
+            transform_runner=transform_runner,
+            scribe_runner=ScribeRunner(
+                templates=project_config["templates"],
+                **project_config["scribe"],
+            ),
+            queue_size=queue_size,
+        )
+
+        tqdm_holder = cli_utils.TqdmHolder(desc="Completed", ncols=80)
+        runner.on("start", tqdm_holder.start)
+        runner.on("update", tqdm_holder.update)
+        runner.on("write", tqdm_holder.write)
+        runner.on("close", tqdm_holder.close)
+
+        with cli_utils.open_project_manifest(
+            _global_config.get_project_base_path()
+        ) as manifest:
+            for source_directory in source_directories:
+                typer.echo(
+                    f"\nProcessing {LogColors.URL}{source_directory}{LogColors.ENDC}"
                 )
 
+                results, errors = runner.run(
+                    source_directory=str(source_directory),
+                    source_root_path=project_source_documents_path,
+                    output_root_path=Path(
+                        _global_config.get_project_base_path(),
+                        Config._PROJECT_OUTPUT_DOCUMENTS_DIRECTORYNAME,
+                    ),
+                    limit=limit,
+                    overwrite=overwrite,
+                    manifest=manifest,
+                    source_index=source_index,
+                )
+
+                tqdm_holder.close()
+                typer.echo(
+                    f"\n{len(results)} files scribed successfully with {len(errors)} errors...."
+                )
+
+                if len(errors) > 0:
+                    logging.error(
+                        "Errors occurred while processing source files. Last error:\n",
+                        exc_info=errors[-1],
+                    )
+
     except Exception as e:
-        logging.error("Unexpected error scribing source files")
+        logging.error("Unexpected error processing source files")
         raise e
     except SystemExit:
         raise typer.Abort()
+    except KeyboardInterrupt:
+        interrupted = True
+        raise
+    finally:
+        if transform_runner is not None:
+            # Stop the running transformations when interrupted
+            transform_runner.close(cancel=interrupted)
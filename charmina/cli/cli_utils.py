@@ -1,3 +1,8 @@
+import os
+import socket
+import hashlib
+import logging
+import tempfile
 from pathlib import Path
 from typing import Optional
 from typing_extensions import Annotated
@@ -7,6 +12,7 @@ from click import Context
 from tqdm import tqdm
 from charmina.libs.enums import DownloadSourceEnum, LogColors
 from charmina.config import Config
+from charmina.libs.build_manifest import BuildManifest
 
 
 _global_config = Config.instance()
@@ -28,7 +34,25 @@ LimitOption = Annotated[
     typer.Option(
         "--limit",
         "-l",
-        help="Limit the maximum number of items to process per run. If not specified, use default limit of 1000 items.",
+        help="Limit the maximum number of items to process per run. If not specified, process all the items.",
+    ),
+]
+
+
+WorkersOption = Annotated[
+    Optional[int],
+    typer.Option(
+        "--workers",
+        help="Number of worker processes to run in parallel. If not specified, use the project config value.",
+    ),
+]
+
+
+OrderOption = Annotated[
+    Optional[str],
+    typer.Option(
+        "--order",
+        help="Order of the files by estimated cost: none, lpt (longest first) or spt (shortest first). If not specified, use the project config value.",
     ),
 ]
 
@@ -167,6 +191,52 @@ def prompt_active_project(active_project: str, project_base_path: Path):
         )
 
 
+def open_project_manifest(project_base_path: Path, node_local: bool = False):
+    """
+    Open the build manifest of a project. Worker nodes keep it on their local disk (SQLite isn't
+    safe over NFS) and share the processed files with the other nodes through the entries files.
+
+    The database of a node is named by project and host name (the cache directory may be shared
+    too). When the cache directory is on the filesystem of the project (ie: the default relative
+    one, with the project on NFS), it's kept in the temporary directory of the node instead.
+    """
+    project_base_path = Path(project_base_path).absolute()
+    if node_local:
+        manifests_path = Path(Config.instance().CACHE_DIRECTORY_PATH, "manifests")
+        manifests_path = manifests_path.absolute()
+        if _get_device(manifests_path) == _get_device(project_base_path):
+            local_manifests_path = Path(
+                tempfile.gettempdir(),
+                f"charmina-{os.getuid()}" if hasattr(os, "getuid") else "charmina",
+                "manifests",
+            )
+            logging.warning(
+                f"Cache directory {manifests_path} is on the project filesystem (may be shared"
+                f" between nodes). Keeping the manifest of the node in {local_manifests_path}"
+            )
+            manifests_path = local_manifests_path
+
+        project_hash = hashlib.sha256(str(project_base_path).encode()).hexdigest()
+        database_path = manifests_path / f"{project_hash}-{socket.gethostname()}.db"
+    else:
+        database_path = project_base_path / Config._PROJECT_MANIFEST_FILENAME
+
+    return BuildManifest(
+        database_path,
+        base_path=project_base_path,
+        shared_directory_path=project_base_path
+        / Config._PROJECT_MANIFEST_ENTRIES_DIRECTORYNAME,
+    )
+
+
+def _get_device(path: Path) -> int:
+    """Device of the filesystem of a path (of its nearest existing parent)."""
+    while not path.exists() and path.parent != path:
+        path = path.parent
+
+    return os.stat(path).st_dev
+
+
 def grep_match(pattern: str, *args):
     """
     Returns True if a pattern matches any of the args values (in a case-insensitive manner)
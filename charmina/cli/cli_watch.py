@@ -0,0 +1,188 @@
+import os
+import time
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+from typing_extensions import Annotated
+import typer
+from charmina.libs.enums import LogColors
+from charmina.config import Config
+from charmina.libs.build_manifest import BuildManifest
+from charmina.cli import cli_runners, cli_utils
+
+
+_global_config = Config.instance()
+
+_WATCH_INTERVAL = 1.0  # Seconds between checks of the ready files
+
+
+def watch_command(
+    debounce: Annotated[
+        float,
+        typer.Option(
+            "--debounce",
+            help="Seconds without changes before a file is processed (ie: files being written)",
+        ),
+    ] = 5,
+    download: Annotated[
+        bool,
+        typer.Option(
+            "--download/--no-download",
+            help="Download the new audios when youtube.sources or podcast.sources change",
+        ),
+    ] = True,
+    workers: cli_utils.WorkersOption = None,
+):
+    cli_utils.validate_confirm_active_project()
+
+    # Module local imports (speed up CLI start time)
+    from charmina.libs.source_watcher import SourceWatcher
+    from charmina.modules.extract.extract_runner import ExtractRunner
+    from charmina.modules.transform.transform_runner import TransformRunner
+    from charmina.modules.scribe.scribe_runner import ScribeRunner
+    from charmina.modules.pipeline.pipeline_runner import PipelineRunner
+
+    project_base_path = Path(_global_config.get_project_base_path())
+    source_root_path = (
+        project_base_path / Config._PROJECT_SOURCE_DOCUMENTS_DIRECTORYNAME
+    )
+    output_root_path = (
+        project_base_path / Config._PROJECT_OUTPUT_DOCUMENTS_DIRECTORYNAME
+    )
+    source_root_path.mkdir(parents=True, exist_ok=True)
+
+    project_config = _global_config.get_project_config()
+    transform_config = dict(project_config["transform"] or {})
+    if workers:
+        transform_config["workers"] = workers
+
+    extract_runner = ExtractRunner(
+        prompts=project_config["prompts"],
+        openai=project_config["openai"],
+        **project_config["extract"],
+    )
+    # Keep the worker pools between batches (warm models)
+    transform_runner = TransformRunner(**transform_config, persistent_workers=True)
+    scribe_runner = ScribeRunner(
+        templates=project_config["templates"],
+        **project_config["scribe"],
+    )
+    runner = PipelineRunner(
+        extract_runner=extract_runner,
+        transform_runner=transform_runner,
+        scribe_runner=scribe_runner,
+    )
+    runner.on("write", _write)
+
+    sources_file_paths = [
+        project_base_path / Config._YOUTUBE_SOURCES_FILENAME,
+        project_base_path / Config._PODCAST_SOURCES_FILENAME,
+    ]
+    sources_signatures = _get_signatures(sources_file_paths)
+
+    watcher = SourceWatcher(
+        root_path=source_root_path,
+        extensions=ExtractRunner.get_source_extensions(),
+        debounce_seconds=debounce,
+    )
+
+    interrupted = False
+    try:
+        with cli_utils.open_project_manifest(project_base_path) as manifest, watcher:
+            # Catch up with the files added while not watching
+            typer.echo(
+                f"\nProcessing pending files of {LogColors.URL}{source_root_path}{LogColors.ENDC}"
+            )
+            _run_pipeline(
+                runner,
+                manifest=manifest,
+                source_root_path=source_root_path,
+                output_root_path=output_root_path,
+            )
+
+            typer.echo(
+                f"\nWatching {LogColors.URL}{source_root_path}{LogColors.ENDC} (Ctrl+C to stop)"
+            )
+            while True:
+                time.sleep(_WATCH_INTERVAL)
+
+                # Download the new entries of the sources files (the audios are watched)
+                current_sources_signatures = _get_signatures(sources_file_paths)
+                if download and current_sources_signatures != sources_signatures:
+                    time.sleep(debounce)
+                    current_sources_signatures = _get_signatures(sources_file_paths)
+                    try:
+                        cli_runners.run_download_command()
+                    except Exception as e:
+                        # Keep watching (downloaded again on the next change of the sources)
+                        logging.error(
+                            "Error downloading the new audios. Still watching",
+                            exc_info=e,
+                        )
+                sources_signatures = current_sources_signatures
+
+                ready_files = watcher.get_ready_files()
+                if not ready_files:
+                    continue
+
+                typer.echo(f"\nProcessing {len(ready_files)} new or changed files")
+                _run_pipeline(
+                    runner,
+                    manifest=manifest,
+                    source_root_path=source_root_path,
+                    output_root_path=output_root_path,
+                    source_files=ready_files,
+                )
+    except KeyboardInterrupt:
+        interrupted = True
+        typer.echo("\nStopped watching")
+    except Exception as e:
+        logging.error("Unexpected error watching source files")
+        raise e
+    finally:
+        # Stop the running transformations when interrupted
+        transform_runner.close(cancel=interrupted)
+
+
+def _run_pipeline(
+    runner,
+    manifest: BuildManifest,
+    source_root_path: Path,
+    output_root_path: Path,
+    source_files: List[str] = None,
+):
+    """Run the files through extract, transform and scribe (all the sources if no files)."""
+    results, errors = runner.run(
+        source_directory=None if source_files else str(source_root_path),
+        source_files=source_files,
+        source_root_path=source_root_path,
+        output_root_path=output_root_path,
+        manifest=manifest,
+    )
+    if results or errors:
+        typer.echo(
+            f"{len(results)} files processed successfully with {len(errors)} errors"
+        )
+    if errors:
+        logging.error(
+            "Errors occurred while processing source files. Last error:\n",
+            exc_info=errors[-1],
+        )
+
+
+def _write(text: str = "", is_error: bool = False):
+    if is_error:
+        typer.echo(f"\033[31m\033[91m✘ {text}\033[0m")
+    elif text:
+        typer.echo(f"\033[2m✔ {text}\033[0m")
+
+
+def _get_signatures(file_paths: List[Path]) -> Dict[str, Optional[int]]:
+    signatures = {}
+    for file_path in file_paths:
+        try:
+            signatures[str(file_path)] = os.stat(file_path).st_mtime_ns
+        except FileNotFoundError:
+            signatures[str(file_path)] = None
+
+    return signatures
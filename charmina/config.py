@@ -1,5 +1,6 @@
 # Config consts
 import os
+import re
 from pathlib import Path
 from typing import Any, Dict, Optional, List, Union, ClassVar
 from dotenv import load_dotenv
@@ -32,6 +33,15 @@ class Config(object):
     _PROJECT_CONFIG_PROMPTS_FILENAME: ClassVar[str] = (
         "charmina.prompts.yml"  # Name of the project config prompts file
     )
+    _PROJECT_MANIFEST_FILENAME: ClassVar[str] = (
+        ".charmina.manifest.db"  # Name of the project build manifest (processed files of each stage)
+    )
+    _PROJECT_LEASES_DIRECTORYNAME: ClassVar[str] = (
+        ".charmina.leases"  # Name of the project leases directory (files claimed by worker nodes)
+    )
+    _PROJECT_MANIFEST_ENTRIES_DIRECTORYNAME: ClassVar[str] = (
+        ".charmina.manifest.entries"  # Name of the project manifest entries shared by the nodes
+    )
     _YOUTUBE_SOURCES_FILENAME: ClassVar[str] = (
         "youtube.sources"  # Name of the youtube sources file
     )
@@ -56,6 +66,18 @@ class Config(object):
     VERBOSE: int = (
         1  # (Default: 1) Amount of logs written to stdout (0: none, 1: medium, 2: full)
     )
+    CACHE_DIRECTORY_PATH: str = (
+        ".charmina_cache"  # (Default: ".charmina_cache") Path to cache directory (decoded audios, etc)
+    )
+    AUDIO_CACHE_MAX_SIZE_MB: int = (
+        4096  # (Default: 4096) Maximum size in MB of the decoded audios cache. Set 0 to disable the cache
+    )
+    TRANSCRIPTION_CACHE_MAX_SIZE_MB: int = (
+        1024  # (Default: 1024) Maximum size in MB of the transcripts cache. Set 0 to disable the cache
+    )
+    PDF_PAGE_CACHE_MAX_SIZE_MB: int = (
+        512  # (Default: 512) Maximum size in MB of the converted PDF pages cache. Set 0 to disable the cache
+    )
     OPENAI_API_KEY: str = ""  # (Required) OpenAI API key
     OPENAI_ORG_ID: str = ""  # (Required) OpenAI organization ID
     # OCR_ENGINE: Optional[Literal["surya", "ocrmypdf"]] = None  # (Default: None) OCR engine to use for PDFs
@@ -141,6 +163,15 @@ class Config(object):
 
             # fix types
             cls._instance.VERBOSE = int(cls._instance.VERBOSE)
+            cls._instance.AUDIO_CACHE_MAX_SIZE_MB = int(
+                cls._instance.AUDIO_CACHE_MAX_SIZE_MB
+            )
+            cls._instance.TRANSCRIPTION_CACHE_MAX_SIZE_MB = int(
+                cls._instance.TRANSCRIPTION_CACHE_MAX_SIZE_MB
+            )
+            cls._instance.PDF_PAGE_CACHE_MAX_SIZE_MB = int(
+                cls._instance.PDF_PAGE_CACHE_MAX_SIZE_MB
+            )
             cls._instance.YOUTUBE_GROUP_BY_AUTHOR = bool(
                 cls._instance.YOUTUBE_GROUP_BY_AUTHOR
             )
@@ -352,6 +383,102 @@ class Config(object):
 
         return project_config
 
+    @classmethod
+    def update_project_config(
+        cls,
+        directory_path: Union[Path, str],
+        section: str,
+        values: Dict[str, Any],
+    ) -> Path:
+        """
+        Update the values of a section in the project config file. Only the lines of the updated
+        values are rewritten (keep the comments and the layout of the file), the section is added
+        at the end of the file when missing.
+        """
+        config_file_path = Path(directory_path) / cls._PROJECT_CONFIG_FILENAME
+
+        try:
+            with open(config_file_path) as config_file_handler:
+                lines = config_file_handler.read().splitlines()
+        except FileNotFoundError:
+            lines = []
+
+        lines = cls._update_section_lines(lines, section, values)
+        with open(config_file_path, "w") as config_file_handler:
+            config_file_handler.write("\n".join(lines) + "\n")
+
+        return config_file_path
+
+    @classmethod
+    def _update_section_lines(
+        cls, lines: List[str], section: str, values: Dict[str, Any]
+    ) -> List[str]:
+        """Set the values of a top-level section in the lines of a YAML file."""
+
+        def dump(data: Dict[str, Any], indent: str = "") -> List[str]:
+            return [
+                f"{indent}{line}"
+                for line in yaml.safe_dump(
+                    data, default_flow_style=False, sort_keys=False, width=float("inf")
+                ).splitlines()
+            ]
+
+        section_pattern = re.compile(rf"^{re.escape(section)}\s*:(?P<value>.*)$")
+        start = next(
+            (i for i, line in enumerate(lines) if section_pattern.match(line)), None
+        )
+        if start is None:
+            while lines and not lines[-1].strip():
+                lines = lines[:-1]
+            return lines + ([""] if lines else []) + dump({section: values})
+
+        # The section ends at the next top-level line (the comments before it belong to it)
+        end = start + 1
+        while end < len(lines) and (
+            not lines[end].strip() or lines[end].startswith((" ", "\t", "#"))
+        ):
+            end += 1
+        while end > start + 1 and (
+            not lines[end - 1].strip() or lines[end - 1].startswith("#")
+        ):
+            end -= 1
+
+        section_lines = lines[start + 1 : end]
+        section_value = section_pattern.match(lines[start]).group("value")
+        current_values = yaml.safe_load("\n".join(lines[start:end])) or {}
+        current_values = current_values.get(section)
+        # Rewrite the whole section when its values can't be edited line by line (ie: inline)
+        if not isinstance(current_values, dict) or (
+            section_value.split("#")[0].strip()
+            or any(isinstance(value, (dict, list)) for value in values.values())
+            or any(isinstance(value, (dict, list)) for value in current_values.values())
+        ):
+            merged_values = {**(current_values or {}), **values}
+            return lines[:start] + dump({section: merged_values}) + lines[end:]
+
+        indent = next(
+            (
+                line[: len(line) - len(line.lstrip())]
+                for line in section_lines
+                if line.strip() and not line.lstrip().startswith("#")
+            ),
+            "  ",
+        )
+        for key, value in values.items():
+            (value_line,) = dump({key: value}, indent)
+            key_pattern = re.compile(
+                rf"^{re.escape(indent)}{re.escape(str(key))}\s*:[^#]*?(?P<comment>\s+#.*)?$"
+            )
+            for i, line in enumerate(section_lines):
+                match = key_pattern.match(line)
+                if match:
+                    section_lines[i] = value_line + (match.group("comment") or "")
+                    break
+            else:
+                section_lines.append(value_line)
+
+        return lines[: start + 1] + section_lines + lines[end:]
+
     @classmethod
     def merge_config(cls, a: Dict[Any, Any], b: Dict[Any, Any]) -> Dict[Any, Any]:
         c = {}
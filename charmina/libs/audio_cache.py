@@ -0,0 +1,57 @@
+import os
+import numpy as np
+from faster_whisper.audio import decode_audio
+from charmina.config import Config
+from charmina.libs.file_cache import FileCache
+from charmina.libs.helpers import file_content_hash
+
+
+_AUDIO_CACHE_FILE_EXTENSION = ".npy"
+
+
+class AudioCache(FileCache):
+    """
+    On-disk cache of decoded audios (mono float32 PCM) stored as .npy files keyed by the content
+    hash of the source file. Cached audios are memory-mapped, so they are read zero-copy.
+
+    Args:
+        directory_path: Path to the cache directory. Default: `audio` in CACHE_DIRECTORY_PATH.
+        max_size: Maximum size of the cache in bytes. Default: AUDIO_CACHE_MAX_SIZE_MB.
+    """
+
+    def __init__(self, directory_path: str = None, max_size: int = None):
+        config = Config.instance()
+        super().__init__(
+            directory_path=directory_path
+            or os.path.join(config.CACHE_DIRECTORY_PATH, "audio"),
+            max_size=(
+                max_size
+                if max_size is not None
+                else config.AUDIO_CACHE_MAX_SIZE_MB * 1024**2
+            ),
+        )
+
+    def load_audio(
+        self, file_path: str, sampling_rate: int = 16000, content_hash: str = None
+    ) -> np.ndarray:
+        """Get the decoded audio of the file, decoding it only if it's not cached."""
+        if not self.enabled:
+            return decode_audio(file_path, sampling_rate=sampling_rate)
+
+        key = f"{content_hash or file_content_hash(file_path)}_{sampling_rate}"
+        cached_path = self.get(key, _AUDIO_CACHE_FILE_EXTENSION)
+        if not cached_path:
+            audio = decode_audio(file_path, sampling_rate=sampling_rate)
+            cached_path = self.put(
+                key,
+                _AUDIO_CACHE_FILE_EXTENSION,
+                lambda temp_path: AudioCache.save_audio(temp_path, audio),
+            )
+
+        return np.load(cached_path, mmap_mode="r")
+
+    @staticmethod
+    def save_audio(file_path: str, audio: np.ndarray):
+        # Write with a file handler (np.save appends .npy extension to file names)
+        with open(file_path, "wb") as file:
+            np.save(file, np.ascontiguousarray(audio, dtype=np.float32))
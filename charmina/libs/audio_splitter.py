@@ -0,0 +1,127 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+
+_SEAM_TAIL_LENGTH = 500  # Characters at the end of the transcript compared at the seams
+
+
+@dataclass
+class AudioWindow:
+    """Window of a long audio to transcribe independently (positions in samples)."""
+
+    start: int  # First sample of the window, including the overlap with the previous window
+    end: int  # Last sample of the window, including the overlap with the next window
+    owned_start: int  # First sample owned by the window (segments before belong to the previous window)
+    owned_end: int  # Last sample owned by the window (segments after belong to the next window)
+
+
+def find_split_points(
+    speech_timestamps: List[Dict[str, int]],
+    total_samples: int,
+    window_samples: int,
+) -> List[int]:
+    """
+    Find the cut points of an audio in windows of ~window_samples, cutting in the middle of the
+    silence (gap between speech chunks) nearest to the target position of every cut.
+    If there is no silence close to the target position, the audio is cut at the target position.
+    """
+    if window_samples <= 0 or total_samples <= window_samples:
+        return []
+
+    # Silence gaps between consecutive speech chunks
+    gaps: List[Tuple[int, int]] = []
+    previous_end = 0
+    for speech_timestamp in speech_timestamps:
+        if speech_timestamp["start"] > previous_end:
+            gaps.append((previous_end, speech_timestamp["start"]))
+        previous_end = max(previous_end, speech_timestamp["end"])
+    if previous_end < total_samples:
+        gaps.append((previous_end, total_samples))
+
+    tolerance = window_samples // 4
+    split_points = []
+    last_split_point = 0
+    while total_samples - last_split_point > window_samples + tolerance:
+        target = last_split_point + window_samples
+
+        split_point = target
+        best_distance = tolerance + 1
+        for gap_start, gap_end in gaps:
+            gap_middle = (gap_start + gap_end) // 2
+            distance = abs(gap_middle - target)
+            if distance < best_distance and gap_middle > last_split_point:
+                split_point, best_distance = gap_middle, distance
+
+        split_points.append(split_point)
+        last_split_point = split_point
+
+    return split_points
+
+
+def get_audio_windows(
+    split_points: List[int], total_samples: int, overlap_samples: int = 0
+) -> List[AudioWindow]:
+    """Get the windows between split points, extended with the overlap at the seams."""
+    bounds = [0, *split_points, total_samples]
+
+    return [
+        AudioWindow(
+            start=max(0, owned_start - overlap_samples),
+            end=min(total_samples, owned_end + overlap_samples),
+            owned_start=owned_start,
+            owned_end=owned_end,
+        )
+        for owned_start, owned_end in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def dedupe_seam(previous_text: str, next_text: str, max_words: int = 20) -> str:
+    """
+    Remove from the beginning of next_text the words repeated at the end of previous_text
+    (overlapping audio transcribed twice at the seam of two windows).
+    """
+    previous_words = [_normalize_word(word) for word in previous_text.split()]
+    next_words = next_text.split()
+    next_normalized_words = [_normalize_word(word) for word in next_words]
+
+    max_overlap = min(max_words, len(previous_words), len(next_words))
+    for overlap in range(max_overlap, 0, -1):
+        if previous_words[-overlap:] == next_normalized_words[:overlap]:
+            return " ".join(next_words[overlap:])
+
+    return next_text
+
+
+def merge_window_segments(
+    windows: List[AudioWindow],
+    windows_segments: List[List[Tuple[float, float, str]]],
+    sampling_rate: int,
+) -> str:
+    """
+    Stitch the transcribed segments of the windows in order. Segments are (start, end, text)
+    with absolute timestamps in seconds. Only the segments centered in the owned part of each
+    window are kept, and repeated words at the seams are removed.
+    """
+    transcript = ""
+    for window, segments in zip(windows, windows_segments):
+        owned_start = window.owned_start / sampling_rate
+        owned_end = window.owned_end / sampling_rate
+
+        window_text = "".join(
+            text
+            for start, end, text in segments
+            if owned_start <= (start + end) / 2 < owned_end
+        ).strip(" \n")
+
+        if transcript and window_text:
+            window_text = dedupe_seam(transcript[-_SEAM_TAIL_LENGTH:], window_text)
+            transcript = f"{transcript} {window_text}".strip(" \n")
+        elif window_text:
+            transcript = window_text
+
+    return transcript
@@ -0,0 +1,392 @@
+import os
+import json
+import time
+import sqlite3
+import uuid
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Union
+from charmina.libs.helpers import file_content_hash, get_portable_path
+
+
+# Stages recorded in the manifest
+MANIFEST_STAGES = ["extract", "transform", "scribe"]
+
+_PENDING_BATCH_SIZE = 1_000  # Up to date entries recorded at once
+_BUSY_TIMEOUT = 30  # Seconds waiting for the database lock of another process
+_SHARED_ENTRY_FILE_EXTENSION = ".json"
+_ENTRY_COLUMNS = (
+    "source_path, input_stats, input_hash, config_hash, output_paths, adopted"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS manifest_entries (
+    stage TEXT NOT NULL,
+    source_path TEXT NOT NULL,
+    input_stats TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    output_paths TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    adopted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (stage, source_path)
+)
+"""
+
+
+def get_config_hash(*configs: Any) -> str:
+    """SHA-256 hex digest of the config values that change the output of a stage."""
+    return hashlib.sha256(
+        json.dumps(configs, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+@dataclass
+class ManifestEntry:
+    source_path: str  # Key of the source file (path relative to the manifest base path)
+    input_stats: str = ""  # Size and modification time of the input files (fast check)
+    input_hash: str = ""  # Content hash of the input files
+    config_hash: str = ""
+    output_paths: List[str] = field(default_factory=list)
+    adopted: bool = (
+        False  # Outputs found on disk, not written by a run (ie: before the manifest)
+    )
+
+
+class BuildManifest:
+    """
+    SQLite manifest of a project recording, per stage and source file, the hash of the input files,
+    the hash of the config (options, template, prompts) and the output paths. A stage only redoes
+    the stale files: new or changed inputs, changed config or missing outputs.
+
+    The input files are only hashed when their size or modification time change, so planning a
+    stage is a single query and a stat per file. Files with an output but no entry (ie: created
+    before the manifest) are recorded as up to date, and their outputs as adopted (not written by
+    a run, so a stage never removes them).
+
+    The source and output paths are recorded relative to `base_path`, so the entries are the same
+    on every machine mounting the project directory (at any path).
+
+    SQLite locking isn't reliable over NFS, so nodes sharing a project (ie: workers) keep their
+    own database on a local disk and share the entries of the files they process as JSON files in
+    `shared_directory_path` (written atomically with a rename). The shared entry of a file is only
+    read when it's stale in the database (ie: processed by another node).
+
+    Args:
+        database_path: Path to the SQLite database file (created if it doesn't exist).
+        base_path: Directory the recorded paths are relative to. Default: the database directory.
+        shared_directory_path: Directory of the entries shared with other nodes. Default: None.
+    """
+
+    def __init__(
+        self,
+        database_path: Union[Path, str],
+        base_path: Union[Path, str] = None,
+        shared_directory_path: Union[Path, str] = None,
+    ):
+        self.database_path = str(database_path)
+        self.base_path = str(
+            base_path or os.path.dirname(os.path.abspath(self.database_path))
+        )
+        self.shared_directory_path = (
+            str(shared_directory_path) if shared_directory_path else None
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(self.database_path)), exist_ok=True)
+
+        # The runners may record entries from other threads
+        self._lock = threading.Lock()
+        # Several processes of the same machine may share the database (wait for their writes)
+        self._connection = sqlite3.connect(
+            self.database_path, timeout=_BUSY_TIMEOUT, check_same_thread=False
+        )
+        self._connection.execute(_SCHEMA)
+        self._migrate()
+        self._connection.commit()
+        self._entries: Dict[str, Dict[str, ManifestEntry]] = {}
+        self._pending: Dict[str, List[ManifestEntry]] = {}
+
+    def _migrate(self):
+        # Databases created before the adopted outputs were recorded
+        columns = {
+            row[1]
+            for row in self._connection.execute("PRAGMA table_info(manifest_entries)")
+        }
+        if "adopted" not in columns:
+            self._connection.execute(
+                "ALTER TABLE manifest_entries ADD COLUMN adopted INTEGER NOT NULL DEFAULT 0"
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_entries(self, stage: str) -> Dict[str, ManifestEntry]:
+        """Entries of a stage by source path key (loaded once)."""
+        if stage not in self._entries:
+            with self._lock:
+                rows = self._connection.execute(
+                    f"SELECT {_ENTRY_COLUMNS} FROM manifest_entries WHERE stage = ?",
+                    (stage,),
+                ).fetchall()
+            self._entries[stage] = {row[0]: self._get_entry(row) for row in rows}
+
+        return self._entries[stage]
+
+    def get_key(self, source_path: Union[Path, str]) -> str:
+        """Key of a source file in the manifest (its path relative to the base path)."""
+        return get_portable_path(source_path, self.base_path)
+
+    def has_entry(self, stage: str, source_path: Union[Path, str]) -> bool:
+        return self.get_key(source_path) in self.get_entries(stage)
+
+    def refresh_entry(self, stage: str, source_path: str):
+        """Load again the entry of a source file (ie: recorded by another process)."""
+        source_path = self.get_key(source_path)
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {_ENTRY_COLUMNS} FROM manifest_entries"
+                " WHERE stage = ? AND source_path = ?",
+                (stage, source_path),
+            ).fetchone()
+
+        entries = self.get_entries(stage)
+        if row is None:
+            entries.pop(source_path, None)
+        else:
+            entries[source_path] = self._get_entry(row)
+
+    def get_stale_entry(
+        self,
+        stage: str,
+        source_path: str,
+        input_paths: List[str],
+        config_hash: str,
+        existing_output_paths: List[str] = None,
+        force: bool = False,
+    ) -> ManifestEntry | None:
+        """
+        Return the entry to record once the source file is processed, or None if it's up to date.
+        Source files without entry but with `existing_output_paths` (outputs of a run without
+        manifest) and up to date entries with touched inputs are recorded with put_pending().
+        Set `force` to get the entry of an up to date file (ie: overwrite).
+        """
+        source_path = self.get_key(source_path)
+        entry = self.get_entries(stage).get(source_path)
+        input_stats = self.get_input_stats(input_paths)
+        stale_entry = self._get_stale_entry(
+            stage,
+            source_path,
+            entry,
+            input_paths,
+            input_stats,
+            config_hash,
+            existing_output_paths=existing_output_paths,
+            force=force,
+        )
+        if stale_entry is None or force or self.shared_directory_path is None:
+            return stale_entry
+
+        # Processed by another node since recorded here (only read for stale files)
+        shared_entry = self._read_shared_entry(stage, source_path)
+        if shared_entry is None or shared_entry == entry:
+            return stale_entry
+
+        return self._get_stale_entry(
+            stage,
+            source_path,
+            shared_entry,
+            input_paths,
+            input_stats,
+            config_hash,
+            recorded=False,
+        )
+
+    def _get_stale_entry(
+        self,
+        stage: str,
+        source_path: str,
+        entry: ManifestEntry | None,
+        input_paths: List[str],
+        input_stats: str,
+        config_hash: str,
+        existing_output_paths: List[str] = None,
+        force: bool = False,
+        recorded: bool = True,
+    ) -> ManifestEntry | None:
+        if entry is None:
+            new_entry = ManifestEntry(
+                source_path=source_path,
+                input_stats=input_stats,
+                input_hash=self.get_input_hash(input_paths),
+                config_hash=config_hash,
+                output_paths=list(existing_output_paths or []),
+                adopted=bool(existing_output_paths),
+            )
+            if force or not existing_output_paths:
+                return new_entry
+
+            # Outputs of a previous run without manifest (don't redo them)
+            return self._adopt(stage, new_entry)
+
+        if (
+            force
+            or entry.config_hash != config_hash
+            or not all(
+                os.path.exists(output_path) for output_path in entry.output_paths
+            )
+        ):
+            return ManifestEntry(
+                source_path=source_path,
+                input_stats=input_stats,
+                input_hash=self.get_input_hash(input_paths),
+                config_hash=config_hash,
+                output_paths=entry.output_paths,
+                adopted=entry.adopted,
+            )
+
+        if entry.input_stats == input_stats:
+            # Up to date entry of another node (record it in this manifest)
+            return None if recorded else self._adopt(stage, entry)
+
+        # Touched inputs, only stale if the content changed
+        input_hash = self.get_input_hash(input_paths)
+        new_entry = ManifestEntry(
+            source_path=source_path,
+            input_stats=input_stats,
+            input_hash=input_hash,
+            config_hash=config_hash,
+            output_paths=entry.output_paths,
+            adopted=entry.adopted,
+        )
+        if entry.input_hash != input_hash:
+            return new_entry
+
+        return self._adopt(stage, new_entry)
+
+    def put(self, stage: str, entries: Iterable[ManifestEntry], share: bool = True):
+        """
+        Record the entries of processed source files (and share them with other nodes). Without
+        `share`, the entries are up to date files found while planning (their outputs aren't
+        written by this run).
+        """
+        entries = list(entries)
+        if not entries:
+            return
+
+        # Outputs written by a run of the stage
+        if share:
+            for entry in entries:
+                entry.adopted = False
+
+        updated_at = time.time()
+        rows = [self._get_row(entry) for entry in entries]
+        with self._lock:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO manifest_entries (stage, {_ENTRY_COLUMNS}, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(stage, *row, updated_at) for row in rows],
+            )
+            self._connection.commit()
+
+        if share and self.shared_directory_path is not None:
+            for row in rows:
+                self._write_shared_entry(stage, row)
+
+        for entry in entries:
+            self.get_entries(stage)[entry.source_path] = entry
+
+    def put_pending(self):
+        """Record the up to date entries found by get_stale_entry()."""
+        for stage, entries in self._pending.items():
+            self.put(stage, entries, share=False)
+        self._pending = {}
+
+    def _adopt(self, stage: str, entry: ManifestEntry) -> None:
+        self._pending.setdefault(stage, []).append(entry)
+
+        # Record in batches (the files are planned lazily, ie: large corpora)
+        if len(self._pending[stage]) >= _PENDING_BATCH_SIZE:
+            self.put(stage, self._pending.pop(stage), share=False)
+        return None
+
+    def _get_shared_entry_path(self, stage: str, source_path: str) -> str:
+        key = hashlib.sha256(source_path.encode()).hexdigest()
+        return os.path.join(
+            self.shared_directory_path, stage, f"{key}{_SHARED_ENTRY_FILE_EXTENSION}"
+        )
+
+    def _read_shared_entry(self, stage: str, source_path: str) -> ManifestEntry | None:
+        try:
+            with open(
+                self._get_shared_entry_path(stage, source_path), "r", encoding="utf-8"
+            ) as file:
+                row = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        return self._get_entry(tuple(row)) if row[0] == source_path else None
+
+    def _write_shared_entry(self, stage: str, row: tuple):
+        shared_entry_path = self._get_shared_entry_path(stage, row[0])
+        os.makedirs(os.path.dirname(shared_entry_path), exist_ok=True)
+
+        # Other nodes never read a partial entry (rename is atomic over NFS)
+        temp_path = f"{shared_entry_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(row, file)
+        os.replace(temp_path, shared_entry_path)
+
+    def _get_row(self, entry: ManifestEntry) -> tuple:
+        return (
+            entry.source_path,
+            entry.input_stats,
+            entry.input_hash,
+            entry.config_hash,
+            json.dumps(
+                [get_portable_path(path, self.base_path) for path in entry.output_paths]
+            ),
+            int(entry.adopted),
+        )
+
+    def _get_entry(self, row: tuple) -> ManifestEntry:
+        return ManifestEntry(
+            source_path=row[0],
+            input_stats=row[1],
+            input_hash=row[2],
+            config_hash=row[3],
+            # Absolute output paths on this machine
+            output_paths=[
+                os.path.normpath(os.path.join(self.base_path, path))
+                for path in json.loads(row[4])
+            ],
+            # Shared entries of older versions don't have it
+            adopted=bool(row[5]) if len(row) > 5 else False,
+        )
+
+    @staticmethod
+    def get_input_stats(input_paths: List[str]) -> str:
+        stats = []
+        for input_path in input_paths:
+            try:
+                stat = os.stat(input_path)
+                stats.append([stat.st_size, stat.st_mtime_ns])
+            except FileNotFoundError:
+                stats.append(None)
+
+        return json.dumps(stats)
+
+    @staticmethod
+    def get_input_hash(input_paths: List[str]) -> str:
+        input_hashes = [
+            file_content_hash(input_path) if os.path.exists(input_path) else ""
+            for input_path in input_paths
+        ]
+        return hashlib.sha256("".join(input_hashes).encode()).hexdigest()
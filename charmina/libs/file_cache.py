@@ -0,0 +1,143 @@
+import os
+import threading
+from typing import Callable, Dict, List
+
+
+_TEMP_FILE_EXTENSION = ".tmp"
+_EVICTION_CHECK_RATIO = 0.1  # Share of the cap written before walking the cache
+
+# Size of the cache directories in this process: [estimated size, bytes written since last walk]
+_cache_sizes: Dict[str, List[int]] = {}
+_cache_sizes_lock = threading.Lock()
+
+
+class FileCache:
+    """
+    On-disk cache of files keyed by a hash, with a size cap and LRU eviction.
+
+    The modification time of a cached file is touched on every hit, and the least recently used
+    files are removed first when the total size of the cache exceeds the cap. The cache is walked
+    once per process and its size is then tracked as files are written; it's walked again when the
+    estimate exceeds the cap or a tenth of the cap was written (ie: by other processes too).
+
+    Args:
+        directory_path: Path to the cache directory.
+        max_size: Maximum size of the cache in bytes. If 0, the cache is disabled.
+    """
+
+    directory_path: str
+    max_size: int
+
+    def __init__(self, directory_path: str, max_size: int):
+        self.directory_path = str(directory_path)
+        self.max_size = max(0, int(max_size))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get_path(self, key: str, extension: str = "") -> str:
+        return os.path.join(self.directory_path, key[:2], f"{key}{extension}")
+
+    def get(self, key: str, extension: str = "") -> str | None:
+        """Return the path of the cached file, or None if it's not cached."""
+        if not self.enabled:
+            return None
+
+        path = self.get_path(key, extension)
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            return None
+
+        return path
+
+    def put(
+        self,
+        key: str,
+        extension: str,
+        writer: Callable[[str], None],
+        evict_cache: bool = True,
+    ) -> str:
+        """
+        Write the cached file calling writer(temp_path) and move it in place atomically.
+        Set evict_cache to False to write several files and call evict() once.
+        """
+        path = self.get_path(key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            previous_size = os.path.getsize(path)
+        except OSError:
+            previous_size = 0
+
+        temp_path = f"{path}.{os.getpid()}{_TEMP_FILE_EXTENSION}"
+        try:
+            writer(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self._add_size(os.path.getsize(path) - previous_size)
+        if evict_cache and self._is_eviction_due():
+            self.evict(keep_path=path)
+
+        return path
+
+    def evict(self, keep_path: str = None):
+        """Remove the least recently used files until the cache fits in the size cap (with room)."""
+        entries = []
+        total_size = 0
+        for dirpath, _, filenames in os.walk(self.directory_path):
+            for filename in filenames:
+                if filename.endswith(_TEMP_FILE_EXTENSION):
+                    continue
+
+                file_path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(file_path)
+                except FileNotFoundError:
+                    continue
+
+                entries.append((stat.st_mtime, stat.st_size, file_path))
+                total_size += stat.st_size
+
+        # Leave room for the next writes (don't walk the cache again on every write)
+        if total_size > self.max_size:
+            target_size = self.max_size * (1 - _EVICTION_CHECK_RATIO)
+        else:
+            target_size = self.max_size
+
+        for _, size, file_path in sorted(entries):
+            if total_size <= target_size:
+                break
+            if file_path == keep_path:
+                continue
+
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+        with _cache_sizes_lock:
+            _cache_sizes[self.directory_path] = [total_size, 0]
+
+    def _add_size(self, size: int):
+        with _cache_sizes_lock:
+            cache_size = _cache_sizes.get(self.directory_path)
+            if cache_size is not None:
+                cache_size[0] += size
+                cache_size[1] += max(0, size)
+
+    def _is_eviction_due(self) -> bool:
+        with _cache_sizes_lock:
+            cache_size = _cache_sizes.get(self.directory_path)
+        if cache_size is None:
+            # Size unknown in this process (walk it once)
+            return True
+
+        return (
+            cache_size[0] > self.max_size
+            or cache_size[1] >= self.max_size * _EVICTION_CHECK_RATIO
+        )
@@ -1,11 +1,37 @@
 import os
 import sys
+import hashlib
 import importlib.util
 import glob
 import shutil
 import time
+import threading
 from pathlib import Path
-from typing import List, Union
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Sized,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+T = TypeVar("T")
+
+_FILE_HASHES_SIZE = 1024  # Maximum number of file content hashes kept in memory
+_MAX_WAITING_ARGUMENTS = (
+    1_000  # Arguments pulled ahead for the groups with room (lazy iterables)
+)
+
+_file_hashes: OrderedDict = OrderedDict()
+_file_hashes_lock = threading.Lock()
 
 
 class TimeTaken:
@@ -32,6 +58,7 @@ class TimeTaken:
 def get_filtered_directories(
     directory_filter: str | None = None,
     base_path: Path = ".",
+    source_index=None,
 ) -> List[Path]:
 
     # if not directory_filter or directory_filter.lower() in str(base_path).lower():
@@ -40,17 +67,24 @@ def get_filtered_directories(
     if not directory_filter:
         return [base_path]
 
+    # Reuse the listing of the source index (no walk of the tree)
+    if source_index is not None:
+        return source_index.find_directories(directory_filter)
+
     # Search for subdirectories matching directory_filter
     filtered_directories = []
     for dirpath, dirs, _ in os.walk(base_path):
+        unmatched_dirs = []
         for dir in dirs:
             full_dir_path = Path(dirpath, dir)
 
             if directory_filter.lower() in str(full_dir_path).lower():
                 filtered_directories.append(full_dir_path)
+            else:
+                unmatched_dirs.append(dir)
 
-                # skip subdirectories
-                dirs.clear()
+        # skip subdirectories of the matching directories
+        dirs[:] = unmatched_dirs
 
     return filtered_directories
 
@@ -99,6 +133,20 @@ def replace_file_path_root(
         return str(file_path)
 
 
+def get_portable_path(
+    file_path: Union[Path, str], base_path: Union[Path, str] = None
+) -> str:
+    """
+    Path of a file relative to a base directory with forward slashes, the same on every machine
+    mounting the directory (ie: keys shared over NFS). Absolute path if no base directory.
+    """
+    file_path = os.path.abspath(str(file_path))
+    if base_path is None:
+        return file_path
+
+    return Path(os.path.relpath(file_path, os.path.abspath(str(base_path)))).as_posix()
+
+
 # borrowed from: https://stackoverflow.com/a/1051266/656011
 def check_for_package(package):
     if package in sys.modules:
@@ -117,10 +165,129 @@ def check_for_package(package):
         return False
 
 
+def run_inline(fn: Callable, *args, **kwargs) -> Future:
+    """Run the function in the current thread and return its result as a completed future."""
+    future = Future()
+    try:
+        future.set_result(fn(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+
+    return future
+
+
+class InlineExecutor(Executor):
+    """Executor running the tasks in the current thread when submitted (ie: cheap tasks)."""
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        return run_inline(fn, *args, **kwargs)
+
+
+def submit_bounded(
+    submit: Callable[[T], Future],
+    arguments: Iterable[T],
+    max_pending: int,
+    get_group: Callable[[T], Hashable] = None,
+) -> Iterator[Tuple[T, Future]]:
+    """
+    Submit the tasks of the arguments lazily and yield each argument with its future as they
+    complete. At most `max_pending` tasks of each group (ie: the lane of a file) are submitted and
+    not completed, so the arguments are only pulled from the iterable (ie: files being found) when
+    there is room. Errors submitting a task are returned in its future.
+
+    The arguments of a full group wait while the other groups keep running, so a group is never
+    starved by the arguments of another one ahead of it (ie: text files sorted after the audios).
+    All the arguments of a list can wait, the ones of a lazy iterable up to 1000.
+    """
+    max_waiting = (
+        len(arguments) if isinstance(arguments, Sized) else _MAX_WAITING_ARGUMENTS
+    )
+    arguments = iter(arguments)
+    max_pending = max(1, int(max_pending))
+    pending: Dict[Future, Tuple[Hashable, T]] = {}
+    pending_groups = Counter()
+    waiting: Dict[Hashable, Deque[T]] = {}
+    waiting_count = 0
+
+    def submit_pending(group: Hashable, argument: T):
+        try:
+            future = submit(argument)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+
+        pending[future] = (group, argument)
+        pending_groups[group] += 1
+
+    exhausted = False
+    while True:
+        # Submit the waiting arguments of the groups with room
+        for group, group_waiting in waiting.items():
+            while group_waiting and pending_groups[group] < max_pending:
+                submit_pending(group, group_waiting.popleft())
+                waiting_count -= 1
+
+        # Pull new arguments while they may find room (without groups, only if the group has it)
+        while not exhausted and (
+            pending_groups[None] < max_pending
+            if get_group is None
+            else waiting_count < max_waiting
+        ):
+            try:
+                argument = next(arguments)
+            except StopIteration:
+                exhausted = True
+                break
+
+            group = get_group(argument) if get_group else None
+            if pending_groups[group] < max_pending:
+                submit_pending(group, argument)
+            else:
+                waiting.setdefault(group, deque()).append(argument)
+                waiting_count += 1
+
+        if not pending:
+            return
+
+        done_futures, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done_futures:
+            group, argument = pending.pop(future)
+            pending_groups[group] -= 1
+            yield argument, future
+
+
+def file_content_hash(file_path: Union[Path, str], chunk_size: int = 1024**2) -> str:
+    """
+    SHA-256 hex digest of the content of a file (read in chunks). The last hashes are kept in
+    memory by path, size and modification time, so an unchanged file isn't read again.
+    """
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _file_hashes_lock:
+        if key in _file_hashes:
+            _file_hashes.move_to_end(key)
+            return _file_hashes[key]
+
+    content_hash = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            content_hash.update(chunk)
+
+    with _file_hashes_lock:
+        _file_hashes[key] = content_hash.hexdigest()
+        while len(_file_hashes) > _FILE_HASHES_SIZE:
+            _file_hashes.popitem(last=False)
+
+    return content_hash.hexdigest()
+
+
 def process_memory_limit(limit):
+    """Limit the address space of the current process (in bytes). Allocations above it fail."""
     import resource as rs
 
     soft, hard = rs.getrlimit(rs.RLIMIT_AS)
+    if hard != rs.RLIM_INFINITY:
+        limit = min(limit, hard)
     rs.setrlimit(rs.RLIMIT_AS, (limit, hard))
 
 
@@ -0,0 +1,86 @@
+import os
+import logging
+from typing import Callable, List, TypeVar
+
+
+T = TypeVar("T")
+
+# Orderings of the jobs of a run
+JOB_ORDERS = [
+    "none",  # Keep the order of the source files
+    "lpt",  # Longest processing time first (shortest makespan with several workers)
+    "spt",  # Shortest processing time first (fast feedback)
+]
+
+_AUDIO_EXTENSIONS = {".mp3", ".mp4", ".m4a", ".wav", ".ogg", ".flac"}
+_PDF_EXTENSIONS = {".pdf"}
+
+# Rough processing seconds per unit (only the relative costs matter)
+_AUDIO_COST_PER_SECOND = 0.3  # Transcription real-time factor on CPU
+_AUDIO_BYTES_PER_SECOND = 16_000  # 128 kbps, when the duration can't be read
+_PDF_COST_PER_PAGE = 2.0
+_PDF_BYTES_PER_PAGE = 100_000  # When the page count can't be read
+_TEXT_COST_PER_BYTE = 1e-6
+
+
+def estimate_cost(file_path: str) -> float:
+    """
+    Estimated processing cost of a file (in seconds): audio duration from the tags or headers,
+    PDF page count, or text size. Files that can't be read cost 0.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    try:
+        file_size = os.path.getsize(file_path)
+    except OSError:
+        return 0.0
+
+    if ext in _AUDIO_EXTENSIONS:
+        duration = get_audio_duration(file_path)
+        if duration is None:
+            duration = file_size / _AUDIO_BYTES_PER_SECOND
+        return duration * _AUDIO_COST_PER_SECOND
+
+    if ext in _PDF_EXTENSIONS:
+        page_count = get_pdf_page_count(file_path)
+        if page_count is None:
+            page_count = max(1, file_size // _PDF_BYTES_PER_PAGE)
+        return page_count * _PDF_COST_PER_PAGE
+
+    return file_size * _TEXT_COST_PER_BYTE
+
+
+def get_audio_duration(file_path: str) -> float | None:
+    """Duration of an audio file (in seconds) from its headers, without decoding it."""
+    try:
+        import music_tag
+
+        return float(music_tag.load_file(file_path)["#length"].value) or None
+    except Exception as e:
+        logging.debug(f"Unable to read the duration of '{file_path}': {e}")
+        return None
+
+
+def get_pdf_page_count(file_path: str) -> int | None:
+    try:
+        from charmina.libs.pdf_pages import get_page_count
+
+        return get_page_count(file_path)
+    except Exception as e:
+        logging.debug(f"Unable to read the page count of '{file_path}': {e}")
+        return None
+
+
+def order_jobs(jobs: List[T], order: str, get_path: Callable[[T], str]) -> List[T]:
+    """
+    Sort the jobs by the estimated cost of their files: `lpt` (longest first), `spt` (shortest
+    first) or `none` (unchanged). The sort is stable, jobs with the same cost keep their order.
+    """
+    order = (order or "none").lower()
+    if order not in JOB_ORDERS:
+        raise ValueError(f"Invalid order '{order}'. Values: {', '.join(JOB_ORDERS)}")
+
+    if order == "none" or len(jobs) < 2:
+        return jobs
+
+    costs = {id(job): estimate_cost(get_path(job)) for job in jobs}
+    return sorted(jobs, key=lambda job: costs[id(job)], reverse=order == "lpt")
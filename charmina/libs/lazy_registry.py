@@ -0,0 +1,88 @@
+import importlib
+import logging
+from functools import lru_cache
+from importlib.metadata import entry_points
+from typing import Any, Collection, Dict, Iterator, Mapping, Tuple
+
+
+@lru_cache(maxsize=None)
+def resolve_class(class_path: str) -> type:
+    """Import a class given its path `package.module:ClassName` (entry point syntax)."""
+    module_path, _, class_name = class_path.partition(":")
+    if not class_name:
+        module_path, _, class_name = class_path.rpartition(".")
+
+    resolved = importlib.import_module(module_path)
+    for attribute_name in class_name.split("."):
+        resolved = getattr(resolved, attribute_name)
+
+    return resolved
+
+
+class LazyRegistry(Mapping):
+    """
+    Map of file extensions to classes and their arguments, as (class, args) tuples.
+
+    Classes are declared by path (`package.module:ClassName`) and imported on first use, so heavy
+    dependencies (torch, faster_whisper, marker, etc) are only imported by the processes that
+    handle that file type.
+
+    Third-party packages can register classes with entry points of the given group, named after the
+    file extension they handle. Ie, in pyproject.toml:
+
+        [tool.poetry.plugins."charmina.transformers"]
+        ".epub" = "my_package.epub_transformer:EpubTransformer"
+
+    Args:
+        entries: Map of file extensions to (class path, args) tuples.
+        entry_point_group: Name of the entry point group of third-party classes.
+    """
+
+    def __init__(
+        self,
+        entries: Dict[str, Tuple[str, Dict[str, Any]]],
+        entry_point_group: str = None,
+    ):
+        self._entries = dict(entries)
+        self._entry_point_group = entry_point_group
+        self._entry_points_loaded = False
+
+    def __getitem__(self, ext: str) -> Tuple[type, Dict[str, Any]]:
+        class_path, args = self._get_entries()[ext]
+        return resolve_class(class_path), args
+
+    def __contains__(self, ext: object) -> bool:
+        return ext in self._get_entries()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._get_entries())
+
+    def __len__(self) -> int:
+        return len(self._get_entries())
+
+    def get_class_path(self, ext: str) -> str:
+        """Get the path of the class registered for the extension (without importing it)."""
+        return self._get_entries()[ext][0]
+
+    def extensions(self) -> Collection[str]:
+        return self._get_entries().keys()
+
+    def _get_entries(self) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        if not self._entry_points_loaded:
+            self._entry_points_loaded = True
+            for entry_point in (
+                entry_points(group=self._entry_point_group)
+                if self._entry_point_group
+                else []
+            ):
+                ext = (
+                    entry_point.name
+                    if entry_point.name.startswith(".")
+                    else f".{entry_point.name}"
+                )
+                logging.debug(
+                    f"Register '{entry_point.value}' for '{ext}' files (group {self._entry_point_group})"
+                )
+                self._entries[ext] = (entry_point.value, {})
+
+        return self._entries
@@ -0,0 +1,50 @@
+import gc
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+
+class ModelCache:
+    """
+    Process-wide LRU cache of loaded models.
+
+    Models are kept alive for the whole life of the process (ie: a transform worker) and the
+    least recently used one is evicted when a different model is requested and the cache is full.
+
+    Args:
+        max_size: Maximum number of models kept in memory at the same time.
+    """
+
+    def __init__(self, max_size: int = 1):
+        self.max_size = max(1, int(max_size))
+        self._models: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the model cached with the key, or load it calling loader()."""
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+
+            # Evict least recently used models before loading the new one (free memory first)
+            if len(self._models) >= self.max_size:
+                while len(self._models) >= self.max_size:
+                    self._models.popitem(last=False)
+                gc.collect()
+
+            model = loader()
+            self._models[key] = model
+
+            return model
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            gc.collect()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._models
+
+    def __len__(self) -> int:
+        return len(self._models)
@@ -0,0 +1,92 @@
+import os
+import json
+import hashlib
+from typing import Any, Dict
+from charmina.config import Config
+from charmina.libs.file_cache import FileCache
+
+
+_PAGE_FILE_EXTENSION = ".md"
+
+
+class PdfPageCache(FileCache):
+    """
+    On-disk cache of the markdown of converted PDF pages keyed by the hash of the page content and
+    the converter settings, so a rerun (ie: after a failure or a page range change) only converts
+    the missing or changed pages.
+
+    Args:
+        directory_path: Path to the cache directory. Default: `pdf_pages` in CACHE_DIRECTORY_PATH.
+        max_size: Maximum size of the cache in bytes. Default: PDF_PAGE_CACHE_MAX_SIZE_MB.
+    """
+
+    def __init__(self, directory_path: str = None, max_size: int = None):
+        config = Config.instance()
+        super().__init__(
+            directory_path=directory_path
+            or os.path.join(config.CACHE_DIRECTORY_PATH, "pdf_pages"),
+            max_size=(
+                max_size
+                if max_size is not None
+                else config.PDF_PAGE_CACHE_MAX_SIZE_MB * 1024**2
+            ),
+        )
+
+    @staticmethod
+    def get_page_key(page_hash: str, settings: Dict[str, Any]) -> str:
+        return hashlib.sha256(
+            json.dumps(
+                {"page_hash": page_hash, **settings}, sort_keys=True, default=str
+            ).encode()
+        ).hexdigest()
+
+    def get_pages(
+        self, page_hashes: Dict[int, str], settings: Dict[str, Any]
+    ) -> Dict[int, str]:
+        """Get the cached markdown of the pages (by page index)."""
+        pages_markdown = {}
+        if not self.enabled:
+            return pages_markdown
+
+        for page_index, page_hash in page_hashes.items():
+            cached_path = self.get(
+                self.get_page_key(page_hash, settings), _PAGE_FILE_EXTENSION
+            )
+            if not cached_path:
+                continue
+
+            try:
+                with open(cached_path, "r", encoding="utf-8") as file:
+                    pages_markdown[page_index] = file.read()
+            except FileNotFoundError:
+                continue
+
+        return pages_markdown
+
+    def put_pages(
+        self,
+        page_hashes: Dict[int, str],
+        settings: Dict[str, Any],
+        pages_markdown: Dict[int, str],
+    ):
+        """Cache the markdown of the pages (by page index)."""
+        if not self.enabled or not pages_markdown:
+            return
+
+        for page_index, page_markdown in pages_markdown.items():
+            if page_index not in page_hashes:
+                continue
+
+            self.put(
+                self.get_page_key(page_hashes[page_index], settings),
+                _PAGE_FILE_EXTENSION,
+                lambda temp_path: PdfPageCache._write(temp_path, page_markdown),
+                evict_cache=False,
+            )
+
+        self.evict()
+
+    @staticmethod
+    def _write(file_path: str, text: str):
+        with open(file_path, "w", encoding="utf-8") as file:
+            file.write(text)
@@ -0,0 +1,186 @@
+import re
+import hashlib
+from typing import Dict, Iterable, List, Tuple
+import pypdfium2 as pdfium
+
+
+# Marker output with `paginate_output` prefixes each page with `{page_id}` and a separator of dashes
+_MARKER_PAGE_SEPARATOR_REGEX = re.compile(r"\s*\{(\d+)\}-{48}\s*")
+
+_SOFT_HYPHENS = ("-", "\xad", "\x02")
+_PUNCTUATION_CHARS = set(".,;:!?'\"()[]-–—‘’“”•/%&*")
+
+# Minimum quality of a page text layer to use it instead of converting the page with marker
+_MIN_PAGE_CHARS = 100
+_MIN_VALID_CHARS_RATIO = 0.9
+_MAX_INVALID_CHARS_RATIO = 0.01
+_MIN_AVERAGE_WORD_LENGTH = 2
+_MAX_AVERAGE_WORD_LENGTH = 12
+
+_PAGE_HASH_RENDER_SCALE = (
+    0.5  # Resolution of the page render hashed with the text (36 dpi)
+)
+
+
+def get_page_count(file_path: str) -> int:
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def parse_page_range(page_range: str, page_count: int) -> List[int]:
+    """
+    Page indexes (0-based) of a page range as used by marker (ie: `0,5-10,20`).
+    All pages if the range is empty.
+    """
+    if not page_range:
+        return list(range(page_count))
+
+    pages = set()
+    for part in str(page_range).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            pages.update(range(int(start), int(end) + 1))
+        else:
+            pages.add(int(part))
+
+    return sorted(page for page in pages if 0 <= page < page_count)
+
+
+def format_page_range(pages: Iterable[int]) -> str:
+    """Page range of the page indexes (ie: [0, 5, 6, 7] -> `0,5-7`)."""
+    parts = []
+    start = end = None
+    for page in sorted(set(pages)):
+        if end is not None and page == end + 1:
+            end = page
+            continue
+        if start is not None:
+            parts.append(str(start) if start == end else f"{start}-{end}")
+        start = end = page
+    if start is not None:
+        parts.append(str(start) if start == end else f"{start}-{end}")
+
+    return ",".join(parts)
+
+
+def iget_page_texts(file_path: str, pages: Iterable[int]) -> Iterable[Tuple[int, str]]:
+    """Yield the text layer of the pages (empty in scanned pages)."""
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        for page_index in pages:
+            page = pdf[page_index]
+            text_page = page.get_textpage()
+            try:
+                yield page_index, text_page.get_text_range()
+            finally:
+                text_page.close()
+                page.close()
+    finally:
+        pdf.close()
+
+
+def iget_page_hashes(file_path: str, pages: Iterable[int]) -> Iterable[Tuple[int, str]]:
+    """
+    Yield a hash of the content of the pages: size, text layer and a low-resolution render
+    (scanned pages have no text).
+    """
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        for page_index in pages:
+            page = pdf[page_index]
+            text_page = page.get_textpage()
+            bitmap = page.render(scale=_PAGE_HASH_RENDER_SCALE, grayscale=True)
+            try:
+                page_hash = hashlib.sha256(str(page.get_size()).encode())
+                page_hash.update(
+                    text_page.get_text_range().encode("utf-8", "surrogatepass")
+                )
+                page_hash.update(bitmap.to_numpy().tobytes())
+                yield page_index, page_hash.hexdigest()
+            finally:
+                bitmap.close()
+                text_page.close()
+                page.close()
+    finally:
+        pdf.close()
+
+
+def is_usable_text_layer(text: str) -> bool:
+    """
+    Check if the text layer of a page is good enough to skip the layout and OCR models.
+    Scanned pages have no text, and broken layers have unmapped glyphs or mangled spacing.
+    """
+    text = text.strip()
+    if len(text) < _MIN_PAGE_CHARS:
+        return False
+
+    invalid_chars = text.count("�") + len(re.findall(r"\(cid:\d+\)", text))
+    if invalid_chars / len(text) > _MAX_INVALID_CHARS_RATIO:
+        return False
+
+    valid_chars = sum(
+        1
+        for char in text
+        if char.isalnum() or char.isspace() or char in _PUNCTUATION_CHARS
+    )
+    if valid_chars / len(text) < _MIN_VALID_CHARS_RATIO:
+        return False
+
+    words = text.split()
+    average_word_length = sum(len(word) for word in words) / len(words)
+
+    return _MIN_AVERAGE_WORD_LENGTH <= average_word_length <= _MAX_AVERAGE_WORD_LENGTH
+
+
+def text_to_markdown(text: str) -> str:
+    """
+    Markdown paragraphs of a page text layer. Lines are joined (and dehyphenated) until a blank
+    line or a short line ending a sentence.
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    line_width = max((len(line) for line in lines), default=0)
+
+    paragraphs = []
+    paragraph = ""
+    for line in lines:
+        if not line:
+            if paragraph:
+                paragraphs.append(paragraph)
+            paragraph = ""
+            continue
+
+        if paragraph.endswith(_SOFT_HYPHENS) and line[:1].islower():
+            paragraph = paragraph[:-1] + line
+        else:
+            paragraph = f"{paragraph} {line}" if paragraph else line
+
+        if (
+            line.endswith((".", "!", "?", ":", '"', "”"))
+            and len(line) < 0.8 * line_width
+        ):
+            paragraphs.append(paragraph)
+            paragraph = ""
+
+    if paragraph:
+        paragraphs.append(paragraph)
+
+    return "\n\n".join(
+        paragraph.replace("\xad", "").replace("\x02", "") for paragraph in paragraphs
+    )
+
+
+def split_paginated_markdown(markdown: str) -> Dict[int, str]:
+    """Markdown of each page (by page index) of a marker output with `paginate_output`."""
+    parts = _MARKER_PAGE_SEPARATOR_REGEX.split(markdown)
+
+    # parts: [text before first page, page_id, page text, page_id, page text, ...]
+    return {
+        int(page_id): page_markdown.strip()
+        for page_id, page_markdown in zip(parts[1::2], parts[2::2])
+    }
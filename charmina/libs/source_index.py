@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Union
+from charmina.config import Config
+
+
+_INDEX_FILE_EXTENSION = ".json"
+_INDEX_VERSION = 1
+# Directories modified this recently are listed again on the next scan (coarse mtimes, ie: NFS)
+_RACY_MTIME_NS = 2 * 10**9
+
+
+class SourceIndex:
+    """
+    Listing of the files of a directory tree, walked once with os.scandir and cached on disk keyed
+    by the modification time of each directory. Only the directories that changed (files added,
+    removed or renamed) are listed again, so a run without changes only stats the directories.
+
+    Hidden files and directories are skipped when finding files, as with glob.
+
+    Args:
+        root_path: Root directory of the tree (ie: the project sources).
+        cache_directory_path: Path to the cache directory. Default: `source_index` in CACHE_DIRECTORY_PATH.
+    """
+
+    def __init__(self, root_path: Union[Path, str], cache_directory_path: str = None):
+        self.root_path = os.path.abspath(str(root_path))
+        self.cache_directory_path = cache_directory_path or os.path.join(
+            Config.instance().CACHE_DIRECTORY_PATH, "source_index"
+        )
+        self._directories: Dict[str, Dict[str, Any]] | None = None
+        self._cached_directories: Dict[str, Dict[str, Any]] | None = None
+
+    @property
+    def directories(self) -> Dict[str, Dict[str, Any]]:
+        """Entries of the directories by path relative to the root (scanned on first use)."""
+        if self._directories is None:
+            self.scan()
+
+        return self._directories
+
+    def scan(self):
+        """Walk the tree, listing again only the directories modified since the last scan."""
+        cached_directories = (
+            self._cached_directories
+            if self._cached_directories is not None
+            else self._load()
+        )
+        directories = {}
+        listed_directories = 0
+
+        pending = [""]
+        while pending:
+            relative_path = pending.pop()
+            directory_path = os.path.join(self.root_path, relative_path)
+            try:
+                mtime_ns = os.stat(directory_path).st_mtime_ns
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+            entry = cached_directories.get(relative_path)
+            if entry is None or entry["mtime_ns"] != mtime_ns:
+                entry = SourceIndex._list_directory(directory_path, mtime_ns)
+                listed_directories += 1
+
+            directories[relative_path] = entry
+            pending.extend(
+                os.path.join(relative_path, dir_name) for dir_name in entry["dirs"]
+            )
+
+        logging.debug(
+            f"Source index of {self.root_path}: {len(directories)} directories, {listed_directories} listed"
+        )
+
+        self._directories = directories
+        self._cached_directories = {
+            relative_path: SourceIndex._get_cached_entry(entry)
+            for relative_path, entry in directories.items()
+        }
+        if self._cached_directories != cached_directories:
+            self._save(self._cached_directories)
+
+    def find_files(
+        self, directory_path: Union[Path, str], extensions: Iterable[str]
+    ) -> Iterable[str]:
+        """Yield the files with the extensions in the directory and its subdirectories."""
+        extensions = tuple(extensions)
+        relative_directory_path = self._get_relative_path(directory_path)
+        if relative_directory_path is None:
+            return
+
+        for relative_path, entry in self.directories.items():
+            if not SourceIndex._is_subpath(relative_path, relative_directory_path):
+                continue
+            if SourceIndex._is_hidden(relative_path, relative_directory_path):
+                continue
+
+            for file_name in entry["files"]:
+                if file_name.endswith(extensions) and not file_name.startswith("."):
+                    yield os.path.join(self.root_path, relative_path, file_name)
+
+    def find_directories(self, directory_filter: str) -> List[Path]:
+        """
+        Directories containing the filter (case insensitive) in their path. The subdirectories of
+        a matching directory are skipped.
+        """
+        directory_filter = directory_filter.lower()
+
+        filtered_directories = []
+        pending = [""]
+        while pending:
+            relative_path = pending.pop(0)
+            for dir_name in sorted(self.directories[relative_path]["dirs"]):
+                relative_dir_path = os.path.join(relative_path, dir_name)
+                if relative_dir_path not in self.directories:
+                    continue
+
+                full_dir_path = Path(self.root_path, relative_dir_path)
+                if directory_filter in str(full_dir_path).lower():
+                    filtered_directories.append(full_dir_path)
+                else:
+                    pending.append(relative_dir_path)
+
+        return filtered_directories
+
+    def _get_relative_path(self, directory_path: Union[Path, str]) -> str | None:
+        relative_path = os.path.relpath(
+            os.path.abspath(str(directory_path)), self.root_path
+        )
+        if relative_path == os.curdir:
+            return ""
+        if relative_path == os.pardir or relative_path.startswith(os.pardir + os.sep):
+            logging.warning(
+                f"Directory {directory_path} is out of the source index {self.root_path}"
+            )
+            return None
+
+        return relative_path
+
+    @staticmethod
+    def _is_subpath(relative_path: str, relative_directory_path: str) -> bool:
+        return (
+            not relative_directory_path
+            or relative_path == relative_directory_path
+            or relative_path.startswith(relative_directory_path + os.sep)
+        )
+
+    @staticmethod
+    def _is_hidden(relative_path: str, relative_directory_path: str) -> bool:
+        # Only the directories below the searched one (as glob with `**`)
+        subpath = relative_path[len(relative_directory_path) :].strip(os.sep)
+        return any(part.startswith(".") for part in subpath.split(os.sep) if part)
+
+    @staticmethod
+    def _list_directory(directory_path: str, mtime_ns: int) -> Dict[str, Any]:
+        files = []
+        dirs = []
+        try:
+            with os.scandir(directory_path) as dir_entries:
+                for dir_entry in dir_entries:
+                    # Don't follow links to directories (avoid cycles)
+                    if dir_entry.is_dir(follow_symlinks=False):
+                        dirs.append(dir_entry.name)
+                    else:
+                        files.append(dir_entry.name)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            pass
+
+        return {"mtime_ns": mtime_ns, "files": files, "dirs": dirs}
+
+    @staticmethod
+    def _get_cached_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+        # A change in the same mtime tick wouldn't be detected (list it again next time)
+        if time.time_ns() - entry["mtime_ns"] < _RACY_MTIME_NS:
+            return {**entry, "mtime_ns": 0}
+
+        return entry
+
+    def _get_cache_path(self) -> str:
+        key = hashlib.sha256(self.root_path.encode()).hexdigest()
+        return os.path.join(self.cache_directory_path, f"{key}{_INDEX_FILE_EXTENSION}")
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._get_cache_path(), "r", encoding="utf-8") as file:
+                index = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+        if (
+            index.get("version") != _INDEX_VERSION
+            or index.get("root") != self.root_path
+        ):
+            return {}
+
+        return index.get("directories", {})
+
+    def _save(self, directories: Dict[str, Dict[str, Any]]):
+        cache_path = self._get_cache_path()
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(
+                    {
+                        "version": _INDEX_VERSION,
+                        "root": self.root_path,
+                        "directories": directories,
+                    },
+                    file,
+                )
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            logging.warning(f"Error saving the source index of {self.root_path}: {e}")
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
@@ -0,0 +1,165 @@
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, Union
+from charmina.libs.helpers import check_for_package
+from charmina.libs.source_index import SourceIndex
+
+
+_DEFAULT_DEBOUNCE_SECONDS = 5.0
+_DEFAULT_POLL_INTERVAL = 2.0
+
+
+class SourceWatcher:
+    """
+    Watch a directory tree for new or changed files with some extensions. A file is ready once its
+    size and modification time don't change for `debounce_seconds` (ie: downloads in progress).
+
+    Filesystem events (inotify, FSEvents, etc.) are received with the `watchdog` package if it's
+    installed. Otherwise, the tree is polled every `poll_interval` seconds with a source index
+    (only the modified directories are listed again) and a stat of the files.
+
+    Args:
+        root_path: Root directory of the tree (ie: the project sources).
+        extensions: Extensions of the watched files.
+        debounce_seconds: Seconds without changes before a file is ready. Default: 5.
+        poll_interval: Seconds between polls without `watchdog`. Default: 2.
+    """
+
+    def __init__(
+        self,
+        root_path: Union[Path, str],
+        extensions: Iterable[str],
+        debounce_seconds: float = _DEFAULT_DEBOUNCE_SECONDS,
+        poll_interval: float = _DEFAULT_POLL_INTERVAL,
+    ):
+        self.root_path = os.path.abspath(str(root_path))
+        self.extensions = tuple(extensions)
+        self.debounce_seconds = float(debounce_seconds)
+        self.poll_interval = float(poll_interval)
+
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[float, Tuple[int, int]]] = {}
+        self._observer = None
+        self._poll_thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if check_for_package("watchdog"):
+            self._start_observer()
+        else:
+            logging.info(
+                "Package watchdog not found, polling the sources (poetry run pip install watchdog)"
+            )
+            self._poll_thread = threading.Thread(
+                target=self._poll, name="SourceWatcher", daemon=True
+            )
+            self._poll_thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._poll_thread is not None:
+            self._poll_thread.join()
+            self._poll_thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def get_ready_files(self) -> List[str]:
+        """Pop the changed files without changes for the debounce time."""
+        now = time.monotonic()
+        ready_files = []
+        with self._lock:
+            for file_path, (changed_at, signature) in list(self._pending.items()):
+                current_signature = SourceWatcher._get_signature(file_path)
+                if current_signature is None:
+                    # Removed (or renamed) before it was ready
+                    del self._pending[file_path]
+                elif current_signature != signature:
+                    self._pending[file_path] = (now, current_signature)
+                elif now - changed_at >= self.debounce_seconds:
+                    del self._pending[file_path]
+                    ready_files.append(file_path)
+
+        return sorted(ready_files)
+
+    def notify(self, file_path: str):
+        """Mark a file as changed (restart its debounce time)."""
+        if not self.is_watched(file_path):
+            return
+
+        signature = SourceWatcher._get_signature(file_path)
+        if signature is None:
+            return
+
+        with self._lock:
+            self._pending[os.path.abspath(file_path)] = (time.monotonic(), signature)
+
+    def is_watched(self, file_path: str) -> bool:
+        relative_path = os.path.relpath(os.path.abspath(file_path), self.root_path)
+        return (
+            file_path.endswith(self.extensions)
+            and not relative_path.startswith(os.pardir)
+            and not any(part.startswith(".") for part in relative_path.split(os.sep))
+        )
+
+    def _start_observer(self):
+        # Module local import (optional dependency)
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        watcher = self
+
+        class _EventHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+
+                # Files moved in place (ie: downloads renamed when completed)
+                file_path = getattr(event, "dest_path", None) or event.src_path
+                watcher.notify(os.fsdecode(file_path))
+
+        self._observer = Observer()
+        self._observer.schedule(_EventHandler(), self.root_path, recursive=True)
+        self._observer.start()
+
+    def _poll(self):
+        source_index = SourceIndex(self.root_path)
+        signatures = self._get_signatures(source_index)
+
+        while not self._stopped.wait(self.poll_interval):
+            current_signatures = self._get_signatures(source_index)
+            for file_path, signature in current_signatures.items():
+                if signatures.get(file_path) != signature:
+                    self.notify(file_path)
+            signatures = current_signatures
+
+    def _get_signatures(self, source_index: SourceIndex) -> Dict[str, Tuple[int, int]]:
+        source_index.scan()
+
+        signatures = {}
+        for file_path in source_index.find_files(self.root_path, self.extensions):
+            signature = SourceWatcher._get_signature(file_path)
+            if signature is not None:
+                signatures[file_path] = signature
+
+        return signatures
+
+    @staticmethod
+    def _get_signature(file_path: str) -> Tuple[int, int] | None:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+
+        return stat.st_size, stat.st_mtime_ns
@@ -0,0 +1,388 @@
+import os
+import sys
+import time
+import signal
+import logging
+import itertools
+import threading
+import multiprocessing
+from dataclasses import dataclass
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from charmina.libs.helpers import process_memory_limit
+
+
+_MONITOR_INTERVAL = 0.5  # Seconds between checks of the running tasks
+_MAX_TASK_ATTEMPTS = 2  # Runs of a task whose worker died (or broken pool starts)
+
+# Queue of the task starts of the worker process (set by the worker initializer)
+_START_QUEUE = None
+
+
+class TaskTimeoutError(TimeoutError):
+    pass
+
+
+@dataclass
+class _SupervisedTask:
+    future: Future
+    fn: Callable
+    args: Tuple[Any, ...]
+    kwargs: Dict[str, Any]
+    generation: int = 0
+    attempts: int = 0
+
+
+class SupervisedProcessPool(Executor):
+    """
+    Process pool that supervises its workers: recycles them after `max_tasks_per_child` tasks,
+    kills the workers of the tasks running longer than `task_timeout`, and caps the address space
+    of the workers to `memory_limit_mb`.
+
+    A killed or crashed worker breaks the underlying pool, so it is replaced by a new one and the
+    pending tasks are submitted again. The tasks that timed out (or whose worker died twice) fail
+    with an error instead of breaking the run. Only the task of the worker killed or crashed is
+    charged an attempt: the workers of the other running tasks are terminated by the broken pool,
+    so those tasks are just submitted again.
+
+    Every worker runs in its own process group, so a worker is killed with the processes it started
+    (ie: the window and shard pools of the transformers). As they don't get the signals of the
+    terminal, `shutdown(cancel_futures=True)` kills the workers of the running tasks too.
+
+    Args:
+        max_workers: Number of worker processes.
+        initializer: Worker initializer (called after setting the memory limit).
+        initargs: Arguments of the initializer.
+        task_timeout: Maximum seconds of a task. Default: 0 (no limit).
+        max_tasks_per_child: Tasks run by a worker before it's replaced. Default: 0 (no limit).
+        memory_limit_mb: Address space limit of the workers (RLIMIT_AS). Default: 0 (no limit).
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        initializer: Callable = None,
+        initargs: Tuple[Any, ...] = (),
+        task_timeout: float = 0,
+        max_tasks_per_child: int = 0,
+        memory_limit_mb: int = 0,
+    ):
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self.initargs = initargs
+        self.task_timeout = task_timeout or 0
+        self.max_tasks_per_child = max_tasks_per_child or 0
+        self.memory_limit_mb = memory_limit_mb or 0
+
+        if self.max_tasks_per_child and sys.version_info < (3, 11):
+            logging.warning(
+                "Worker recycling (max_tasks_per_child) requires Python 3.11"
+            )
+            self.max_tasks_per_child = 0
+
+        # Workers can't be recycled in forked processes
+        self._mp_context = multiprocessing.get_context(
+            "spawn" if self.max_tasks_per_child else None
+        )
+
+        self._lock = threading.RLock()
+        self._idle = threading.Condition(self._lock)
+        self._task_ids = itertools.count()
+        self._tasks: Dict[int, _SupervisedTask] = {}
+        self._running: Dict[int, Tuple[int, float]] = {}  # task_id: (pid, start time)
+        self._workers: Dict[int, Optional[BaseProcess]] = {}  # Workers by pid
+        self._broken: Dict[int, BaseException] = {}
+        self._timed_out = set()
+        self._generation = 0
+        self._failed_starts = 0  # Pools broken before running any task
+        self._shutdown = False
+
+        self._start_pool()
+        self._monitor_thread = threading.Thread(
+            target=self._monitor, name="SupervisedProcessPool", daemon=True
+        )
+        self._monitor_thread.start()
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Cannot schedule new tasks after shutdown")
+
+            task_id = next(self._task_ids)
+            self._tasks[task_id] = _SupervisedTask(
+                future=Future(), fn=fn, args=args, kwargs=kwargs
+            )
+            self._submit_task(task_id)
+
+            return self._tasks[task_id].future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._lock:
+            if cancel_futures:
+                # The workers don't get the signals of the terminal (ie: interrupted), kill the
+                # ones running tasks
+                for pid, _ in self._running.values():
+                    self._kill_worker(pid)
+                self._running.clear()
+                for task_id in list(self._tasks.keys()):
+                    self._tasks.pop(task_id).future.cancel()
+
+            # Pending tasks may be submitted again to a new pool (wait for all of them)
+            while wait and self._tasks:
+                self._idle.wait()
+
+            self._shutdown = True
+            pool = self._pool
+
+        self._monitor_thread.join()
+        pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def _start_pool(self):
+        # A new queue per pool (a killed worker may leave the previous one unusable)
+        # Simple queues write synchronously (the start is received even if the worker crashes)
+        self._start_queue = self._mp_context.SimpleQueue()
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self._mp_context,
+            initializer=_init_worker,
+            initargs=(
+                self._start_queue,
+                self.memory_limit_mb,
+                self.initializer,
+                self.initargs,
+            ),
+            **(
+                {"max_tasks_per_child": self.max_tasks_per_child}
+                if self.max_tasks_per_child
+                else {}
+            ),
+        )
+        self._workers = {}
+
+    def _submit_task(self, task_id: int):
+        task = self._tasks[task_id]
+        task.generation = generation = self._generation
+        try:
+            pool_future = self._pool.submit(
+                _run_task, task_id, task.fn, task.args, task.kwargs
+            )
+        except BrokenProcessPool as e:
+            self._broken[task_id] = e
+            return
+
+        pool_future.add_done_callback(
+            lambda pool_future: self._on_task_done(task_id, generation, pool_future)
+        )
+
+    def _on_task_done(self, task_id: int, generation: int, pool_future: Future):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task.generation != generation:
+                return
+
+            error = None if pool_future.cancelled() else pool_future.exception()
+            if isinstance(error, BrokenProcessPool):
+                # Handled by the monitor (replace the pool and submit again)
+                self._broken[task_id] = error
+                return
+
+            self._complete_task(task_id)
+
+        if pool_future.cancelled():
+            task.future.cancel()
+        elif error is not None:
+            task.future.set_exception(error)
+        else:
+            task.future.set_result(pool_future.result())
+
+    def _complete_task(self, task_id: int):
+        self._tasks.pop(task_id, None)
+        self._running.pop(task_id, None)
+        self._timed_out.discard(task_id)
+        if not self._tasks:
+            self._idle.notify_all()
+
+    def _monitor(self):
+        while True:
+            with self._lock:
+                if self._shutdown:
+                    return
+
+                # A worker notifies the start before running the task (before it can crash)
+                self._receive_task_starts()
+                self._kill_timed_out_tasks()
+                if self._broken:
+                    self._replace_broken_pool()
+
+            time.sleep(_MONITOR_INTERVAL)
+
+    def _receive_task_starts(self):
+        try:
+            while not self._start_queue.empty():
+                task_id, pid = self._start_queue.get()
+                if pid not in self._workers:
+                    self._add_worker(pid)
+                if task_id in self._tasks:
+                    self._running[task_id] = (pid, time.monotonic())
+                    self._failed_starts = 0
+        except (EOFError, OSError):
+            pass
+
+        # Forget the workers recycled (max_tasks_per_child)
+        for pid, process in list(self._workers.items()):
+            if process is not None and process.exitcode == 0:
+                del self._workers[pid]
+
+    def _add_worker(self, pid: int):
+        # Keep the process of the worker (its exit code tells if it crashed)
+        self._workers[pid] = next(
+            (
+                process
+                for process in multiprocessing.active_children()
+                if process.pid == pid
+            ),
+            None,
+        )
+
+    def _kill_worker(self, pid: int):
+        """Kill a worker with its process group (the processes started by the worker)."""
+        try:
+            os.killpg(pid, signal.SIGKILL)
+            return
+        except (AttributeError, ProcessLookupError, PermissionError):
+            # Not a process group (ie: Windows, or setpgid failed)
+            pass
+
+        try:
+            os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+        except ProcessLookupError:
+            pass
+
+    def _kill_timed_out_tasks(self):
+        if not self.task_timeout:
+            return
+
+        now = time.monotonic()
+        for task_id, (pid, start_time) in list(self._running.items()):
+            if task_id in self._timed_out or now - start_time < self.task_timeout:
+                continue
+
+            logging.warning(
+                f"Task timed out after {self.task_timeout} seconds. Killing worker {pid}"
+            )
+            self._timed_out.add(task_id)
+            self._kill_worker(pid)
+
+    def _replace_broken_pool(self):
+        broken_tasks = self._broken
+        self._broken = {}
+
+        # Every pending task of the broken pool is submitted again (or failed)
+        broken_task_ids = [
+            task_id
+            for task_id, task in self._tasks.items()
+            if task.generation == self._generation
+        ]
+
+        # Tasks whose worker died on its own (not the timed out ones, they fail anyway). If the
+        # worker can't be identified (ie: it died before being seen), every running task is
+        # charged an attempt, so a task crashing its workers can't be retried forever
+        crashed_pids = self._get_crashed_pids()
+        crashed_task_ids = {
+            task_id
+            for task_id, (pid, _) in self._running.items()
+            if pid in crashed_pids and task_id not in self._timed_out
+        }
+        if not self._timed_out & set(self._running):
+            if not crashed_task_ids:
+                crashed_task_ids = set(self._running)
+            logging.warning(
+                "Worker process terminated abruptly (ie: out of memory). Restarting the pool"
+            )
+
+        # The pool can't run tasks (ie: the initializer crashes), fail the pending ones
+        if not self._running:
+            self._failed_starts += 1
+        pool_failed = self._failed_starts >= _MAX_TASK_ATTEMPTS
+
+        # The broken pool only terminates its workers, kill the processes they started too
+        for pid in self._workers:
+            self._kill_worker(pid)
+        self._pool.shutdown(wait=False)
+        self._running.clear()
+        self._generation += 1
+        self._start_pool()
+
+        failed_tasks = []
+        for task_id in broken_task_ids:
+            task = self._tasks[task_id]
+            if task_id in self._timed_out:
+                failed_tasks.append(
+                    (
+                        task,
+                        TaskTimeoutError(
+                            f"Task timed out after {self.task_timeout} seconds"
+                        ),
+                    )
+                )
+                self._complete_task(task_id)
+                continue
+
+            if task_id in crashed_task_ids:
+                task.attempts += 1
+            if task.attempts >= _MAX_TASK_ATTEMPTS or pool_failed:
+                failed_tasks.append(
+                    (
+                        task,
+                        broken_tasks.get(task_id)
+                        or BrokenProcessPool("Worker process terminated abruptly"),
+                    )
+                )
+                self._complete_task(task_id)
+                continue
+
+            self._submit_task(task_id)
+
+        for task, error in failed_tasks:
+            task.future.set_exception(error)
+
+    def _get_crashed_pids(self) -> Set[int]:
+        """Pids of the workers that died on their own (the broken pool terminates the others)."""
+        return {
+            pid
+            for pid, process in self._workers.items()
+            if process is not None
+            and process.exitcode not in (None, 0, -signal.SIGTERM)
+        }
+
+
+def _init_worker(
+    start_queue,
+    memory_limit_mb: int,
+    initializer: Callable = None,
+    initargs: Tuple[Any, ...] = (),
+):
+    global _START_QUEUE
+    _START_QUEUE = start_queue
+
+    # Own process group, so the worker is killed with the processes it starts
+    if hasattr(os, "setpgid"):
+        os.setpgid(0, 0)
+
+    # Notify the worker to the pool (before the initializer, that may crash)
+    start_queue.put((None, os.getpid()))
+
+    if memory_limit_mb:
+        process_memory_limit(memory_limit_mb * 1024**2)
+
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _run_task(task_id: int, fn: Callable, args: Tuple[Any, ...], kwargs: Dict):
+    # Notify the start of the task to the pool (start of the timeout)
+    _START_QUEUE.put((task_id, os.getpid()))
+
+    return fn(*args, **kwargs)
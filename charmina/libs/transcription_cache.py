@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+from typing import Any, Dict
+from charmina.config import Config
+from charmina.libs.file_cache import FileCache
+from charmina.libs.helpers import file_content_hash
+
+
+_TRANSCRIPT_FILE_EXTENSION = ".txt"
+_AUDIO_HASH_FILE_EXTENSION = ".audio_hash"
+_SOURCE_HASH_FILE_EXTENSION = ".source_hash"
+
+
+def get_transcription_settings(
+    model_name: str = None,
+    package: str = None,
+    transcription_mode: str = None,
+    beam_size: int = None,
+    compute_type: str = None,
+    **_kwconfig,
+) -> Dict[str, Any]:
+    """Settings of a transcription that change its transcript (part of the cache key)."""
+    config = Config.instance()
+
+    return {
+        "model_name": model_name or config.WHISPER_TRANSCRIPTION_MODEL_NAME,
+        "package": package or config.WHISPER_PACKAGE_NAME,
+        "transcription_mode": transcription_mode or "sequential",
+        "language": "en",
+        # Only when set explicitly (keep the keys of the default beam size)
+        **({"beam_size": int(beam_size)} if beam_size else {}),
+        # Only when set explicitly (the default one depends on the device of the worker)
+        **({"compute_type": compute_type} if compute_type else {}),
+    }
+
+
+class TranscriptionCache(FileCache):
+    """
+    On-disk cache of transcripts keyed by the hash of the decoded audio and the transcription
+    settings (model, mode, language), so the same audio is never transcribed twice (ie: the same
+    episode downloaded from youtube and podcast sources, or renamed after a title change).
+
+    An index maps the content hash of the source files to the hash of their decoded audio, so the
+    transcript of a known source file is found without decoding it. The content hash of the source
+    files is cached by path, size and modification time, so unchanged files aren't read again.
+
+    Args:
+        directory_path: Path to the cache directory. Default: `transcripts` in CACHE_DIRECTORY_PATH.
+        max_size: Maximum size of the cache in bytes. Default: TRANSCRIPTION_CACHE_MAX_SIZE_MB.
+    """
+
+    def __init__(self, directory_path: str = None, max_size: int = None):
+        config = Config.instance()
+        super().__init__(
+            directory_path=directory_path
+            or os.path.join(config.CACHE_DIRECTORY_PATH, "transcripts"),
+            max_size=(
+                max_size
+                if max_size is not None
+                else config.TRANSCRIPTION_CACHE_MAX_SIZE_MB * 1024**2
+            ),
+        )
+
+    @staticmethod
+    def get_audio_hash(audio) -> str:
+        """SHA-256 hex digest of a decoded audio (contiguous array or buffer)."""
+        return hashlib.sha256(audio).hexdigest()
+
+    @staticmethod
+    def get_transcript_key(audio_hash: str, settings: Dict[str, Any]) -> str:
+        return hashlib.sha256(
+            json.dumps({"audio_hash": audio_hash, **settings}, sort_keys=True).encode()
+        ).hexdigest()
+
+    def get_transcript(self, audio_hash: str, settings: Dict[str, Any]) -> str | None:
+        cached_path = self.get(
+            self.get_transcript_key(audio_hash, settings), _TRANSCRIPT_FILE_EXTENSION
+        )
+        return self._read(cached_path)
+
+    def put_transcript(
+        self, audio_hash: str, settings: Dict[str, Any], transcript: str
+    ):
+        if not self.enabled:
+            return
+
+        self.put(
+            self.get_transcript_key(audio_hash, settings),
+            _TRANSCRIPT_FILE_EXTENSION,
+            lambda temp_path: self._write(temp_path, transcript),
+        )
+
+    def get_source_audio_hash(self, source_hash: str) -> str | None:
+        cached_path = self.get(source_hash, _AUDIO_HASH_FILE_EXTENSION)
+        return self._read(cached_path)
+
+    def put_source_audio_hash(self, source_hash: str, audio_hash: str):
+        if not self.enabled:
+            return
+
+        self.put(
+            source_hash,
+            _AUDIO_HASH_FILE_EXTENSION,
+            lambda temp_path: self._write(temp_path, audio_hash),
+        )
+
+    def get_source_hash(self, file_path: str) -> str:
+        """Content hash of a source file, only read when its size or modification time change."""
+        if not self.enabled:
+            return file_content_hash(file_path)
+
+        # One entry per source path (replaced when the file changes)
+        stat = os.stat(file_path)
+        file_stat = [stat.st_size, stat.st_mtime_ns]
+        path_key = hashlib.sha256(os.path.abspath(file_path).encode()).hexdigest()
+        try:
+            cached_stat, source_hash = json.loads(
+                self._read(self.get(path_key, _SOURCE_HASH_FILE_EXTENSION)) or "null"
+            )
+            if cached_stat == file_stat:
+                return source_hash
+        except (TypeError, ValueError):
+            pass
+
+        source_hash = file_content_hash(file_path)
+        self.put(
+            path_key,
+            _SOURCE_HASH_FILE_EXTENSION,
+            lambda temp_path: self._write(
+                temp_path, json.dumps([file_stat, source_hash])
+            ),
+        )
+        return source_hash
+
+    def get_source_transcript(
+        self, file_path: str, settings: Dict[str, Any]
+    ) -> str | None:
+        """Get the cached transcript of a source file, without decoding it."""
+        return self._read(self.get_source_transcript_path(file_path, settings))
+
+    def get_source_transcript_path(
+        self, file_path: str, settings: Dict[str, Any]
+    ) -> str | None:
+        """Path of the cached transcript of a source file (ie: check it without reading it)."""
+        if not self.enabled:
+            return None
+
+        audio_hash = self.get_source_audio_hash(self.get_source_hash(file_path))
+        if not audio_hash:
+            return None
+
+        return self.get(
+            self.get_transcript_key(audio_hash, settings), _TRANSCRIPT_FILE_EXTENSION
+        )
+
+    @staticmethod
+    def _read(file_path: str | None) -> str | None:
+        if not file_path:
+            return None
+
+        try:
+            with open(file_path, "r", encoding="utf-8") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write(file_path: str, text: str):
+        with open(file_path, "w", encoding="utf-8") as file:
+            file.write(text)
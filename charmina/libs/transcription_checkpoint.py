@@ -0,0 +1,106 @@
+import os
+import json
+import logging
+from typing import Any, Dict, List, Tuple
+
+
+class TranscriptionCheckpoint:
+    """
+    Append-only checkpoint (JSON lines) of the segments of a transcription in progress.
+
+    The first line is a header with the settings of the transcription (model, source file size,
+    etc). A checkpoint written with different settings is discarded. Every completed segment is
+    flushed to disk as soon as it's transcribed, so an interrupted transcription can be resumed
+    from the last completed timestamp.
+
+    Args:
+        path: Path to the checkpoint file. If None, segments are only kept in memory.
+        settings: Settings of the transcription, written in the header line.
+    """
+
+    path: str | None
+    settings: Dict[str, Any]
+    segments: List[Tuple[float, float, str]]
+
+    def __init__(self, path: str | None, settings: Dict[str, Any]):
+        self.path = path
+        self.settings = settings
+        self.segments = []
+        self._file = None
+
+        self.load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def last_timestamp(self) -> float:
+        """End timestamp (in seconds) of the last completed segment."""
+        return self.segments[-1][1] if self.segments else 0.0
+
+    @property
+    def text(self) -> str:
+        return "".join(text for _, _, text in self.segments)
+
+    def load(self):
+        self.segments = []
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                header = json.loads(file.readline() or "{}")
+                if header != self.settings:
+                    logging.debug(
+                        f"Discard checkpoint with other settings: {self.path}"
+                    )
+                    return
+
+                for line in file:
+                    try:
+                        segment = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # Truncated last line (interrupted while writing)
+
+                    self.segments.append(
+                        (segment["start"], segment["end"], segment["text"])
+                    )
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Unable to read checkpoint '{self.path}': {e}")
+            self.segments = []
+
+    def append(self, start: float, end: float, text: str):
+        """Add a completed segment and flush it to the checkpoint file."""
+        if self.path:
+            if not self._file:
+                self._open()
+
+            self._file.write(
+                json.dumps({"start": start, "end": end, "text": text}) + "\n"
+            )
+            self._file.flush()
+
+        self.segments.append((start, end, text))
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _open(self):
+        # Rewrite the valid part of the checkpoint (drop truncated lines and stale settings)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write(json.dumps(self.settings) + "\n")
+        for start, end, text in self.segments:
+            self._file.write(
+                json.dumps({"start": start, "end": end, "text": text}) + "\n"
+            )
+        self._file.flush()
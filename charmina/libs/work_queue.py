@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import socket
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Set, Tuple, TypeVar, Union
+from charmina.libs.helpers import get_portable_path
+
+
+_LEASE_FILE_EXTENSION = ".lease"
+_DEFAULT_LEASE_SECONDS = 120
+
+T = TypeVar("T")
+
+
+class WorkQueue:
+    """
+    Leases of the files processed by several nodes (ie: machines sharing the project directory over
+    NFS), so each file is processed by a single node. A lease is a lock file in the leases
+    directory, created exclusively (O_EXCL) by the node claiming the file and removed when it's
+    done. The nodes renew the modification time of their leases (heartbeat) every third of
+    `lease_seconds`, and the leases not renewed for `lease_seconds` (dead or stalled nodes) can be
+    claimed by other nodes. An expired lease is taken over by renaming it aside and checking it's
+    still the one seen expired (same node and modification time), otherwise it's put back: a node
+    renewing its lease or taking it over meanwhile keeps it.
+
+    The nodes find the files to process on their own (the pending files are the stale ones in the
+    manifest). The clocks of the nodes must be roughly in sync (within `lease_seconds`). The files
+    are leased by their path relative to `base_path`, so the nodes may mount the project directory
+    at different paths.
+
+    Args:
+        leases_directory_path: Path to the leases directory (created if it doesn't exist).
+        base_path: Directory the leased paths are relative to. Default: the leases directory parent.
+        node_id: Name of the node in the leases. Default: host name and process id.
+        lease_seconds: Seconds without heartbeat before a lease expires. Default: 120.
+    """
+
+    def __init__(
+        self,
+        leases_directory_path: Union[Path, str],
+        base_path: Union[Path, str] = None,
+        node_id: str = None,
+        lease_seconds: float = _DEFAULT_LEASE_SECONDS,
+    ):
+        self.leases_directory_path = str(leases_directory_path)
+        self.base_path = str(
+            base_path or os.path.dirname(os.path.abspath(self.leases_directory_path))
+        )
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = max(1.0, float(lease_seconds or _DEFAULT_LEASE_SECONDS))
+
+        self._lock = threading.Lock()
+        self._leases: Dict[Tuple[str, str], str] = {}
+        self._failed: Set[Tuple[str, str]] = set()
+        self._claimed_count = 0
+        self._heartbeat_thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._stopped.clear()
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat, name="WorkQueueHeartbeat", daemon=True
+        )
+        self._heartbeat_thread.start()
+
+    def stop(self):
+        """Stop the heartbeat and release the leases still held (ie: interrupted)."""
+        self._stopped.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+
+        for stage, source_path in list(self._leases):
+            self.release(stage, source_path)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def claimed_count(self) -> int:
+        """Number of files claimed by this node."""
+        return self._claimed_count
+
+    def claim(self, stage: str, source_path: str) -> bool:
+        """Lease a file to this node. False if it's leased by another node (or failed in this one)."""
+        key = (stage, get_portable_path(source_path, self.base_path))
+        if key in self._failed:
+            return False
+        with self._lock:
+            if key in self._leases:
+                return True
+
+        lease_path = self._get_lease_path(*key)
+        os.makedirs(os.path.dirname(lease_path), exist_ok=True)
+        if not self._create_lease(lease_path, key[1]):
+            if not self._take_over_lease(lease_path, key[1]):
+                return False
+
+        with self._lock:
+            self._leases[key] = lease_path
+            self._claimed_count += 1
+        return True
+
+    def release(self, stage: str, source_path: str, failed: bool = False):
+        """Remove the lease of a file. Failed files aren't claimed again by this node."""
+        key = (stage, get_portable_path(source_path, self.base_path))
+        if failed:
+            self._failed.add(key)
+
+        with self._lock:
+            lease_path = self._leases.pop(key, None)
+        if lease_path is None:
+            return
+
+        # Don't remove the lease of another node (ie: taken over after a stall)
+        if WorkQueue._get_node(lease_path) != self.node_id:
+            logging.warning(f"Lease of {key[1]} was taken over by another node")
+            return
+
+        try:
+            os.remove(lease_path)
+        except FileNotFoundError:
+            pass
+
+    def iclaim(
+        self,
+        stage: str,
+        items: Iterable[T],
+        get_source_path: Callable[[T], str],
+        replan: Callable[[T], T | None] = None,
+    ) -> Iterator[T]:
+        """
+        Yield the items whose file is claimed by this node, skipping the ones leased by other
+        nodes. Claimed items are planned again with `replan` (ie: completed by another node since
+        they were planned), and released if it returns None.
+        """
+        for item in items:
+            source_path = get_source_path(item)
+            if not self.claim(stage, source_path):
+                continue
+
+            if replan is not None:
+                item = replan(item)
+                if item is None:
+                    self.release(stage, source_path)
+                    continue
+
+            yield item
+
+    def has_active_leases(self, stage: str) -> bool:
+        """True if other nodes hold leases not expired of a stage (ie: files still in progress)."""
+        stage_directory_path = os.path.join(self.leases_directory_path, stage)
+        try:
+            lease_file_names = os.listdir(stage_directory_path)
+        except FileNotFoundError:
+            return False
+
+        with self._lock:
+            own_lease_paths = set(self._leases.values())
+        for lease_file_name in lease_file_names:
+            lease_path = os.path.join(stage_directory_path, lease_file_name)
+            if (
+                lease_file_name.endswith(_LEASE_FILE_EXTENSION)
+                and lease_path not in own_lease_paths
+                and not self._is_expired(lease_path)
+            ):
+                return True
+
+        return False
+
+    def _create_lease(self, lease_path: str, source_path: str) -> bool:
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "node": self.node_id,
+                    "source_path": source_path,
+                    "claimed_at": time.time(),
+                },
+                file,
+            )
+        return True
+
+    def _take_over_lease(self, lease_path: str, source_path: str) -> bool:
+        expired_lease = WorkQueue._read_lease(lease_path)
+        if expired_lease is None or not self._is_expired(lease_path):
+            return False
+
+        # Move the lease aside and check it's still the expired one (not renewed by its node, or
+        # taken over by another node since it was read)
+        expired_lease_path = f"{lease_path}.{self.node_id}.expired"
+        try:
+            os.rename(lease_path, expired_lease_path)
+        except FileNotFoundError:
+            return False
+
+        if WorkQueue._read_lease(expired_lease_path) != expired_lease:
+            # Put it back, unless a new lease was created meanwhile
+            try:
+                os.link(expired_lease_path, lease_path)
+            except FileExistsError:
+                logging.warning(f"Lease of {source_path} was claimed by several nodes")
+            os.remove(expired_lease_path)
+            return False
+
+        logging.info(f"Lease of {source_path} expired ({expired_lease[0]})")
+        os.remove(expired_lease_path)
+        return self._create_lease(lease_path, source_path)
+
+    def _is_expired(self, lease_path: str) -> bool:
+        try:
+            return time.time() - os.stat(lease_path).st_mtime > self.lease_seconds
+        except FileNotFoundError:
+            # Released meanwhile (claim it again in the next pass)
+            return False
+
+    def _heartbeat(self):
+        while not self._stopped.wait(self.lease_seconds / 3):
+            with self._lock:
+                lease_items = list(self._leases.items())
+
+            for (_, source_path), lease_path in lease_items:
+                try:
+                    os.utime(lease_path)
+                except FileNotFoundError:
+                    logging.warning(f"Lease of {source_path} was lost (expired)")
+
+    def _get_lease_path(self, stage: str, source_path: str) -> str:
+        key = hashlib.sha256(source_path.encode()).hexdigest()
+        return os.path.join(
+            self.leases_directory_path, stage, f"{key}{_LEASE_FILE_EXTENSION}"
+        )
+
+    @staticmethod
+    def _read_lease(lease_path: str) -> Tuple[str | None, int] | None:
+        """Node and modification time of a lease, or None if it doesn't exist."""
+        try:
+            with open(lease_path, "r", encoding="utf-8") as file:
+                modified_at = os.fstat(file.fileno()).st_mtime_ns
+                try:
+                    node = json.load(file).get("node")
+                except ValueError:
+                    # Empty (ie: its node died while creating it)
+                    node = None
+                return node, modified_at
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _get_node(lease_path: str) -> str | None:
+        try:
+            with open(lease_path, "r", encoding="utf-8") as file:
+                return json.load(file).get("node")
+        except (FileNotFoundError, ValueError):
+            return None
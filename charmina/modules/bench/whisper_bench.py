@@ -0,0 +1,196 @@
+import os
+import time
+import logging
+import itertools
+import multiprocessing
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from charmina.libs.event_emitter import EventEmitter
+
+_SAMPLING_RATE = 16000
+_WORKERS_START_TIMEOUT = (
+    600  # Maximum seconds waiting for the workers to load the model
+)
+
+_DEFAULT_COMPUTE_TYPES = ["int8", "int8_float32", "float32"]
+_DEFAULT_BEAM_SIZES = [1, 5]
+_DEFAULT_WORKERS = [1, 2]
+
+
+@dataclass
+class WhisperBenchProfile:
+    """Settings of a benchmarked transcription and its real-time factor."""
+
+    compute_type: str
+    cpu_threads: int  # Threads per worker
+    beam_size: int
+    workers: int
+    elapsed: float = None  # Seconds transcribing the clip in every worker (wall time)
+    rtf: float = None  # Real-time factor: seconds of processing per second of audio
+
+    def get_transform_config(self) -> Dict[str, Any]:
+        """Values of the `transform` section of the project config (see TransformRunner)."""
+        return {
+            "compute_type": self.compute_type,
+            "cpu_threads": self.cpu_threads * self.workers,
+            "beam_size": self.beam_size,
+            "workers": self.workers,
+        }
+
+
+class WhisperBench(EventEmitter):
+    """
+    Benchmark faster-whisper transcriptions of a reference clip across compute types, threads per
+    worker, beam sizes and worker processes. Each combination transcribes the clip in every worker at
+    the same time (as TransformRunner workers do) and reports its real-time factor.
+
+    Args:
+        model_name: Whisper model name. Default: WHISPER_TRANSCRIPTION_MODEL_NAME.
+        compute_types: Compute types to benchmark.
+        cpu_threads: Threads per worker to benchmark. Default: powers of 2 up to the CPU count.
+        beam_sizes: Beam sizes to benchmark.
+        workers: Numbers of worker processes to benchmark.
+    """
+
+    def __init__(
+        self,
+        model_name: str = None,
+        compute_types: List[str] = None,
+        cpu_threads: List[int] = None,
+        beam_sizes: List[int] = None,
+        workers: List[int] = None,
+    ):
+        super().__init__()
+        self.model_name = model_name
+        self.compute_types = compute_types or _DEFAULT_COMPUTE_TYPES
+        self.cpu_threads = cpu_threads or WhisperBench.get_default_cpu_threads()
+        self.beam_sizes = beam_sizes or _DEFAULT_BEAM_SIZES
+        self.workers = workers or _DEFAULT_WORKERS
+
+    def get_profiles(self) -> List[WhisperBenchProfile]:
+        """Combinations to benchmark (skip the ones with more threads than CPU cores)."""
+        cpu_count = os.cpu_count() or 1
+        return [
+            WhisperBenchProfile(
+                compute_type=compute_type,
+                cpu_threads=cpu_threads,
+                beam_size=beam_size,
+                workers=workers,
+            )
+            for compute_type, cpu_threads, beam_size, workers in itertools.product(
+                self.compute_types, self.cpu_threads, self.beam_sizes, self.workers
+            )
+            if cpu_threads * workers <= cpu_count
+        ]
+
+    def run(
+        self, clip_path: str, duration: float = None
+    ) -> Tuple[List[WhisperBenchProfile], List[Exception]]:
+        """Benchmark every profile with the clip (first `duration` seconds)."""
+        # Module local import (heavy dependencies)
+        from faster_whisper.audio import decode_audio
+
+        audio = decode_audio(clip_path, sampling_rate=_SAMPLING_RATE)
+        if duration:
+            audio = audio[: int(duration * _SAMPLING_RATE)]
+        audio_duration = len(audio) / _SAMPLING_RATE
+        if not audio_duration:
+            raise ValueError(f"Empty reference clip: {clip_path}")
+
+        profiles = self.get_profiles()
+        self.emit("start", len(profiles))
+
+        results = []
+        errors = []
+        for profile in profiles:
+            try:
+                profile.elapsed = self.run_profile(profile, audio)
+                profile.rtf = profile.elapsed / (audio_duration * profile.workers)
+                results.append(profile)
+                self.emit(
+                    "write",
+                    f"{profile.compute_type}, {profile.cpu_threads} threads, beam {profile.beam_size}, {profile.workers} workers: RTF {profile.rtf:.3f}",
+                )
+            except Exception as e:
+                errors.append(e)
+                self.emit("write", f"{profile}: {e}", is_error=True)
+                logging.debug(f"Error benchmarking profile {profile}", exc_info=e)
+            finally:
+                self.emit("update")
+
+        self.emit("close")
+
+        return sorted(results, key=lambda result: result.rtf), errors
+
+    def run_profile(self, profile: WhisperBenchProfile, audio: np.ndarray) -> float:
+        """Transcribe the audio in every worker process at once. Return the wall time."""
+        worker_settings = {
+            "model_name": self.model_name,
+            "compute_type": profile.compute_type,
+            "cpu_threads": profile.cpu_threads,
+            "beam_size": profile.beam_size,
+        }
+
+        # Start transcribing once every worker has loaded the model (not timed)
+        barrier = multiprocessing.Barrier(profile.workers)
+        with ProcessPoolExecutor(
+            max_workers=profile.workers,
+            initializer=WhisperBench.init_worker,
+            initargs=(worker_settings, barrier),
+        ) as executor:
+            timings = list(
+                executor.map(
+                    WhisperBench.transcribe,
+                    [worker_settings] * profile.workers,
+                    [audio] * profile.workers,
+                )
+            )
+
+        return max(end for _, end in timings) - min(start for start, _ in timings)
+
+    @staticmethod
+    def init_worker(worker_settings: Dict[str, Any], barrier):
+        """Worker initializer. Load the model and wait for the other workers."""
+        WhisperBench.get_transformer(worker_settings).load_model()
+        barrier.wait(timeout=_WORKERS_START_TIMEOUT)
+
+    @staticmethod
+    def transcribe(
+        worker_settings: Dict[str, Any], audio: np.ndarray
+    ) -> Tuple[float, float]:
+        """Transcribe the audio. Return the start and end times."""
+        transformer = WhisperBench.get_transformer(worker_settings)
+        model = transformer.load_model()
+
+        start = time.time()
+        segments, _ = model.transcribe(
+            audio,
+            beam_size=transformer.get_beam_size(),
+            language="en",
+            without_timestamps=True,
+            condition_on_previous_text=False,
+        )
+        for _ in segments:  # segments are transcribed lazily
+            pass
+
+        return start, time.time()
+
+    @staticmethod
+    def get_transformer(worker_settings: Dict[str, Any]):
+        # Module local import (heavy dependencies)
+        from charmina.modules.transform.transformers import Mp3Transformer
+
+        return Mp3Transformer(
+            file_path=None, package="faster-whisper", **worker_settings
+        )
+
+    @staticmethod
+    def get_default_cpu_threads() -> List[int]:
+        cpu_count = os.cpu_count() or 1
+        cpu_threads = [2**exponent for exponent in range(cpu_count.bit_length())]
+        if cpu_threads[-1] != cpu_count:
+            cpu_threads.append(cpu_count)
+
+        return cpu_threads
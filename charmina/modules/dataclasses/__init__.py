@@ -3,6 +3,7 @@ __all__ = [
     "MetadataDataFile",
     "Transformation",
     "TransformationDataFile",
+    "TransformationDetails",
     "TransformConfig",
 ]
 
@@ -10,5 +11,6 @@ from charmina.modules.dataclasses.metadata import Metadata, MetadataDataFile
 from charmina.modules.dataclasses.transformation import (
     Transformation,
     TransformationDataFile,
+    TransformationDetails,
 )
 from charmina.modules.dataclasses.transform_config import TransformConfig
@@ -1,18 +1,31 @@
 # from __future__ import annotations
 
 import os
-from typing import List
+from typing import Dict, Iterable, List
 from dataclasses import dataclass
+import yaml
 from datafiles import datafile, formats, field
 
 
 TRANSFORM_FILE_EXTENSION = ".transform.yml"
 formats.register(TRANSFORM_FILE_EXTENSION, formats.YAML)
 
+# Partial output of a transformation in progress (ie: transcribed segments)
+TRANSFORM_CHECKPOINT_FILE_EXTENSION = ".transform.partial"
+
+
+@dataclass
+class TransformationDetails:
+    # Conversion path of the PDF pages (page ranges)
+    text_layer_pages: str = ""
+    marker_pages: str = ""
+    cached_pages: str = ""
+
 
 @dataclass
 class Transformation:
     chunks: List[str] = field(default_factory=list)
+    details: TransformationDetails = field(default_factory=TransformationDetails)
 
 
 @datafile(
@@ -30,3 +43,45 @@ class TransformationDataFile(Transformation):
             if self.source_path.endswith(TRANSFORM_FILE_EXTENSION)
             else self.source_path
         )
+
+
+def save_transformation_chunks(
+    source_path: str, chunks: Iterable[str], details: Dict[str, str] = None
+) -> str:
+    """
+    Write the transformation file of a source file chunk by chunk (ie: chunks of a large text file
+    streamed by the transformer), without holding all the chunks in memory. Return the file path.
+    The file is loaded as any other with TransformationDataFile.
+    """
+    source_path = os.path.abspath(
+        source_path[: -len(TRANSFORM_FILE_EXTENSION)]
+        if source_path.endswith(TRANSFORM_FILE_EXTENSION)
+        else source_path
+    )
+    file_path = f"{source_path}{TRANSFORM_FILE_EXTENSION}"
+    temp_file_path = f"{file_path}.{os.getpid()}.tmp"
+
+    # Use the libyaml emitter if available (much faster with large chunks)
+    dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+    try:
+        with open(temp_file_path, "w", encoding="utf-8") as file:
+            has_chunks = False
+            for chunk in chunks:
+                if not has_chunks:
+                    file.write("chunks:\n")
+                    has_chunks = True
+                file.write(yaml.dump([chunk], Dumper=dumper, allow_unicode=True))
+
+            if not has_chunks:
+                file.write("chunks: []\n")
+
+            file.write(
+                yaml.dump({"details": details or {}}, Dumper=dumper, allow_unicode=True)
+            )
+
+        os.replace(temp_file_path, file_path)
+    finally:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+
+    return file_path
@@ -1,48 +1,94 @@
 import os
 import glob
 import logging
+from itertools import islice
 from typing import Iterable, List, Tuple, Dict, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 
+from charmina.libs.build_manifest import (
+    BuildManifest,
+    ManifestEntry,
+    get_config_hash,
+)
 from charmina.libs.event_emitter import EventEmitter
-from charmina.libs.helpers import sanitize_text, replace_file_path_root
-from charmina.modules.dataclasses import Metadata, MetadataDataFile
-from charmina.modules.extract.meta_extractors import (
-    DefaultMetaExtractor,
-    Mp3MetaExtractor,
+from charmina.libs.helpers import (
+    sanitize_text,
+    replace_file_path_root,
+    submit_bounded,
 )
+from charmina.libs.job_cost import JOB_ORDERS, order_jobs
+from charmina.modules.dataclasses import Metadata, MetadataDataFile
+from charmina.modules.dataclasses.metadata import METADATA_FILE_EXTENSION
+from charmina.libs.lazy_registry import LazyRegistry
+from charmina.libs.source_index import SourceIndex
+from charmina.libs.work_queue import WorkQueue
 from charmina.modules.llm.llm import LLM
 
-_RUN_TASKS_LIMIT = 1_000  # Maximum number of tasks to run in a single call to run()
 _MAX_WORKERS = (
     4 if os.cpu_count() > 4 else 2
 )  # Maximum number of workers to run in parallel
-
-
-# Map file extensions to extract runners and their arguments
-_META_EXTRACTOR_MAPPING = {
-    ".mp3": (Mp3MetaExtractor, {}),
-    ".mp4": (Mp3MetaExtractor, {}),
-    ".pdf": (DefaultMetaExtractor, {}),
-    ".txt": (DefaultMetaExtractor, {}),
-    ".md": (DefaultMetaExtractor, {}),
-    # Add more mappings for other file extensions and meta_extractors as needed
-}
+_MAX_PENDING_TASKS = _MAX_WORKERS * 2  # Maximum number of tasks not completed
+
+
+_META_EXTRACTORS_PACKAGE = "charmina.modules.extract.meta_extractors"
+
+# Map file extensions to meta extractors and their arguments. Extractors are imported on first use
+# Third-party extractors can be registered with entry points of the group "charmina.meta_extractors"
+_META_EXTRACTOR_MAPPING = LazyRegistry(
+    {
+        ".mp3": (f"{_META_EXTRACTORS_PACKAGE}.mp3_meta_extractor:Mp3MetaExtractor", {}),
+        ".mp4": (f"{_META_EXTRACTORS_PACKAGE}.mp3_meta_extractor:Mp3MetaExtractor", {}),
+        ".pdf": (
+            f"{_META_EXTRACTORS_PACKAGE}.default_meta_extractor:DefaultMetaExtractor",
+            {},
+        ),
+        ".txt": (
+            f"{_META_EXTRACTORS_PACKAGE}.default_meta_extractor:DefaultMetaExtractor",
+            {},
+        ),
+        ".md": (
+            f"{_META_EXTRACTORS_PACKAGE}.default_meta_extractor:DefaultMetaExtractor",
+            {},
+        ),
+        ".caption": (
+            f"{_META_EXTRACTORS_PACKAGE}.caption_meta_extractor:CaptionMetaExtractor",
+            {},
+        ),
+        ".srt": (
+            f"{_META_EXTRACTORS_PACKAGE}.caption_meta_extractor:CaptionMetaExtractor",
+            {},
+        ),
+        ".vtt": (
+            f"{_META_EXTRACTORS_PACKAGE}.caption_meta_extractor:CaptionMetaExtractor",
+            {},
+        ),
+        # Add more mappings for other file extensions and meta extractors as needed
+    },
+    entry_point_group="charmina.meta_extractors",
+)
 
 
 class ExtractRunner(EventEmitter):
     llm_config: Dict[str, Any] = None
     use_llm_refine_description: bool = False
+    order: str = "none"
 
     def __init__(
         self,
         use_llm_refine_description: bool = False,
         prompts: Dict[str, str] = None,
         openai: Dict[str, str] = None,
+        order: str = "none",
         **_kwconfig,
     ):
         super().__init__()
 
+        if order not in JOB_ORDERS:
+            raise ValueError(
+                f"Invalid extract order '{order}'. Values: {', '.join(JOB_ORDERS)}"
+            )
+        self.order = order
+
         if (use_llm_refine_description) and not (prompts or openai):
             raise ValueError("LLM prompts and OpenAI API key must be provided")
 
@@ -59,7 +105,10 @@ class ExtractRunner(EventEmitter):
         file_search_pattern: str = None,
         overwrite: bool = False,
         dry_run: bool = False,
-        limit: int = _RUN_TASKS_LIMIT,
+        limit: int = None,
+        manifest: BuildManifest = None,
+        source_index: SourceIndex = None,
+        work_queue: WorkQueue = None,
     ) -> Tuple[List[str], List[any]]:
         logging.debug("Starting extract runner...")
 
@@ -68,90 +117,103 @@ class ExtractRunner(EventEmitter):
 
         elif not source_files:
             logging.debug("Finding source files...")
-            source_files = ExtractRunner.ifind_source_files(source_directory)
+            source_files = ExtractRunner.ifind_source_files(
+                source_directory, source_index
+            )
 
             # Sort reverse files to process the most recent first
             # source_files = sorted(source_files, reverse=True)
 
-        missing_output_directories = set()
-        extract_file_arguments = []
-        for source_file in source_files:
-            # Filter out files that don't match the search pattern
-            if file_search_pattern and file_search_pattern not in source_file:
-                continue
-
-            # Locate output file and check if it exists
-            output_source_path = replace_file_path_root(
-                file_path=source_file,
-                input_root_path=source_root_path,
-                output_root_path=output_root_path,
-            )
-
-            # Load metadata file and check if it exists
-            metadata_file = MetadataDataFile(source_path=output_source_path)
-            if not overwrite and metadata_file.datafile.exists:
-                logging.debug(
-                    f"Metadata file already exists: {metadata_file.datafile.path}"
-                )
-                continue
-
-            extract_file_arguments.append(
-                {
-                    "input_source_file_path": source_file,
-                    "output_directory_path": os.path.dirname(output_source_path),
-                }
-            )
+        # Plan the files lazily (the first files are extracted while the rest are found)
+        planned_files = self.iplan_files(
+            source_files,
+            source_root_path=source_root_path,
+            output_root_path=output_root_path,
+            file_search_pattern=file_search_pattern,
+            overwrite=overwrite,
+            manifest=manifest,
+        )
 
-            # Add missing output directories
-            missing_output_directories.add(
-                extract_file_arguments[-1]["output_directory_path"]
-            )
+        # Limit number of tasks to run
+        if limit and limit > 0:
+            planned_files = islice(planned_files, limit)
 
         # Return dry run result
         if dry_run == True:
             return [
-                argument["output_directory_path"] for argument in extract_file_arguments
+                argument["output_directory_path"] for argument, _ in planned_files
             ], []
 
-        # Return if no files to process
-        if len(extract_file_arguments) == 0:
-            logging.debug("No source files to extract")
-            return [], []
-
-        # Create missing output directories
-        for missing_output_directory in missing_output_directories:
-            os.makedirs(missing_output_directory, exist_ok=True)
+        # Submit the files by estimated cost (all the files are planned first)
+        if self.order != "none":
+            planned_files = order_jobs(
+                list(planned_files),
+                self.order,
+                get_path=lambda planned_file: planned_file[0]["input_source_file_path"],
+            )
 
-        # Limit number of tasks to run
-        if not limit or not 0 < limit < _RUN_TASKS_LIMIT:
-            limit = _RUN_TASKS_LIMIT
-        if len(extract_file_arguments) > limit:
-            logging.warning(
-                f"Number of files to extract cut to limit {limit} (out of {len(extract_file_arguments)})"
+        # Claim the files as they're submitted (skip the files leased by other nodes)
+        if work_queue is not None:
+
+            def replan_file(planned_file: Tuple[Dict[str, Any], ManifestEntry | None]):
+                # Processed by another node since it was planned
+                source_path = planned_file[0]["input_source_file_path"]
+                if manifest is not None:
+                    manifest.refresh_entry("extract", source_path)
+                replanned_file = self.plan_file(
+                    source_path,
+                    source_root_path=source_root_path,
+                    output_root_path=output_root_path,
+                    overwrite=overwrite,
+                    manifest=manifest,
+                )
+                return replanned_file if replanned_file[0] is not None else None
+
+            planned_files = work_queue.iclaim(
+                "extract",
+                planned_files,
+                get_source_path=lambda planned_file: planned_file[0][
+                    "input_source_file_path"
+                ],
+                replan=replan_file,
             )
-            extract_file_arguments = extract_file_arguments[:limit]
 
-        logging.debug(f"Start extracting {len(extract_file_arguments)} files...")
+        logging.debug("Start extracting files...")
 
-        # Emit start event (show progress bar in UI)
-        self.emit("start", len(extract_file_arguments))
+        # Emit start event (show progress bar in UI, the total is unknown while planning lazily)
+        if isinstance(planned_files, list):
+            self.emit("start", len(planned_files))
+        else:
+            self.emit("start")
 
         results = []
         errors = []
         with ThreadPoolExecutor(
             max_workers=_MAX_WORKERS, thread_name_prefix="ExtractRunner"
         ) as executor:
-            response_futures = [
-                executor.submit(self.extract_file, **extract_file_argument)
-                for extract_file_argument in extract_file_arguments
-            ]
 
-            for response_future in as_completed(response_futures):
+            def submit(planned_file: Tuple[Dict[str, Any], ManifestEntry | None]):
+                extract_file_argument = planned_file[0]
+
+                # Create missing output directory
+                os.makedirs(
+                    extract_file_argument["output_directory_path"], exist_ok=True
+                )
+                return executor.submit(self.extract_file, **extract_file_argument)
+
+            for (argument, manifest_entry), response_future in submit_bounded(
+                submit, planned_files, max_pending=_MAX_PENDING_TASKS
+            ):
                 try:
                     response = response_future.result()
                     if response:
                         results.append(response)
                         self.emit("write", str(response))
+
+                        # Record the extracted file in the manifest
+                        if manifest_entry is not None:
+                            manifest_entry.output_paths = [response]
+                            manifest.put("extract", [manifest_entry])
                     else:
                         self.emit("write", "")
                 except Exception as err:
@@ -159,14 +221,109 @@ class ExtractRunner(EventEmitter):
                     self.emit("write", str(err), is_error=True)
                     continue
                 finally:
+                    if work_queue is not None:
+                        work_queue.release(
+                            "extract",
+                            argument["input_source_file_path"],
+                            failed=response_future.exception() is not None,
+                        )
                     self.emit("update")
 
+        # Record the files found up to date
+        if manifest is not None:
+            manifest.put_pending()
+
         self.emit("close")
         return results, errors
 
+    def iplan_files(
+        self,
+        source_files: Iterable[str],
+        source_root_path: str = None,
+        output_root_path: str = None,
+        file_search_pattern: str = None,
+        overwrite: bool = False,
+        manifest: BuildManifest = None,
+    ) -> Iterable[Tuple[Dict[str, Any], ManifestEntry | None]]:
+        """Yield the arguments of extract_file() and manifest entries of the files to extract."""
+        for source_file in source_files:
+            # Filter out files that don't match the search pattern
+            if file_search_pattern and file_search_pattern not in source_file:
+                continue
+
+            extract_file_argument, manifest_entry = self.plan_file(
+                source_file,
+                source_root_path=source_root_path,
+                output_root_path=output_root_path,
+                overwrite=overwrite,
+                manifest=manifest,
+            )
+            if extract_file_argument is not None:
+                yield extract_file_argument, manifest_entry
+
+    def get_config_hash(self) -> str:
+        """Hash of the config that changes the metadata files (stale files in the manifest)."""
+        return get_config_hash(
+            self.use_llm_refine_description,
+            self.prompts if self.use_llm_refine_description else None,
+        )
+
+    def plan_file(
+        self,
+        source_file: str,
+        source_root_path: str = None,
+        output_root_path: str = None,
+        overwrite: bool = False,
+        manifest: BuildManifest = None,
+    ) -> Tuple[Dict[str, Any] | None, ManifestEntry | None]:
+        """
+        Arguments of extract_file() for a source file and its manifest entry, or None if the
+        metadata file is up to date.
+        """
+        # Locate output file and check if it exists
+        output_source_path = replace_file_path_root(
+            file_path=source_file,
+            input_root_path=source_root_path,
+            output_root_path=output_root_path,
+        )
+
+        # Check if the metadata file exists (without loading it)
+        metadata_file_path = f"{output_source_path}{METADATA_FILE_EXTENSION}"
+        manifest_entry = None
+        if manifest is not None:
+            manifest_entry = manifest.get_stale_entry(
+                "extract",
+                source_path=source_file,
+                input_paths=[source_file],
+                config_hash=self.get_config_hash(),
+                existing_output_paths=(
+                    [metadata_file_path] if os.path.exists(metadata_file_path) else None
+                ),
+                force=overwrite,
+            )
+            if manifest_entry is None:
+                logging.debug(f"Metadata file is up to date: {metadata_file_path}")
+                return None, None
+        elif not overwrite and os.path.exists(metadata_file_path):
+            logging.debug(f"Metadata file already exists: {metadata_file_path}")
+            return None, None
+
+        return {
+            "input_source_file_path": source_file,
+            "output_directory_path": os.path.dirname(output_source_path),
+        }, manifest_entry
+
     def extract_file(
         self, input_source_file_path: str, output_directory_path: str | None
     ) -> str | None:
+        return self.extract_metadata_file(
+            input_source_file_path, output_directory_path
+        ).datafile.path
+
+    def extract_metadata_file(
+        self, input_source_file_path: str, output_directory_path: str | None
+    ) -> MetadataDataFile:
+        """Extract and save the metadata file of a source file (returned in memory)."""
         if not os.path.exists(input_source_file_path):
             raise FileNotFoundError(f"File not found {input_source_file_path}")
 
@@ -220,15 +377,28 @@ class ExtractRunner(EventEmitter):
 
             metadata_file.datafile.save()
 
-            return metadata_file.datafile.path
+            return metadata_file
         except Exception as e:
             raise Exception(
                 f"Error extracting source file '{input_source_file_path}'"
             ) from e
 
     @staticmethod
-    def ifind_source_files(directory_path: str) -> Iterable[str]:
-        for ext, _ in _META_EXTRACTOR_MAPPING.items():
+    def get_source_extensions() -> List[str]:
+        """Extensions of the source files with a meta extractor."""
+        return list(_META_EXTRACTOR_MAPPING.extensions())
+
+    @staticmethod
+    def ifind_source_files(
+        directory_path: str, source_index: SourceIndex = None
+    ) -> Iterable[str]:
+        if source_index is not None:
+            yield from source_index.find_files(
+                directory_path, _META_EXTRACTOR_MAPPING.extensions()
+            )
+            return
+
+        for ext in _META_EXTRACTOR_MAPPING.extensions():
             for file_path in glob.iglob(
                 os.path.join(directory_path, f"**/*{ext}"), recursive=True
             ):
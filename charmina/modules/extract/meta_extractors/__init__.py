@@ -1,6 +1,17 @@
-__all__ = ["DefaultMetaExtractor", "Mp3MetaExtractor"]
+__all__ = ["CaptionMetaExtractor", "DefaultMetaExtractor", "Mp3MetaExtractor"]
 
-from charmina.modules.extract.meta_extractors.default_meta_extractor import (
-    DefaultMetaExtractor,
-)
-from charmina.modules.extract.meta_extractors.mp3_meta_extractor import Mp3MetaExtractor
+import importlib
+
+# Meta extractors are imported on first use
+_META_EXTRACTOR_MODULES = {
+    "CaptionMetaExtractor": "charmina.modules.extract.meta_extractors.caption_meta_extractor",
+    "DefaultMetaExtractor": "charmina.modules.extract.meta_extractors.default_meta_extractor",
+    "Mp3MetaExtractor": "charmina.modules.extract.meta_extractors.mp3_meta_extractor",
+}
+
+
+def __getattr__(name: str):
+    if name in _META_EXTRACTOR_MODULES:
+        return getattr(importlib.import_module(_META_EXTRACTOR_MODULES[name]), name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,66 @@
+import os
+import re
+from typing import Dict, Any
+
+
+_DATE_PREFIX_REGEX = re.compile(r"^(\d{4}-\d{2}-\d{2})[-\s]+")
+_YOUTUBE_VIDEO_ID_REGEX = re.compile(r"^[\w-]{11}$")
+
+
+class CaptionMetaExtractor:
+    """Load metadata from the file name of a caption file.
+
+    YouTube captions are saved as `[date ]title.video_id.caption` (see YoutubeDownloader),
+    grouped in a directory per channel.
+
+
+    Args:
+        source_path: Path to source file to load.
+    """
+
+    def __init__(
+        self,
+        source_path: str,
+    ):
+        """Initialize with file path."""
+        self.source_path = source_path
+
+    def extract(self) -> Dict[str, Any]:
+        """Load from file path."""
+        basename, ext = os.path.splitext(os.path.basename(self.source_path))
+        metadata = {}
+
+        # Video id suffix of YouTube captions
+        title, _, video_id = basename.rpartition(".")
+        if ext == ".caption" and title and _YOUTUBE_VIDEO_ID_REGEX.match(video_id):
+            metadata["source_id"] = video_id
+            metadata["source_type"] = "youtube"
+            metadata["url"] = f"https://www.youtube.com/watch?v={video_id}"
+
+            # Channel directory (grouped by author)
+            channel = os.path.basename(
+                os.path.dirname(os.path.abspath(self.source_path))
+            )
+            if channel and channel != "youtube":
+                metadata["author"] = CaptionMetaExtractor.unslugify(channel)
+                metadata["album"] = metadata["author"]
+        else:
+            title = basename
+
+        # Date prefix
+        date_prefix_match = _DATE_PREFIX_REGEX.match(title)
+        if date_prefix_match:
+            metadata["publish_date"] = date_prefix_match.group(1)
+            title = title[date_prefix_match.end() :]
+
+        metadata["title"] = CaptionMetaExtractor.unslugify(title)
+
+        return metadata
+
+    @staticmethod
+    def unslugify(text: str) -> str:
+        # Slugified paths have dashes instead of spaces
+        if " " not in text:
+            text = text.replace("-", " ")
+
+        return text.strip()
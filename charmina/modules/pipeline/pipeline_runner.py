@@ -0,0 +1,390 @@
+import os
+import queue
+import logging
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from charmina.libs.build_manifest import BuildManifest, ManifestEntry
+from charmina.libs.event_emitter import EventEmitter
+from charmina.libs.helpers import run_inline
+from charmina.libs.source_index import SourceIndex
+from charmina.libs.transcription_cache import TranscriptionCache
+from charmina.modules.dataclasses import MetadataDataFile
+from charmina.modules.extract.extract_runner import ExtractRunner
+from charmina.modules.extract.extract_runner import _MAX_WORKERS as _EXTRACT_WORKERS
+from charmina.modules.transform.transform_runner import TransformRunner
+from charmina.modules.scribe.scribe_runner import ScribeRunner
+from charmina.modules.scribe.scribe_runner import _MAX_WORKERS as _SCRIBE_WORKERS
+
+_DEFAULT_QUEUE_SIZE = 8  # Maximum number of files waiting or running in each stage
+_MAX_WAITING_TRANSFORMS = (
+    1_000  # Files waiting for a full transform lane (metadata only)
+)
+
+PIPELINE_STAGES = ["extract", "transform", "scribe"]
+
+
+@dataclass
+class _PipelineItem:
+    """A source file flowing through the stages, with the results handed over in memory."""
+
+    source_file: str
+    stage: str = "extract"
+    argument: Dict[str, Any] | None = None
+    manifest_entry: ManifestEntry | None = None
+    metadata_file: MetadataDataFile | None = None
+    transform_source_path: str | None = None
+    transformation_chunks: List[str] | None = None
+    lane: str | None = None  # Transform lane of the file
+    started: bool = False
+
+
+class PipelineRunner(EventEmitter):
+    """
+    Run each source file through extract, transform and scribe as soon as the previous stage
+    finishes it, without waiting for the other files (the first outputs are written while the
+    audios are still transcribing). The stages are connected by bounded queues: a stage only takes
+    new files while the queue of the next one has room, so the memory doesn't grow with the corpus.
+
+    Each transform lane runs up to `queue_size` files, and the files waiting for a full lane are
+    skipped (not the files of the other lanes), so the text files keep flowing while the audio
+    lane is busy.
+
+    The metadata extracted and the transformation chunks are handed over in memory to the next
+    stage instead of loading the YAML files again. The files up to date in a stage skip it.
+
+    Args:
+        extract_runner: Runner of the extract stage.
+        transform_runner: Runner of the transform stage (its lane pools are shared by all the files).
+        scribe_runner: Runner of the scribe stage.
+        queue_size: Maximum number of files waiting or running in each stage. Default: 8.
+    """
+
+    def __init__(
+        self,
+        extract_runner: ExtractRunner,
+        transform_runner: TransformRunner,
+        scribe_runner: ScribeRunner,
+        queue_size: int = _DEFAULT_QUEUE_SIZE,
+    ):
+        super().__init__()
+
+        self.extract_runner = extract_runner
+        self.transform_runner = transform_runner
+        self.scribe_runner = scribe_runner
+        self.queue_size = max(1, int(queue_size or _DEFAULT_QUEUE_SIZE))
+
+    def run(
+        self,
+        source_directory: str = ".",
+        source_files: List[str] = None,
+        source_root_path: str = None,
+        output_root_path: str = None,
+        overwrite: bool = False,
+        limit: int = None,
+        manifest: BuildManifest = None,
+        source_index: SourceIndex = None,
+    ) -> Tuple[List[str], List[any]]:
+        logging.debug("Starting pipeline runner...")
+
+        if not source_files and not source_directory:
+            raise ValueError("No source files or directory provided")
+
+        elif not source_files:
+            logging.debug("Finding source files...")
+            source_files = ExtractRunner.ifind_source_files(
+                source_directory, source_index
+            )
+
+        self._source_files = iter(source_files)
+        self._source_root_path = source_root_path
+        self._output_root_path = output_root_path
+        self._overwrite = overwrite
+        self._limit = limit if limit and limit > 0 else None
+        self._manifest = manifest
+        self._transcription_cache = TranscriptionCache()
+
+        # Files waiting for each stage, and running in each stage
+        self._backlogs: Dict[str, Deque[_PipelineItem]] = {
+            stage: deque() for stage in PIPELINE_STAGES
+        }
+        self._running: Dict[str, int] = {stage: 0 for stage in PIPELINE_STAGES}
+        self._started_files = 0
+
+        # Files waiting for each transform lane, and running in each transform lane
+        self._waiting_lanes: Dict[str, int] = defaultdict(int)
+        self._running_lanes: Dict[str, int] = defaultdict(int)
+
+        # Completed futures are processed in this thread (the manifest and the events)
+        self._completed: queue.Queue[Tuple[_PipelineItem, Future]] = queue.Queue()
+
+        # Emit start event (the total is unknown while the sources are found)
+        self.emit("start")
+
+        results = []
+        errors = []
+        with ThreadPoolExecutor(
+            max_workers=_EXTRACT_WORKERS, thread_name_prefix="PipelineExtract"
+        ) as self._extract_executor, ThreadPoolExecutor(
+            max_workers=_SCRIBE_WORKERS, thread_name_prefix="PipelineScribe"
+        ) as self._scribe_executor:
+            try:
+                while True:
+                    self._schedule()
+                    if not any(self._running.values()):
+                        # Nothing running and nothing could be scheduled
+                        break
+
+                    item, future = self._completed.get()
+                    self._running[item.stage] -= 1
+                    if item.stage == "transform" and self._uses_lane(item):
+                        self._running_lanes[item.lane] -= 1
+                    try:
+                        response = future.result()
+                    except Exception as err:
+                        errors.append(err)
+                        self.emit("write", str(err), is_error=True)
+                        self.emit("update")
+                        self._discard_broken_executor(item, err)
+                        continue
+
+                    if self._complete(item, response):
+                        results.append(response)
+                        self.emit(
+                            "write", f"[scribe] {response[0]}" if response else ""
+                        )
+                        self.emit("update")
+            finally:
+                # Don't start the extractions still waiting (ie: interrupted)
+                self._extract_executor.shutdown(wait=True, cancel_futures=True)
+                self._scribe_executor.shutdown(wait=True, cancel_futures=True)
+
+                # Record the files found up to date
+                if manifest is not None:
+                    manifest.put_pending()
+
+        self.emit("close")
+        return results, errors
+
+    def _schedule(self):
+        """Submit the waiting files (from the last stage) until no stage can take more."""
+        scheduled = True
+        while scheduled:
+            scheduled = False
+
+            while self._backlogs["scribe"] and self._has_room("scribe"):
+                self._submit_scribe(self._backlogs["scribe"].popleft())
+                scheduled = True
+
+            if self._schedule_transforms():
+                scheduled = True
+
+            # Pull new files from the sources (ie: the directory walk) only with room downstream.
+            # The files waiting for a full lane don't count (the next file may be of another lane)
+            while (
+                self._has_room("extract")
+                and self._get_ready_transforms() < self.queue_size
+                and len(self._backlogs["transform"]) < _MAX_WAITING_TRANSFORMS
+                and (self._limit is None or self._started_files < self._limit)
+            ):
+                source_file = next(self._source_files, None)
+                if source_file is None:
+                    break
+
+                self._submit_extract(_PipelineItem(source_file=str(source_file)))
+                scheduled = True
+
+    def _schedule_transforms(self) -> bool:
+        """Submit the waiting files of the lanes with room, in order. True if any was submitted."""
+        scheduled = False
+        skipped: Deque[_PipelineItem] = deque()
+        backlog = self._backlogs["transform"]
+        while (
+            backlog
+            and self._get_ready_transforms() > 0
+            and len(self._backlogs["scribe"]) < self.queue_size
+        ):
+            item = backlog.popleft()
+            if not self._has_lane_room(item.lane):
+                skipped.append(item)
+                continue
+
+            self._waiting_lanes[item.lane] -= 1
+            self._submit_transform(item)
+            scheduled = True
+
+        skipped.extend(backlog)
+        self._backlogs["transform"] = skipped
+        return scheduled
+
+    def _has_room(self, stage: str) -> bool:
+        return self._running[stage] < self.queue_size
+
+    def _has_lane_room(self, lane: str) -> bool:
+        return self._running_lanes[lane] < self.queue_size
+
+    def _get_ready_transforms(self) -> int:
+        """Files waiting for the transform lanes with room."""
+        return sum(
+            waiting
+            for lane, waiting in self._waiting_lanes.items()
+            if self._has_lane_room(lane)
+        )
+
+    def _queue_transform(self, item: _PipelineItem):
+        item.lane = self._get_lane(item).name
+        self._waiting_lanes[item.lane] += 1
+        self._backlogs["transform"].append(item)
+
+    def _submit_extract(self, item: _PipelineItem):
+        item.argument, item.manifest_entry = self.extract_runner.plan_file(
+            item.source_file,
+            source_root_path=self._source_root_path,
+            overwrite=self._overwrite,
+            manifest=self._manifest,
+        )
+        if item.argument is None:
+            # Metadata file up to date (the next stage loads it)
+            self._queue_transform(item)
+            return
+
+        if not self._start_file(item, "extract"):
+            return
+        os.makedirs(item.argument["output_directory_path"], exist_ok=True)
+        self._watch_future(
+            item,
+            self._extract_executor.submit(
+                self.extract_runner.extract_metadata_file, **item.argument
+            ),
+        )
+
+    def _submit_transform(self, item: _PipelineItem):
+        item.argument, item.manifest_entry = self.transform_runner.plan_file(
+            (
+                item.metadata_file.source_path
+                if item.metadata_file is not None
+                else item.source_file
+            ),
+            source_root_path=self._source_root_path,
+            overwrite=self._overwrite,
+            manifest=self._manifest,
+            transcription_cache=self._transcription_cache,
+            metadata_file=item.metadata_file,
+        )
+        if item.argument is None:
+            # Transformation file up to date (the next stage loads it)
+            item.transform_source_path = item.source_file
+            self._backlogs["scribe"].append(item)
+            return
+
+        if not self._start_file(item, "transform"):
+            return
+        os.makedirs(
+            os.path.dirname(item.argument["output_transform_source_path"]),
+            exist_ok=True,
+        )
+
+        # Files with cached transcript are saved inline (no need of workers)
+        self.transform_runner.load_cached_transcript(
+            item.argument, self._transcription_cache
+        )
+        if not self._uses_lane(item):
+            future = run_inline(TransformRunner.transform_file_chunks, item.argument)
+        else:
+            lane = self._get_lane(item)
+            self._running_lanes[lane.name] += 1
+            lane_transform_options = self.transform_runner.get_lane_transform_options()
+            item.argument["transform_options"] = lane_transform_options
+            future = self.transform_runner.get_lane_executor(
+                lane, lane_transform_options
+            ).submit(TransformRunner.transform_file_chunks, item.argument)
+
+        self._watch_future(item, future)
+
+    def _submit_scribe(self, item: _PipelineItem):
+        item.argument, item.manifest_entry = self.scribe_runner.plan_file(
+            item.transform_source_path,
+            source_root_path=self._source_root_path,
+            output_root_path=self._output_root_path,
+            overwrite=self._overwrite,
+            manifest=self._manifest,
+        )
+        if item.argument is None:
+            # Output files up to date (or no transformation file)
+            return
+
+        if not self._start_file(item, "scribe"):
+            return
+        os.makedirs(item.argument["output_scribe_directory_path"], exist_ok=True)
+        item.argument["metadata_file"] = item.metadata_file
+        item.argument["transformation_chunks"] = item.transformation_chunks
+        self._watch_future(
+            item,
+            self._scribe_executor.submit(self.scribe_runner.scribe_file, item.argument),
+        )
+
+    def _start_file(self, item: _PipelineItem, stage: str) -> bool:
+        """Count the file in the limit when it's processed in its first stage (not up to date)."""
+        if not item.started:
+            if self._limit is not None and self._started_files >= self._limit:
+                return False
+            item.started = True
+            self._started_files += 1
+
+        item.stage = stage
+        self._running[stage] += 1
+        return True
+
+    def _watch_future(self, item: _PipelineItem, future: Future):
+        future.add_done_callback(lambda done: self._completed.put((item, done)))
+
+    def _complete(self, item: _PipelineItem, response: Any) -> bool:
+        """Hand over the result of a stage to the next one. True if the file is completed."""
+        if item.stage == "extract":
+            metadata_file: MetadataDataFile = response
+            self._put_manifest_entry(item, [metadata_file.datafile.path])
+            self.emit("write", f"[extract] {metadata_file.datafile.path}")
+
+            item.metadata_file = metadata_file
+            self._queue_transform(item)
+            return False
+
+        if item.stage == "transform":
+            transform_file_path, transformation_chunks = response
+            if not transform_file_path:
+                # No transformer for the extension
+                return False
+            self._put_manifest_entry(item, [transform_file_path])
+            self.emit("write", f"[transform] {transform_file_path}")
+
+            item.transform_source_path = item.argument["output_transform_source_path"]
+            item.transformation_chunks = transformation_chunks
+            self._backlogs["scribe"].append(item)
+            return False
+
+        # Scribed
+        if item.manifest_entry is not None:
+            ScribeRunner.record_output_files(
+                self._manifest, item.manifest_entry, response
+            )
+        return bool(response)
+
+    def _put_manifest_entry(self, item: _PipelineItem, output_paths: List[str]):
+        if item.manifest_entry is not None:
+            item.manifest_entry.output_paths = output_paths
+            self._manifest.put(item.stage, [item.manifest_entry])
+
+    def _get_lane(self, item: _PipelineItem):
+        return self.transform_runner.get_lane_of_file(item.source_file)
+
+    @staticmethod
+    def _uses_lane(item: _PipelineItem) -> bool:
+        """False for the files transformed inline (cached transcript)."""
+        return not item.argument.get("has_cached_transcript")
+
+    def _discard_broken_executor(self, item: _PipelineItem, err: Exception):
+        # Replace the broken pool of the lane for the next files
+        if item.stage == "transform" and isinstance(err, BrokenProcessPool):
+            self.transform_runner.discard_lane_executor(self._get_lane(item))
@@ -1,23 +1,38 @@
 import os
+import re
 from pathlib import Path
 import glob
 import logging
+from itertools import islice
 from typing import Any, Dict, Iterable, List, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+from charmina.libs.build_manifest import (
+    BuildManifest,
+    ManifestEntry,
+    get_config_hash,
+)
 from charmina.libs.event_emitter import EventEmitter
-from charmina.libs.helpers import replace_file_path_root
-from charmina.modules.dataclasses import MetadataDataFile, TransformationDataFile
+from charmina.libs.helpers import replace_file_path_root, submit_bounded
+from charmina.libs.job_cost import JOB_ORDERS, order_jobs
+from charmina.libs.source_index import SourceIndex
+from charmina.libs.work_queue import WorkQueue
+from charmina.modules.dataclasses import (
+    MetadataDataFile,
+    Transformation,
+    TransformationDataFile,
+)
+from charmina.modules.dataclasses.metadata import METADATA_FILE_EXTENSION
 from charmina.modules.dataclasses.transformation import TRANSFORM_FILE_EXTENSION
 from charmina.modules.scribe.scribers import (
     JinjaScriber,
 )
 
 
-_RUN_TASKS_LIMIT = 1_000  # Maximum number of tasks to run in a single call to run()
 _MAX_WORKERS = 1
 # (
 #     4 if os.cpu_count() > 4 else 2
 # )  # Maximum number of workers to run in parallel
+_MAX_PENDING_TASKS = _MAX_WORKERS * 2  # Maximum number of tasks not completed
 
 # Map file extensions to metadata loaders and their arguments
 _SCRIBER_TEMPLATE_MAPPING = {
@@ -26,6 +41,9 @@ _SCRIBER_TEMPLATE_MAPPING = {
     ".pdf": "document_template",
     ".txt": "document_template",
     ".md": "document_template",
+    ".caption": "audio_template",
+    ".srt": "audio_template",
+    ".vtt": "audio_template",
 }
 
 _SCRIBER_OUTPUT_EXTENSION = ".md"
@@ -33,11 +51,17 @@ _SCRIBER_OUTPUT_EXTENSION = ".md"
 
 class ScribeRunner(EventEmitter):
     templates: Dict[str, str] = None
+    order: str = "none"
 
-    def __init__(self, templates: Dict[str, str], **_kwconfig):
+    def __init__(self, templates: Dict[str, str], order: str = "none", **_kwconfig):
         super().__init__()
 
+        if order not in JOB_ORDERS:
+            raise ValueError(
+                f"Invalid scribe order '{order}'. Values: {', '.join(JOB_ORDERS)}"
+            )
         self.templates = templates
+        self.order = order
 
     def run(
         self,
@@ -48,7 +72,10 @@ class ScribeRunner(EventEmitter):
         file_search_pattern: str = None,
         overwrite: bool = False,
         dry_run: bool = False,
-        limit: int = _RUN_TASKS_LIMIT,
+        limit: int = None,
+        manifest: BuildManifest = None,
+        source_index: SourceIndex = None,
+        work_queue: WorkQueue = None,
     ) -> Tuple[List[str], List[any]]:
         logging.debug("Starting scribe runner...")
 
@@ -57,102 +84,97 @@ class ScribeRunner(EventEmitter):
 
         elif not source_files:
             logging.debug("Finding transform files...")
-            transform_files = ScribeRunner.ifind_transform_files(source_directory)
+            transform_files = ScribeRunner.ifind_transform_files(
+                source_directory, source_index
+            )
 
             # Sort reverse files to process the most recent first
             # transform_files = sorted(transform_files, reverse=True)
+        else:
+            transform_files = source_files
+
+        # Plan the files lazily (the first files are scribed while the rest are found)
+        planned_files = self.iplan_files(
+            transform_files,
+            source_root_path=source_root_path,
+            output_root_path=output_root_path,
+            file_search_pattern=file_search_pattern,
+            overwrite=overwrite,
+            manifest=manifest,
+        )
 
-        missing_output_directories = set()
-        scriber_file_arguments = []
-        for transform_file in transform_files:
-            # Filter out files that don't match the search pattern
-            if file_search_pattern and file_search_pattern not in transform_file:
-                continue
-
-            # Load metadata file and check if it exists
-            transformation_datafile = TransformationDataFile(source_path=transform_file)
-            if not transformation_datafile.datafile.exists:
-                logging.warning(f"Transformation file not found: {transform_file}")
-                continue
-
-            # Locate output file and check if it exists
-            output_source_path = replace_file_path_root(
-                file_path=transformation_datafile.source_path,
-                input_root_path=source_root_path,
-                output_root_path=output_root_path,
-            )
-
-            if not overwrite:
-                # Search for files in the parent directory that match the search pattern
-                search_existing_pattern = (
-                    glob.escape(os.path.splitext(output_source_path)[0]) + "_*.md"
-                )
-                # print("search_existing_pattern: ", search_existing_pattern)
-                matching_existing_files = glob.glob(
-                    search_existing_pattern, include_hidden=True
-                )
-
-                # print("matching_existing_files:\n", matching_existing_files)
-
-                if matching_existing_files:
-                    logging.debug(
-                        f"Output scribe files already exists: {output_source_path}*"
-                    )
-                    continue
-
-            scriber_file_arguments.append(
-                {
-                    "input_source_file_path": transformation_datafile.source_path,
-                    "output_scribe_directory_path": os.path.dirname(output_source_path),
-                }
-            )
-
-            # Add missing output directories
-            missing_output_directories.add(
-                scriber_file_arguments[-1]["output_scribe_directory_path"]
-            )
+        # Limit number of tasks to run
+        if limit and limit > 0:
+            planned_files = islice(planned_files, limit)
 
         # Return dry run result
         if dry_run == True:
             return [
                 argument["output_scribe_directory_path"]
-                for argument in scriber_file_arguments
+                for argument, _ in planned_files
             ], []
 
-        # Return if no files to scribe
-        if len(scriber_file_arguments) == 0:
-            logging.debug("No source files to scribe")
-            return [], []
-
-        # Create missing output directories
-        for missing_output_directory in missing_output_directories:
-            os.makedirs(missing_output_directory, exist_ok=True)
+        # Submit the files by estimated cost (size of the transformation file)
+        if self.order != "none":
+            planned_files = order_jobs(
+                list(planned_files),
+                self.order,
+                get_path=lambda planned_file: planned_file[0]["input_source_file_path"]
+                + TRANSFORM_FILE_EXTENSION,
+            )
 
-        # Limit number of tasks to run
-        if not limit or not 0 < limit < _RUN_TASKS_LIMIT:
-            limit = _RUN_TASKS_LIMIT
-        if len(scriber_file_arguments) > limit:
-            logging.warning(
-                f"Number of files to scribe cut to limit {limit} (out of {len(scriber_file_arguments)})"
+        # Claim the files as they're submitted (skip the files leased by other nodes)
+        if work_queue is not None:
+
+            def replan_file(planned_file: Tuple[Dict[str, Any], ManifestEntry | None]):
+                # Processed by another node since it was planned
+                source_path = planned_file[0]["input_source_file_path"]
+                if manifest is not None:
+                    manifest.refresh_entry("scribe", source_path)
+                replanned_file = self.plan_file(
+                    source_path,
+                    source_root_path=source_root_path,
+                    output_root_path=output_root_path,
+                    overwrite=overwrite,
+                    manifest=manifest,
+                )
+                return replanned_file if replanned_file[0] is not None else None
+
+            planned_files = work_queue.iclaim(
+                "scribe",
+                planned_files,
+                get_source_path=lambda planned_file: planned_file[0][
+                    "input_source_file_path"
+                ],
+                replan=replan_file,
             )
-            scriber_file_arguments = scriber_file_arguments[:limit]
 
-        logging.debug(f"Start writing {len(scriber_file_arguments)} files...")
+        logging.debug("Start writing files...")
 
-        # Emit start event (show progress bar in UI)
-        self.emit("start", len(scriber_file_arguments))
+        # Emit start event (show progress bar in UI, the total is unknown while planning lazily)
+        if isinstance(planned_files, list):
+            self.emit("start", len(planned_files))
+        else:
+            self.emit("start")
 
         results = []
         errors = []
         with ThreadPoolExecutor(
             max_workers=_MAX_WORKERS, thread_name_prefix="ScribeRunner"
         ) as executor:
-            response_futures = [
-                executor.submit(self.scribe_file, scribe_file_argument)
-                for scribe_file_argument in scriber_file_arguments
-            ]
 
-            for response_future in as_completed(response_futures):
+            def submit(planned_file: Tuple[Dict[str, Any], ManifestEntry | None]):
+                scribe_file_argument = planned_file[0]
+
+                # Create missing output directory
+                os.makedirs(
+                    scribe_file_argument["output_scribe_directory_path"], exist_ok=True
+                )
+                return executor.submit(self.scribe_file, scribe_file_argument)
+
+            for (argument, manifest_entry), response_future in submit_bounded(
+                submit, planned_files, max_pending=_MAX_PENDING_TASKS
+            ):
                 try:
                     response = response_future.result()
                     if response:
@@ -165,6 +187,12 @@ class ScribeRunner(EventEmitter):
                                 else str(response)
                             ),
                         )
+
+                        # Record the scribed file in the manifest
+                        if manifest_entry is not None:
+                            ScribeRunner.record_output_files(
+                                manifest, manifest_entry, response
+                            )
                     else:
                         self.emit("write", "")
                 except Exception as err:
@@ -172,26 +200,141 @@ class ScribeRunner(EventEmitter):
                     self.emit("write", str(err), is_error=True)
                     continue
                 finally:
+                    if work_queue is not None:
+                        work_queue.release(
+                            "scribe",
+                            argument["input_source_file_path"],
+                            failed=response_future.exception() is not None,
+                        )
                     self.emit("update")
 
+        # Record the files found up to date
+        if manifest is not None:
+            manifest.put_pending()
+
         self.emit("close")
         return results, errors
 
+    def iplan_files(
+        self,
+        transform_files: Iterable[str],
+        source_root_path: str = None,
+        output_root_path: str = None,
+        file_search_pattern: str = None,
+        overwrite: bool = False,
+        manifest: BuildManifest = None,
+    ) -> Iterable[Tuple[Dict[str, Any], ManifestEntry | None]]:
+        """Yield the arguments of scribe_file() and manifest entries of the files to scribe."""
+        for transform_file in transform_files:
+            # Filter out files that don't match the search pattern
+            if file_search_pattern and file_search_pattern not in transform_file:
+                continue
+
+            scriber_file_argument, manifest_entry = self.plan_file(
+                transform_file,
+                source_root_path=source_root_path,
+                output_root_path=output_root_path,
+                overwrite=overwrite,
+                manifest=manifest,
+            )
+            if scriber_file_argument is not None:
+                yield scriber_file_argument, manifest_entry
+
+    def plan_file(
+        self,
+        transform_file: str,
+        source_root_path: str = None,
+        output_root_path: str = None,
+        overwrite: bool = False,
+        manifest: BuildManifest = None,
+    ) -> Tuple[Dict[str, Any] | None, ManifestEntry | None]:
+        """
+        Arguments of scribe_file() for a transformation file and its manifest entry, or None if
+        the output files are up to date (or there is no transformation file).
+        """
+        # Check if the transformation file exists (without loading it)
+        source_path = os.path.abspath(
+            transform_file[: -len(TRANSFORM_FILE_EXTENSION)]
+            if transform_file.endswith(TRANSFORM_FILE_EXTENSION)
+            else transform_file
+        )
+        if not os.path.exists(source_path + TRANSFORM_FILE_EXTENSION):
+            logging.warning(f"Transformation file not found: {transform_file}")
+            return None, None
+
+        # Locate output file and check if it exists
+        output_source_path = replace_file_path_root(
+            file_path=source_path,
+            input_root_path=source_root_path,
+            output_root_path=output_root_path,
+        )
+
+        manifest_entry = None
+        if manifest is not None:
+            manifest_entry = manifest.get_stale_entry(
+                "scribe",
+                source_path=source_path,
+                input_paths=[
+                    source_path + TRANSFORM_FILE_EXTENSION,
+                    source_path + METADATA_FILE_EXTENSION,
+                ],
+                config_hash=self.get_config_hash(source_path),
+                existing_output_paths=(
+                    None
+                    if manifest.has_entry("scribe", source_path)
+                    else ScribeRunner.find_output_files(output_source_path)
+                ),
+                force=overwrite,
+            )
+            if manifest_entry is None:
+                logging.debug(
+                    f"Output scribe files are up to date: {output_source_path}*"
+                )
+                return None, None
+        elif not overwrite:
+            # Search for files in the parent directory that match the search pattern
+            matching_existing_files = ScribeRunner.find_output_files(output_source_path)
+
+            # print("matching_existing_files:\n", matching_existing_files)
+
+            if matching_existing_files:
+                logging.debug(
+                    f"Output scribe files already exists: {output_source_path}*"
+                )
+                return None, None
+
+        return {
+            "input_source_file_path": source_path,
+            "output_scribe_directory_path": os.path.dirname(output_source_path),
+        }, manifest_entry
+
     def scribe_file(self, input_arguments: Dict[str, Any]) -> List[str]:
         input_source_file_path = input_arguments["input_source_file_path"]
         output_scribe_directory_path = input_arguments["output_scribe_directory_path"]
 
-        # Load transform datafile of input file
-        transform_datafile = TransformationDataFile(source_path=input_source_file_path)
-        if not transform_datafile.datafile.exists:
-            raise FileNotFoundError(
-                f"Transformation file not found {input_source_file_path}"
+        # Load transform datafile of input file (unless handed over in memory)
+        if input_arguments.get("transformation_chunks") is not None:
+            transform_datafile = Transformation(
+                chunks=input_arguments["transformation_chunks"]
+            )
+        else:
+            transform_datafile = TransformationDataFile(
+                source_path=input_source_file_path
             )
+            if not transform_datafile.datafile.exists:
+                raise FileNotFoundError(
+                    f"Transformation file not found {input_source_file_path}"
+                )
 
-        # Load metadata datafile of input file
-        metadata_datafile = MetadataDataFile(source_path=input_source_file_path)
-        if not metadata_datafile.datafile.exists:
-            raise FileNotFoundError(f"Metadata file not found {input_source_file_path}")
+        # Load metadata datafile of input file (unless handed over in memory)
+        if input_arguments.get("metadata_file") is not None:
+            metadata_datafile = input_arguments["metadata_file"]
+        else:
+            metadata_datafile = MetadataDataFile(source_path=input_source_file_path)
+            if not metadata_datafile.datafile.exists:
+                raise FileNotFoundError(
+                    f"Metadata file not found {input_source_file_path}"
+                )
 
         # Input source file basename and ext
         input_source_file_basename, input_source_file_ext = os.path.splitext(
@@ -234,8 +377,69 @@ class ScribeRunner(EventEmitter):
 
         return output_scribe_chunk_file_paths
 
+    def get_config_hash(self, source_path: str) -> str:
+        """Hash of the template that scribes the output files of a source file."""
+        scribe_template = _SCRIBER_TEMPLATE_MAPPING.get(
+            os.path.splitext(source_path)[1].lower(), None
+        )
+        return get_config_hash(
+            scribe_template, (self.templates or {}).get(scribe_template, None)
+        )
+
+    @staticmethod
+    def find_output_files(output_source_path: str) -> List[str]:
+        """Output chunk files of a source file (ie: written by a previous run)."""
+        output_base_path = os.path.splitext(output_source_path)[0]
+        search_existing_pattern = (
+            glob.escape(output_base_path) + f"_*{_SCRIBER_OUTPUT_EXTENSION}"
+        )
+
+        # Only the chunks of the source (ie: not `talk_2_1.md` of `talk_2.mp3` for `talk.mp3`)
+        chunk_file_pattern = re.compile(
+            re.escape(os.path.basename(output_base_path))
+            + r"_\d+"
+            + re.escape(_SCRIBER_OUTPUT_EXTENSION)
+        )
+        return [
+            file_path
+            for file_path in glob.glob(search_existing_pattern, include_hidden=True)
+            if chunk_file_pattern.fullmatch(os.path.basename(file_path))
+        ]
+
+    @staticmethod
+    def record_output_files(
+        manifest: BuildManifest,
+        manifest_entry: ManifestEntry,
+        output_file_paths: List[str],
+    ):
+        """
+        Record the output files in the manifest and remove the previous ones not written again.
+        Only the outputs written by a previous scribe run are removed (not the adopted ones, found
+        on disk before the manifest).
+        """
+        output_file_paths = [str(output_path) for output_path in output_file_paths]
+        previous_output_paths = (
+            [] if manifest_entry.adopted else manifest_entry.output_paths
+        )
+        for previous_output_path in previous_output_paths:
+            if previous_output_path not in output_file_paths and os.path.exists(
+                previous_output_path
+            ):
+                os.remove(previous_output_path)
+
+        manifest_entry.output_paths = output_file_paths
+        manifest.put("scribe", [manifest_entry])
+
     @staticmethod
-    def ifind_transform_files(directory_path: str) -> Iterable[str]:
+    def ifind_transform_files(
+        directory_path: str, source_index: SourceIndex = None
+    ) -> Iterable[str]:
+        if source_index is not None:
+            yield from source_index.find_files(
+                directory_path, [TRANSFORM_FILE_EXTENSION]
+            )
+            return
+
         for file_path in glob.iglob(
             os.path.join(directory_path, f"**/*{TRANSFORM_FILE_EXTENSION}"),
             recursive=True,
@@ -0,0 +1,149 @@
+from dataclasses import dataclass, field
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+from charmina.libs.helpers import InlineExecutor
+from charmina.libs.supervised_pool import SupervisedProcessPool
+
+
+# Executors of the lanes
+_LANE_EXECUTORS = [
+    "inline",  # Run the tasks in the runner thread (ie: cheap passthroughs)
+    "thread",  # Run the tasks in a thread pool (ie: I/O bound tasks)
+    "process",  # Run the tasks in a process pool (ie: CPU-heavy transcriptions and conversions)
+]
+
+DEFAULT_LANE_NAME = "default"
+
+
+@dataclass
+class TransformLane:
+    """
+    Execution lane of the files of some extensions, with its own executor, concurrency and memory
+    budget. The lanes of a run are drained independently (ie: text files don't wait for audios).
+
+    Args:
+        name: Name of the lane.
+        extensions: File extensions routed to the lane.
+        executor: Executor of the tasks: inline, thread or process. Default: process.
+        workers: Maximum number of concurrent tasks (threads or processes). Default: 1.
+        worker_memory_mb: Estimated memory of a worker with its models loaded. Default: 0.
+        memory_budget_mb: Maximum memory of the lane workers (caps the workers). Default: 0 (no limit).
+        max_tasks_per_child: Files transformed by a process worker before it's replaced (releases
+            leaked memory). Default: 0 (no limit).
+        task_timeout: Maximum seconds transforming a file. The worker is killed and replaced, and the
+            file is reported as an error. Default: 0 (no limit).
+        memory_limit_mb: Address space limit of a process worker. Allocations above it fail.
+            Default: 0 (no limit).
+    """
+
+    name: str
+    extensions: List[str] = field(default_factory=list)
+    executor: str = "process"
+    workers: int = 1
+    worker_memory_mb: int = 0
+    memory_budget_mb: int = 0
+    max_tasks_per_child: int = 0
+    task_timeout: int = 0
+    memory_limit_mb: int = 0
+
+    def __post_init__(self):
+        if self.executor not in _LANE_EXECUTORS:
+            raise ValueError(
+                f"Invalid executor '{self.executor}' of lane '{self.name}'. Values: {', '.join(_LANE_EXECUTORS)}"
+            )
+
+        self.extensions = [str(ext).lower() for ext in self.extensions or []]
+        self.workers = max(1, int(self.workers or 1))
+        self.worker_memory_mb = max(0, int(self.worker_memory_mb or 0))
+        self.memory_budget_mb = max(0, int(self.memory_budget_mb or 0))
+        self.max_tasks_per_child = max(0, int(self.max_tasks_per_child or 0))
+        self.task_timeout = max(0, int(self.task_timeout or 0))
+        self.memory_limit_mb = max(0, int(self.memory_limit_mb or 0))
+
+    def get_max_workers(self, tasks: int = None) -> int:
+        """Number of workers of the lane, within its memory budget (at least 1)."""
+        workers = self.workers
+        if self.memory_budget_mb and self.worker_memory_mb:
+            workers = min(workers, self.memory_budget_mb // self.worker_memory_mb)
+        if tasks is not None:
+            workers = min(workers, tasks)
+
+        return max(1, workers)
+
+    def create_executor(
+        self,
+        max_workers: int,
+        initializer: Callable = None,
+        initargs: Tuple[Any, ...] = (),
+    ) -> Executor:
+        if self.executor == "inline":
+            return InlineExecutor()
+
+        if self.executor == "thread":
+            return ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix=f"TransformLane-{self.name}",
+                initializer=initializer,
+                initargs=initargs,
+            )
+
+        # Supervise the workers (recycling, timeouts and memory limits) only if needed
+        if self.max_tasks_per_child or self.task_timeout or self.memory_limit_mb:
+            return SupervisedProcessPool(
+                max_workers=max_workers,
+                initializer=initializer,
+                initargs=initargs,
+                task_timeout=self.task_timeout,
+                max_tasks_per_child=self.max_tasks_per_child,
+                memory_limit_mb=self.memory_limit_mb,
+            )
+
+        return ProcessPoolExecutor(
+            max_workers=max_workers, initializer=initializer, initargs=initargs
+        )
+
+
+def get_transform_lanes(
+    lanes_config: Dict[str, Dict[str, Any]] = None, default_workers: int = 1
+) -> List[TransformLane]:
+    """
+    Lanes of the transform config (`lanes` section). Lanes without `workers` use the default
+    workers, and a default process lane takes the files of the extensions without lane.
+    """
+    # Ignore empty values (ie: `workers:` without value)
+    lanes_config = {
+        name: {
+            key: value
+            for key, value in (lane_config or {}).items()
+            if value is not None
+        }
+        for name, lane_config in (lanes_config or {}).items()
+    }
+
+    lanes = [
+        TransformLane(name=name, **{"workers": default_workers, **lane_config})
+        for name, lane_config in lanes_config.items()
+        if name != DEFAULT_LANE_NAME
+    ]
+    lanes.append(
+        TransformLane(
+            name=DEFAULT_LANE_NAME,
+            **{
+                "workers": default_workers,
+                **lanes_config.get(DEFAULT_LANE_NAME, {}),
+                "extensions": [],
+            },
+        )
+    )
+
+    return lanes
+
+
+def get_lane_of_extension(lanes: List[TransformLane], ext: str) -> TransformLane:
+    """Lane of the files of the extension (the default lane if no lane has it)."""
+    ext = ext.lower()
+    for lane in lanes:
+        if ext in lane.extensions:
+            return lane
+
+    return next(lane for lane in lanes if lane.name == DEFAULT_LANE_NAME)
@@ -3,39 +3,138 @@ from pathlib import Path
 import glob
 import logging
 from time import sleep
+from collections import Counter
+from itertools import islice
+from dataclasses import asdict
 from typing import Any, Dict, Iterable, List, Tuple
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+from charmina.libs.build_manifest import (
+    BuildManifest,
+    ManifestEntry,
+    get_config_hash,
+)
 from charmina.libs.event_emitter import EventEmitter
-from charmina.libs.helpers import replace_file_path_root
-from charmina.modules.dataclasses import MetadataDataFile, TransformationDataFile
-from charmina.modules.transform.transformers import (
-    BypassTransformer,
-    PdfTransformer,
-    Mp3Transformer,
+from charmina.libs.helpers import replace_file_path_root, run_inline, submit_bounded
+from charmina.libs.job_cost import JOB_ORDERS, order_jobs
+from charmina.libs.transcription_cache import (
+    TranscriptionCache,
+    get_transcription_settings,
+)
+from charmina.modules.dataclasses import (
+    MetadataDataFile,
+    TransformConfig,
+    TransformationDataFile,
+    TransformationDetails,
+)
+from charmina.modules.dataclasses.transformation import (
+    TRANSFORM_CHECKPOINT_FILE_EXTENSION,
+    TRANSFORM_FILE_EXTENSION,
+    save_transformation_chunks,
+)
+from charmina.libs.lazy_registry import LazyRegistry
+from charmina.libs.source_index import SourceIndex
+from charmina.libs.work_queue import WorkQueue
+from charmina.modules.transform.transform_lanes import (
+    TransformLane,
+    get_lane_of_extension,
+    get_transform_lanes,
 )
 
 
-_RUN_TASKS_LIMIT = 1_000  # Maximum number of tasks to run in a single call to run()
-_MAX_WORKERS = (
-    1  # 4 if os.cpu_count() > 4 else 2  # Maximum number of workers to run in parallel
+_DEFAULT_WORKERS = 1  # Default number of worker processes to run in parallel
+_DEFAULT_ORDER = (
+    "lpt"  # Longest files first, so a long audio doesn't run alone at the end
 )
 
 
-# Map file extensions to metadata loaders and their arguments
-_TRANSFORMER_MAPPING = {
-    ".mp3": (Mp3Transformer, {}),
-    ".mp4": (Mp3Transformer, {}),
-    ".pdf": (PdfTransformer, {}),
-    ".txt": (BypassTransformer, {}),
-    ".md": (BypassTransformer, {}),
-    # Add more mappings for other file extensions and loaders as needed
+_TRANSFORMERS_PACKAGE = "charmina.modules.transform.transformers"
+
+# Map file extensions to transformers and their arguments. Transformers are imported on first use
+# Third-party transformers can be registered with entry points of the group "charmina.transformers"
+_TRANSFORMER_MAPPING = LazyRegistry(
+    {
+        ".mp3": (f"{_TRANSFORMERS_PACKAGE}.mp3_transformer:Mp3Transformer", {}),
+        ".mp4": (f"{_TRANSFORMERS_PACKAGE}.mp3_transformer:Mp3Transformer", {}),
+        ".pdf": (f"{_TRANSFORMERS_PACKAGE}.pdf_transformer:PdfTransformer", {}),
+        ".txt": (f"{_TRANSFORMERS_PACKAGE}.bypass_transformer:BypassTransformer", {}),
+        ".md": (f"{_TRANSFORMERS_PACKAGE}.bypass_transformer:BypassTransformer", {}),
+        ".caption": (
+            f"{_TRANSFORMERS_PACKAGE}.caption_transformer:CaptionTransformer",
+            {},
+        ),
+        ".srt": (f"{_TRANSFORMERS_PACKAGE}.caption_transformer:CaptionTransformer", {}),
+        ".vtt": (f"{_TRANSFORMERS_PACKAGE}.caption_transformer:CaptionTransformer", {}),
+        # Add more mappings for other file extensions and transformers as needed
+    },
+    entry_point_group="charmina.transformers",
+)
+
+# Extensions of the audio files transcribed by the transformers (transcripts are cached)
+_TRANSCRIBED_EXTENSIONS = {".mp3", ".mp4"}
+
+# Options that don't change the transformation files (not part of the manifest config hash)
+_SCHEDULING_OPTIONS = {
+    "cpu_threads",
+    "batch_size",
+    "split_workers",
+    "shard_size",
+    "shard_workers",
+    "window_size",
+}
+# Options of the transcriptions (only part of the config hash of the transcribed extensions)
+_TRANSCRIPTION_OPTIONS = {
+    "model_name",
+    "package",
+    "transcription_mode",
+    "beam_size",
+    "compute_type",
+    "split_window_minutes",
+    "split_overlap_seconds",
 }
 
 
 class TransformRunner(EventEmitter):
-    def __init__(self, **_kwconfig):
+    workers: int = _DEFAULT_WORKERS
+    cpu_threads: int
+    lanes: List[TransformLane]
+    order: str = _DEFAULT_ORDER
+    transform_options: Dict[str, Any] = None
+    persistent_workers: bool = False
+
+    def __init__(
+        self,
+        workers: int = _DEFAULT_WORKERS,
+        cpu_threads: int = 0,
+        lanes: Dict[str, Dict[str, Any]] = None,
+        order: str = _DEFAULT_ORDER,
+        persistent_workers: bool = False,
+        **kwconfig,
+    ):
         super().__init__()
 
+        # Keep the lane pools (and their loaded models) between runs until close()
+        self.persistent_workers = persistent_workers
+        self._lane_executors: Dict[str, Executor] = {}
+
+        if order not in JOB_ORDERS:
+            raise ValueError(
+                f"Invalid transform order '{order}'. Values: {', '.join(JOB_ORDERS)}"
+            )
+        self.order = order
+
+        self.workers = max(1, int(workers or _DEFAULT_WORKERS))
+        self.cpu_threads = int(cpu_threads or os.cpu_count() or 1)
+
+        # Lanes of the file extensions (extensions without lane run in the default lane)
+        self.lanes = get_transform_lanes(lanes, default_workers=self.workers)
+
+        self.transform_options = {
+            **kwconfig,
+            "cpu_threads": self.cpu_threads,
+        }
+
     def run(
         self,
         source_directory: str = ".",
@@ -45,116 +144,430 @@ class TransformRunner(EventEmitter):
         file_search_pattern: str = None,
         overwrite: bool = False,
         dry_run: bool = False,
-        limit: int = _RUN_TASKS_LIMIT,
+        limit: int = None,
+        manifest: BuildManifest = None,
+        source_index: SourceIndex = None,
+        work_queue: WorkQueue = None,
     ) -> Tuple[List[str], List[any]]:
         logging.debug("Starting transform runner...")
 
         if not source_files and not source_directory:
             raise ValueError("No source files or directory provided")
 
-        elif source_directory:
+        elif not source_files:
             logging.debug("Finding meta files...")
-            source_files = TransformRunner.ifind_source_files(source_directory)
+            source_files = TransformRunner.ifind_source_files(
+                source_directory, source_index
+            )
 
             # Sort reverse files to process the most recent first
             # meta_files = sorted(meta_files, reverse=True)
 
-        missing_output_directories = set()
-        transform_file_arguments = []
-        for source_file in source_files:
-            # Filter out files that don't match the search pattern
-            if file_search_pattern and file_search_pattern not in source_file:
-                continue
-
-            # Load metadata file and check if it exists
-            metadata_file = MetadataDataFile(source_path=source_file)
-            if not metadata_file.datafile.exists:
-                logging.warning(f"Metadata file not found: {source_file}")
-
-            # Locate output transformation file and check if it exists
-            output_source_path = replace_file_path_root(
-                file_path=metadata_file.source_path,
-                input_root_path=source_root_path,
-                output_root_path=output_root_path,
-            )
-            transform_file = TransformationDataFile(source_path=output_source_path)
-
-            if not overwrite and transform_file.datafile.exists:
-                logging.debug(
-                    f"Transformation file already exists: {transform_file.datafile.path}"
-                )
-                continue
-
-            transform_file_arguments.append(
-                {
-                    "input_meta_source_path": metadata_file.source_path,
-                    "output_transform_source_path": transform_file.source_path,
-                }
-            )
+        # Plan the files lazily (the first files are transformed while the rest are found)
+        transcription_cache = TranscriptionCache()
+        planned_files = self.iplan_files(
+            source_files,
+            source_root_path=source_root_path,
+            output_root_path=output_root_path,
+            file_search_pattern=file_search_pattern,
+            overwrite=overwrite,
+            manifest=manifest,
+            transcription_cache=transcription_cache,
+        )
 
-            # Add missing output directories
-            missing_output_directories.add(os.path.dirname(transform_file.source_path))
+        # Limit number of tasks to run
+        if limit and limit > 0:
+            planned_files = islice(planned_files, limit)
 
         # Return dry run result
         if dry_run == True:
             return [
                 argument["output_transform_source_path"]
-                for argument in transform_file_arguments
+                for argument, _ in planned_files
             ], []
 
-        # Return if no files to transform
-        if len(transform_file_arguments) == 0:
-            logging.debug("No source files to transform")
-            return [], []
-
-        # Create missing output directories
-        for missing_output_directory in missing_output_directories:
-            os.makedirs(missing_output_directory, exist_ok=True)
+        # Submit the files by estimated cost (audio duration, PDF pages, text size)
+        # All the files are planned first, so the lane workers are sized for their files
+        lanes_tasks = None
+        if self.order != "none":
+            planned_files = order_jobs(
+                list(planned_files),
+                self.order,
+                get_path=lambda planned_file: planned_file[0]["input_meta_source_path"],
+            )
+            lanes_tasks = Counter(
+                self.get_lane_of_file(argument["input_meta_source_path"]).name
+                for argument, _ in planned_files
+                if not argument.get("has_cached_transcript")
+            )
 
-        # Limit number of tasks to run
-        if not limit or not 0 < limit < _RUN_TASKS_LIMIT:
-            limit = _RUN_TASKS_LIMIT
-        if len(transform_file_arguments) > limit:
-            logging.warning(
-                f"Number of files to transform cut to limit {limit} (out of {len(transform_file_arguments)})"
+        # Claim the files as they're submitted (skip the files leased by other nodes)
+        if work_queue is not None:
+
+            def replan_file(planned_file: Tuple[Dict[str, Any], ManifestEntry | None]):
+                # Processed by another node since it was planned
+                source_path = planned_file[0]["input_meta_source_path"]
+                if manifest is not None:
+                    manifest.refresh_entry("transform", source_path)
+                replanned_file = self.plan_file(
+                    source_path,
+                    source_root_path=source_root_path,
+                    output_root_path=output_root_path,
+                    overwrite=overwrite,
+                    manifest=manifest,
+                    transcription_cache=transcription_cache,
+                )
+                return replanned_file if replanned_file[0] is not None else None
+
+            planned_files = work_queue.iclaim(
+                "transform",
+                planned_files,
+                get_source_path=lambda planned_file: planned_file[0][
+                    "input_meta_source_path"
+                ],
+                replan=replan_file,
             )
-            transform_file_arguments = transform_file_arguments[:limit]
 
-        logging.debug(f"Start transforming {len(transform_file_arguments)} files...")
+        logging.debug("Start transforming files...")
+
+        # Emit start event (show progress bar in UI, the total is unknown while planning lazily)
+        if isinstance(planned_files, list):
+            self.emit("start", len(planned_files))
+        else:
+            self.emit("start")
 
-        # Emit start event (show progress bar in UI)
-        self.emit("start", len(transform_file_arguments))
+        # Split the cores between the workers of the process lanes (avoid oversubscribing the CPU)
+        # Persistent pools are sized for any run (the models are loaded with the same options)
+        lane_transform_options = self.get_lane_transform_options(
+            None if self.persistent_workers else lanes_tasks
+        )
 
         results = []
         errors = []
-        with ProcessPoolExecutor(max_workers=_MAX_WORKERS) as executor:
-            response_futures = [
-                executor.submit(TransformRunner.transform_file, transform_argument)
-                for transform_argument in transform_file_arguments
-            ]
+        with ExitStack() as executors_stack:
+            lane_executors: Dict[str, Executor] = {}
+
+            def get_executor(lane: TransformLane) -> Executor:
+                if self.persistent_workers:
+                    return self.get_lane_executor(lane, lane_transform_options)
+
+                # Start the pool of a lane with its first file
+                if lane.name not in lane_executors:
+                    lane_executors[lane.name] = executors_stack.enter_context(
+                        lane.create_executor(
+                            max_workers=lane.get_max_workers(
+                                None if lanes_tasks is None else lanes_tasks[lane.name]
+                            ),
+                            initializer=TransformRunner.init_worker,
+                            initargs=(lane_transform_options, lane.extensions),
+                        )
+                    )
+
+                return lane_executors[lane.name]
+
+            def submit(planned_file: Tuple[Dict[str, Any], ManifestEntry | None]):
+                argument = planned_file[0]
+
+                # Create missing output directory
+                os.makedirs(
+                    os.path.dirname(argument["output_transform_source_path"]),
+                    exist_ok=True,
+                )
 
-            for response_future in as_completed(response_futures):
+                # Files with cached transcript are saved inline (no need of workers)
+                if self.load_cached_transcript(argument, transcription_cache):
+                    return run_inline(TransformRunner.transform_file, argument)
+
+                argument["transform_options"] = lane_transform_options
+                return get_executor(
+                    self.get_lane_of_file(argument["input_meta_source_path"])
+                ).submit(TransformRunner.transform_file, argument)
+
+            # Lanes are drained independently (cheap files don't wait for heavy ones)
+            for (argument, manifest_entry), response_future in submit_bounded(
+                submit,
+                planned_files,
+                max_pending=max(lane.get_max_workers() for lane in self.lanes) * 2,
+                get_group=lambda planned_file: (
+                    None
+                    if planned_file[0].get("has_cached_transcript")
+                    else self.get_lane_of_file(
+                        planned_file[0]["input_meta_source_path"]
+                    ).name
+                ),
+            ):
                 try:
                     response = response_future.result()
                     if response:
                         results.append(response)
                         self.emit("write", str(response))
+
+                        # Record the transformed file in the manifest
+                        if manifest_entry is not None:
+                            manifest_entry.output_paths = [response]
+                            manifest.put("transform", [manifest_entry])
                     else:
                         self.emit("write", "")
                 except Exception as err:
                     errors.append(err)
                     self.emit("write", str(err), is_error=True)
+
+                    # Replace the broken pool of the lane for the next files
+                    if isinstance(err, BrokenProcessPool):
+                        lane = self.get_lane_of_file(argument["input_meta_source_path"])
+                        if self.persistent_workers:
+                            self.discard_lane_executor(lane)
+                        else:
+                            lane_executors.pop(lane.name, None)
                     continue
                 finally:
+                    if work_queue is not None:
+                        work_queue.release(
+                            "transform",
+                            argument["input_meta_source_path"],
+                            failed=response_future.exception() is not None,
+                        )
                     self.emit("update")
 
+        # Record the files found up to date
+        if manifest is not None:
+            manifest.put_pending()
+
         self.emit("close")
         return results, errors
 
+    def iplan_files(
+        self,
+        source_files: Iterable[str],
+        source_root_path: str = None,
+        output_root_path: str = None,
+        file_search_pattern: str = None,
+        overwrite: bool = False,
+        manifest: BuildManifest = None,
+        transcription_cache: TranscriptionCache = None,
+    ) -> Iterable[Tuple[Dict[str, Any], ManifestEntry | None]]:
+        """Yield the arguments of transform_file() and manifest entries of the files to transform."""
+        for source_file in source_files:
+            # Filter out files that don't match the search pattern
+            if file_search_pattern and file_search_pattern not in source_file:
+                continue
+
+            transform_file_argument, manifest_entry = self.plan_file(
+                source_file,
+                source_root_path=source_root_path,
+                output_root_path=output_root_path,
+                overwrite=overwrite,
+                manifest=manifest,
+                transcription_cache=transcription_cache,
+            )
+            if transform_file_argument is not None:
+                yield transform_file_argument, manifest_entry
+
+    def get_lane_of_file(self, file_path: str) -> TransformLane:
+        return get_lane_of_extension(self.lanes, os.path.splitext(file_path)[1])
+
+    def get_lane_transform_options(
+        self, lanes_tasks: Dict[str, int] = None
+    ) -> Dict[str, Any]:
+        """
+        Transform options of the lane workers, with the cores split between the workers of the
+        process lanes (avoid oversubscribing the CPU). Without the tasks of the lanes, all the
+        lanes run their full workers.
+        """
+        process_workers = sum(
+            (
+                lane.get_max_workers()
+                if lanes_tasks is None
+                else lane.get_max_workers(lanes_tasks[lane.name])
+            )
+            for lane in self.lanes
+            if lane.executor == "process"
+            and (lanes_tasks is None or lane.name in lanes_tasks)
+        )
+        return {
+            **self.transform_options,
+            "cpu_threads": max(1, self.cpu_threads // max(1, process_workers)),
+        }
+
+    def get_lane_executor(
+        self, lane: TransformLane, transform_options: Dict[str, Any]
+    ) -> Executor:
+        """Persistent executor of a lane, created on first use with the lane's full workers."""
+        if lane.name not in self._lane_executors:
+            # Preload the models of the lane extensions (the default lane loads them on demand)
+            self._lane_executors[lane.name] = lane.create_executor(
+                max_workers=lane.get_max_workers(),
+                initializer=TransformRunner.init_worker,
+                initargs=(transform_options, lane.extensions),
+            )
+
+        return self._lane_executors[lane.name]
+
+    def discard_lane_executor(self, lane: TransformLane):
+        executor = self._lane_executors.pop(lane.name, None)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self, cancel: bool = False):
+        """Shut down the persistent executors of the lanes (cancel: stop the running tasks)."""
+        for executor in self._lane_executors.values():
+            if cancel:
+                executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                executor.shutdown(wait=True)
+        self._lane_executors = {}
+
+    def plan_file(
+        self,
+        source_file: str,
+        source_root_path: str = None,
+        output_root_path: str = None,
+        overwrite: bool = False,
+        manifest: BuildManifest = None,
+        transcription_cache: TranscriptionCache = None,
+        metadata_file: MetadataDataFile = None,
+    ) -> Tuple[Dict[str, Any] | None, ManifestEntry | None]:
+        """
+        Arguments of transform_file() for a source file and its manifest entry, or None if the
+        transformation file is up to date. A metadata file in memory (ie: just extracted) is
+        handed over to the worker instead of loading it again.
+        """
+        # Load metadata file and check if it exists
+        metadata_in_memory = metadata_file is not None
+        if not metadata_in_memory:
+            metadata_file = MetadataDataFile(source_path=source_file)
+            if not metadata_file.datafile.exists:
+                logging.warning(f"Metadata file not found: {source_file}")
+
+        # Locate output transformation file and check if it exists
+        output_source_path = replace_file_path_root(
+            file_path=metadata_file.source_path,
+            input_root_path=source_root_path,
+            output_root_path=output_root_path,
+        )
+        # Check if the transformation file exists (without loading it)
+        transform_file_path = f"{output_source_path}{TRANSFORM_FILE_EXTENSION}"
+
+        manifest_entry = None
+        if manifest is not None:
+            manifest_entry = manifest.get_stale_entry(
+                "transform",
+                source_path=metadata_file.source_path,
+                input_paths=[metadata_file.source_path],
+                config_hash=self.get_config_hash(
+                    os.path.splitext(metadata_file.source_path)[1], metadata_file
+                ),
+                existing_output_paths=(
+                    [transform_file_path]
+                    if os.path.exists(transform_file_path)
+                    else None
+                ),
+                force=overwrite,
+            )
+            if manifest_entry is None:
+                logging.debug(
+                    f"Transformation file is up to date: {transform_file_path}"
+                )
+                return None, None
+        elif not overwrite and os.path.exists(transform_file_path):
+            logging.debug(f"Transformation file already exists: {transform_file_path}")
+            return None, None
+
+        transform_file_argument = {
+            "input_meta_source_path": metadata_file.source_path,
+            "output_transform_source_path": output_source_path,
+            "transform_options": self.transform_options,
+        }
+        if metadata_in_memory:
+            transform_file_argument["transform_config"] = asdict(
+                metadata_file.transform_config or TransformConfig()
+            )
+
+        # Reuse the cached transcript of the same audio (skip the transcription). Only flagged in
+        # the plan, the transcript is read when the file is submitted (see load_cached_transcript)
+        if (
+            transcription_cache is not None
+            and os.path.splitext(metadata_file.source_path)[1]
+            in _TRANSCRIBED_EXTENSIONS
+            and transcription_cache.get_source_transcript_path(
+                metadata_file.source_path,
+                get_transcription_settings(**self.transform_options),
+            )
+        ):
+            transform_file_argument["has_cached_transcript"] = True
+
+        return transform_file_argument, manifest_entry
+
+    def load_cached_transcript(
+        self, argument: Dict[str, Any], transcription_cache: TranscriptionCache
+    ) -> bool:
+        """
+        Read the cached transcript of a planned file into its argument. False if the file has no
+        cached transcript (or it was evicted since planned, so the file is transcribed).
+        """
+        if not argument.get("has_cached_transcript"):
+            return False
+
+        cached_transcript = transcription_cache.get_source_transcript(
+            argument["input_meta_source_path"],
+            get_transcription_settings(**self.transform_options),
+        )
+        if cached_transcript is None:
+            argument["has_cached_transcript"] = False
+            return False
+
+        argument["cached_transcript"] = cached_transcript
+        return True
+
+    def get_config_hash(self, ext: str, metadata_file: MetadataDataFile) -> str:
+        """Hash of the config that changes the transformation file of a source file."""
+        if ext in _TRANSCRIBED_EXTENSIONS:
+            output_options = get_transcription_settings(**self.transform_options)
+        else:
+            output_options = {
+                key: value
+                for key, value in self.transform_options.items()
+                if key not in _SCHEDULING_OPTIONS and key not in _TRANSCRIPTION_OPTIONS
+            }
+
+        return get_config_hash(ext, output_options, metadata_file.transform_config)
+
+    @staticmethod
+    def init_worker(transform_options: Dict[str, Any], extensions: Iterable[str]):
+        """Worker initializer. Load the models of the transformers once per worker process."""
+        # Import only the transformers of the extensions (heavy dependencies)
+        transformer_classes = {
+            _TRANSFORMER_MAPPING[ext][0]
+            for ext in extensions
+            if ext in _TRANSFORMER_MAPPING
+        }
+        for transformer_class in transformer_classes:
+            if not hasattr(transformer_class, "preload"):
+                continue
+
+            try:
+                transformer_class.preload(**transform_options)
+            except Exception as e:
+                # Don't break the pool, the error is raised again when transforming the file
+                logging.warning(
+                    f"Error preloading models of {transformer_class.__name__}: {e}"
+                )
+
     @staticmethod
     def transform_file(input_arguments: Dict[str, Any]) -> str:
+        return TransformRunner.transform_file_chunks(input_arguments)[0]
+
+    @staticmethod
+    def transform_file_chunks(
+        input_arguments: Dict[str, Any],
+    ) -> Tuple[str, List[str] | None]:
+        """
+        Transform a file and save its transformation file. Return the path of the file and its
+        chunks (None if they were streamed to the file, ie: large text files).
+        """
         input_meta_source_path = input_arguments["input_meta_source_path"]
         output_transform_source_path = input_arguments["output_transform_source_path"]
+        transform_options = input_arguments.get("transform_options", None) or {}
 
         input_meta_source_abs_path = str(Path(input_meta_source_path).resolve())
         if not os.path.exists(input_meta_source_abs_path):
@@ -163,30 +576,54 @@ class TransformRunner(EventEmitter):
         output_transform_source_abs_path = str(
             Path(output_transform_source_path).resolve()
         )
+        checkpoint_path = (
+            f"{output_transform_source_abs_path}{TRANSFORM_CHECKPOINT_FILE_EXTENSION}"
+        )
 
         # Run transformer based on the file extension
         ext = "." + input_meta_source_path.rsplit(".", 1)[-1]
         if ext in _TRANSFORMER_MAPPING:
-            # Load metadata of input file
-            try:
-                metadata_file = MetadataDataFile(source_path=input_meta_source_abs_path)
-            except Exception as e:
-                raise Exception(
-                    f"Error loading metadata for '{input_meta_source_path}'"
-                ) from e
-
-            # Transform input file
-            try:
-                transformer_class, transformer_args = _TRANSFORMER_MAPPING[ext]
-                transformer = transformer_class(
-                    file_path=input_meta_source_abs_path,
-                    transform_config=metadata_file.transform_config,
-                    **transformer_args,
+            # Load metadata of input file (unless handed over in memory)
+            if "transform_config" in input_arguments:
+                transform_config = TransformConfig(
+                    **(input_arguments["transform_config"] or {})
                 )
-                transformer_output: str = transformer.transform()
+            else:
+                try:
+                    metadata_file = MetadataDataFile(
+                        source_path=input_meta_source_abs_path
+                    )
+                    transform_config = metadata_file.transform_config
+                except Exception as e:
+                    raise Exception(
+                        f"Error loading metadata for '{input_meta_source_path}'"
+                    ) from e
+
+            # Transform input file (or reuse the cached transcript of the same audio)
+            transformer_details: Dict[str, str] = {}
+            try:
+                if "cached_transcript" in input_arguments:
+                    transformer_output: str = input_arguments["cached_transcript"]
+                else:
+                    transformer_class, transformer_args = _TRANSFORMER_MAPPING[ext]
+                    transformer = transformer_class(
+                        file_path=input_meta_source_abs_path,
+                        transform_config=transform_config,
+                        checkpoint_path=checkpoint_path,
+                        **{**transform_options, **transformer_args},
+                    )
+
+                    # Stream the chunks of the transformers that yield them (ie: large text files)
+                    if hasattr(transformer, "itransform"):
+                        transformer_output: Iterable[str] = transformer.itransform()
+                    else:
+                        transformer_output: str = transformer.transform()
+                        transformer_details = (
+                            getattr(transformer, "details", None) or {}
+                        )
 
-                # Unblock system resources
-                sleep(0.2)
+                    # Unblock system resources
+                    sleep(0.2)
             except Exception as e:
                 raise Exception(
                     f"Error transforming file '{input_meta_source_path}'"
@@ -194,23 +631,47 @@ class TransformRunner(EventEmitter):
 
             # Create transformation output file
             try:
-                transformation = TransformationDataFile(
-                    source_path=output_transform_source_abs_path,
-                    chunks=[
-                        transformer_output
-                    ],  # Issue: value is not set when underlying file exists
-                )
-                transformation.datafile.save()
-
-                return transformation.datafile.path
+                if isinstance(transformer_output, str):
+                    transformation = TransformationDataFile(
+                        source_path=output_transform_source_abs_path,
+                        chunks=[
+                            transformer_output
+                        ],  # Issue: value is not set when underlying file exists
+                        details=TransformationDetails(**transformer_details),
+                    )
+                    transformation.datafile.save()
+                    transformation_path = transformation.datafile.path
+                    transformation_chunks = [transformer_output]
+                else:
+                    transformation_path = save_transformation_chunks(
+                        source_path=output_transform_source_abs_path,
+                        chunks=transformer_output,
+                    )
+                    transformation_chunks = None
+
+                # Remove partial output of the transformation (if any)
+                if os.path.exists(checkpoint_path):
+                    os.remove(checkpoint_path)
+
+                return transformation_path, transformation_chunks
             except Exception as e:
                 raise Exception(
                     f"Error creating transformation file for '{input_meta_source_path}'"
                 ) from e
 
+        return None, None
+
     @staticmethod
-    def ifind_source_files(directory_path: str) -> Iterable[str]:
-        for ext, _ in _TRANSFORMER_MAPPING.items():
+    def ifind_source_files(
+        directory_path: str, source_index: SourceIndex = None
+    ) -> Iterable[str]:
+        if source_index is not None:
+            yield from source_index.find_files(
+                directory_path, _TRANSFORMER_MAPPING.extensions()
+            )
+            return
+
+        for ext in _TRANSFORMER_MAPPING.extensions():
             for file_path in glob.iglob(
                 os.path.join(directory_path, f"**/*{ext}"), recursive=True
             ):
@@ -1,5 +1,24 @@
-__all__ = ["BypassTransformer", "Mp3Transformer", "PdfTransformer"]
+__all__ = [
+    "BypassTransformer",
+    "CaptionTransformer",
+    "Mp3Transformer",
+    "PdfTransformer",
+]
 
-from charmina.modules.transform.transformers.bypass_transformer import BypassTransformer
-from charmina.modules.transform.transformers.mp3_transformer import Mp3Transformer
-from charmina.modules.transform.transformers.pdf_transformer import PdfTransformer
+import importlib
+
+# Transformers are imported on first use (Mp3Transformer and PdfTransformer import torch,
+# faster_whisper and marker, which take seconds to load)
+_TRANSFORMER_MODULES = {
+    "BypassTransformer": "charmina.modules.transform.transformers.bypass_transformer",
+    "CaptionTransformer": "charmina.modules.transform.transformers.caption_transformer",
+    "Mp3Transformer": "charmina.modules.transform.transformers.mp3_transformer",
+    "PdfTransformer": "charmina.modules.transform.transformers.pdf_transformer",
+}
+
+
+def __getattr__(name: str):
+    if name in _TRANSFORMER_MODULES:
+        return getattr(importlib.import_module(_TRANSFORMER_MODULES[name]), name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
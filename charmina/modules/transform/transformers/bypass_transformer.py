@@ -1,26 +1,108 @@
 import os
+import io
+import mmap
+import codecs
+from typing import Iterator
+from charmina.modules.dataclasses import TransformConfig
+
+
+_DEFAULT_CHUNK_SIZE = 1_000_000  # Maximum characters per chunk
+_READ_SIZE = 1024**2  # Bytes decoded at a time
+_ENCODING_SAMPLE_SIZE = 64 * 1024  # Bytes sampled to detect the encoding
+
+# Byte order marks (utf-32 before utf-16, they share the prefix)
+_BOM_ENCODINGS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
 
 
 class BypassTransformer:
     """ByPass transformer. Return the text content of the file.
 
+    The file is read through a memory map and decoded incrementally, in chunks of at most
+    `text_chunk_size` characters (cut at line breaks), so large files are never loaded at once.
+
     Args:
         file_path: Path to the file to load.
+        text_chunk_size: Maximum characters per chunk. Default: 1.000.000.
     """
 
     file_path: str
+    chunk_size: int
 
     def __init__(
         self,
         file_path: str,
+        transform_config: TransformConfig = None,
+        text_chunk_size: int = None,
+        **_kwconfig,
     ):
         """Initialize with file path."""
         self.file_path = file_path
+        self.chunk_size = int(text_chunk_size or _DEFAULT_CHUNK_SIZE)
 
     def transform(self) -> str:
         """Transform source file path."""
+        return "".join(self.itransform())
+
+    def itransform(self) -> Iterator[str]:
+        """Transform source file path. Yield the chunks of text."""
         if not os.path.exists(self.file_path):
             raise ValueError(f"Input file path does not exist: {self.file_path}")
 
-        with open(self.file_path, "r", encoding="utf-8") as file:
-            return file.read()
+        with open(self.file_path, "rb") as file:
+            file_size = os.fstat(file.fileno()).st_size
+            if not file_size:
+                return
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                encoding = BypassTransformer.detect_encoding(
+                    mapped_file[:_ENCODING_SAMPLE_SIZE]
+                )
+
+                # Decode with universal newlines, as files opened in text mode
+                decoder = io.IncrementalNewlineDecoder(
+                    codecs.getincrementaldecoder(encoding)(errors="replace"),
+                    translate=True,
+                )
+
+                buffer = ""
+                for offset in range(0, file_size, _READ_SIZE):
+                    buffer += decoder.decode(mapped_file[offset : offset + _READ_SIZE])
+
+                    while len(buffer) >= self.chunk_size:
+                        # Cut at the last line break of the chunk (if any)
+                        cut = (
+                            buffer.rfind("\n", 0, self.chunk_size) + 1
+                            or self.chunk_size
+                        )
+                        yield buffer[:cut]
+                        buffer = buffer[cut:]
+
+                buffer += decoder.decode(b"", final=True)
+                if buffer:
+                    yield buffer
+
+    @staticmethod
+    def detect_encoding(sample: bytes) -> str:
+        """Detect the encoding of a text from a sample: BOM, utf-8, or cp1252 / latin-1."""
+        for bom, encoding in _BOM_ENCODINGS:
+            if sample.startswith(bom):
+                return encoding
+
+        try:
+            # The sample may end in the middle of a multibyte character
+            codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+            return "utf-8"
+        except UnicodeDecodeError:
+            pass
+
+        try:
+            sample.decode("cp1252")
+            return "cp1252"
+        except UnicodeDecodeError:
+            return "latin-1"
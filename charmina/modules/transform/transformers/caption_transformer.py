@@ -0,0 +1,71 @@
+import os
+import re
+import html
+from typing import Iterable, Iterator
+from charmina.modules.dataclasses import TransformConfig
+
+
+_CUE_TIMING_SEPARATOR = "-->"
+_TAG_REGEX = re.compile(r"<[^>]*>|\{\\[^}]*\}")  # html/vtt tags and ssa overrides
+
+
+class CaptionTransformer:
+    """Caption transformer. Return the text of the timed cues of a caption file (SRT / WebVTT),
+    as downloaded from YouTube (.caption) or any other source (.srt, .vtt).
+
+    Args:
+        file_path: Path to the file to load.
+    """
+
+    file_path: str
+
+    def __init__(
+        self,
+        file_path: str,
+        transform_config: TransformConfig = None,
+        **_kwconfig,
+    ):
+        """Initialize with file path."""
+        self.file_path = file_path
+
+    def transform(self) -> str:
+        """Transform source file path."""
+        if not os.path.exists(self.file_path):
+            raise ValueError(f"Input file path does not exist: {self.file_path}")
+
+        with open(self.file_path, "r", encoding="utf-8-sig", errors="replace") as file:
+            return " ".join(self.iparse_cue_lines(file)).strip(" \n")
+
+    @staticmethod
+    def iparse_cue_lines(lines: Iterable[str]) -> Iterator[str]:
+        """
+        Yield the text lines of the cues in a single linear pass. Blocks without timing (headers,
+        notes, styles) are skipped, as well as the lines repeated by consecutive cues
+        (ie: YouTube rolling captions).
+        """
+        last_line = ""
+        block_has_timing = False
+        for line in lines:
+            line = line.strip()
+
+            # Blank line ends the current block
+            if not line:
+                block_has_timing = False
+                continue
+
+            # Lines before the timing are cue numbers (srt) or identifiers (vtt)
+            if not block_has_timing:
+                block_has_timing = _CUE_TIMING_SEPARATOR in line
+                continue
+
+            line = html.unescape(_TAG_REGEX.sub("", line)).strip()
+            if not line or line == last_line:
+                continue
+
+            # Rolling captions repeat the previous line as prefix of the new one
+            if last_line and line.startswith(last_line):
+                yield line[len(last_line) :].strip()
+            else:
+                yield line
+
+            last_line = line
@@ -1,10 +1,30 @@
 # Description: Mp3 transformer.
 
-from faster_whisper import WhisperModel
+import os
+import logging
+import multiprocessing
+from multiprocessing import util as mp_util
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+import numpy as np
 import torch
-from typing import ClassVar, Tuple
+from typing import Any, ClassVar, Dict, List, Tuple
 from charmina.config import Config
+from charmina.libs.audio_cache import AudioCache
+from charmina.libs.audio_splitter import (
+    find_split_points,
+    get_audio_windows,
+    merge_window_segments,
+)
 from charmina.libs.helpers import check_for_package, TimeTaken
+from charmina.libs.model_cache import ModelCache
+from charmina.libs.transcription_cache import (
+    TranscriptionCache,
+    get_transcription_settings,
+)
+from charmina.libs.transcription_checkpoint import TranscriptionCheckpoint
 from charmina.modules.dataclasses import TransformConfig
 
 try:
@@ -13,6 +33,30 @@ except ImportError:
     pass
 
 
+_WHISPER_MODEL_CACHE_SIZE = 1  # Maximum number of whisper models loaded per process
+_WHISPER_MODEL_CACHE = ModelCache(max_size=_WHISPER_MODEL_CACHE_SIZE)
+
+# Pool of window workers of the process (split mode), kept between audios
+_WINDOW_POOL: ProcessPoolExecutor | None = None
+_WINDOW_POOL_KEY: Tuple[Any, ...] | None = None
+
+_SAMPLING_RATE = 16000  # Sampling rate of the decoded audio used by whisper models
+
+_DEFAULT_CPU_THREADS = 4
+_DEFAULT_NUM_WORKERS = 1
+_DEFAULT_BATCH_SIZE = 16
+_DEFAULT_SPLIT_WINDOW_MINUTES = 10
+_DEFAULT_SPLIT_OVERLAP_SECONDS = 2
+_DEFAULT_SPLIT_WORKERS = 2
+
+# Transcription modes of faster-whisper package
+_TRANSCRIPTION_MODES = [
+    "sequential",  # Transcribe the audio segments one after another
+    "batched",  # Transcribe VAD-split segments of the audio in batches
+    "split",  # Cut long audio at silences and transcribe the windows in parallel processes
+]
+
+
 class Mp3Transformer:
     """Mp3 transformer.
 
@@ -24,6 +68,16 @@ class Mp3Transformer:
     file_path: str
     model_name: str
     package: str
+    cpu_threads: int
+    transcription_mode: str
+    batch_size: int
+    split_window_minutes: float
+    split_overlap_seconds: float
+    split_workers: int
+    beam_size: int
+    num_workers: int
+    checkpoint_path: str
+    compute_type_option: str
     device: ClassVar[str] = None
     compute_type: ClassVar[str] = None
 
@@ -33,6 +87,17 @@ class Mp3Transformer:
         transform_config: TransformConfig = TransformConfig(),
         model_name: str = None,
         package: str = None,
+        cpu_threads: int = None,
+        transcription_mode: str = None,
+        batch_size: int = None,
+        split_window_minutes: float = None,
+        split_overlap_seconds: float = None,
+        split_workers: int = None,
+        compute_type: str = None,
+        beam_size: int = None,
+        num_workers: int = None,
+        checkpoint_path: str = None,
+        **_kwconfig,
     ):
         """Initialize with file path."""
         self.file_path = file_path
@@ -40,6 +105,21 @@ class Mp3Transformer:
             model_name or Config.instance().WHISPER_TRANSCRIPTION_MODEL_NAME
         )
         self.package = package or Config.instance().WHISPER_PACKAGE_NAME
+        self.cpu_threads = cpu_threads or _DEFAULT_CPU_THREADS
+        self.transcription_mode = transcription_mode or _TRANSCRIPTION_MODES[0]
+        self.batch_size = int(batch_size or _DEFAULT_BATCH_SIZE)
+        self.split_window_minutes = float(
+            split_window_minutes or _DEFAULT_SPLIT_WINDOW_MINUTES
+        )
+        self.split_overlap_seconds = float(
+            split_overlap_seconds
+            if split_overlap_seconds is not None
+            else _DEFAULT_SPLIT_OVERLAP_SECONDS
+        )
+        self.split_workers = int(split_workers or _DEFAULT_SPLIT_WORKERS)
+        self.beam_size = int(beam_size) if beam_size else None
+        self.num_workers = int(num_workers or _DEFAULT_NUM_WORKERS)
+        self.checkpoint_path = checkpoint_path
 
         if not self.model_name:
             raise ValueError("No transcription model name provided")
@@ -47,15 +127,25 @@ class Mp3Transformer:
         if not self.package:
             raise ValueError("No transcription package name provided")
 
+        if self.transcription_mode not in _TRANSCRIPTION_MODES:
+            raise ValueError(
+                f"Invalid transcription mode '{self.transcription_mode}'. Values: {', '.join(_TRANSCRIPTION_MODES)}"
+            )
+
         if self.package == "whisper-mps" and not check_for_package("whisper_mps"):
             raise ImportError(
                 "Whisper-MPS package not found. Please install it manually (poetry run pip install whisper-mps)"
             )
 
-        # check for device and compute type if not provided
+        # check for device and compute type if not provided (see `charmina bench whisper`)
         if not self.device:
             self.device, self.compute_type = self.check_device()
 
+        # Only the one set explicitly is part of the transcription settings (same on every worker)
+        self.compute_type_option = compute_type
+        if compute_type:
+            self.compute_type = compute_type
+
         # print(f"Using {self.device} device for transcription")
         # print(f"Using {self.package} package for transcription")
         # print(f"Using {self.compute_type} compute type for transcription")
@@ -91,30 +181,307 @@ class Mp3Transformer:
         #     transcript = str(result.get("text", "")).strip(" \n")
 
         else:
-            # use faster-whisper package
-            model = WhisperModel(
-                self.model_name,
-                device=self.device if self.device in ["cuda:0", "cpu"] else "auto",
-                compute_type=self.compute_type,
-                cpu_threads=4,
-                num_workers=1,
-            )
+            # use faster-whisper package (reuse the transcript of the same audio, if cached)
+            with TimeTaken("Transcribe audio"):
+                transcript = self.transcribe_cached()
 
-            segments, info = model.transcribe(
-                self.file_path,
-                beam_size=1 if self.model_name.startswith("distil-") else 5,
-                language="en",
-                without_timestamps=True,
-                # num_workers=1,
-                condition_on_previous_text=False,
+        return transcript
+
+    def transcribe_cached(self) -> str:
+        """
+        Transcribe the decoded audio, reusing the cached transcript of the same audio and
+        transcription settings (ie: same episode downloaded twice).
+        """
+        transcription_cache = TranscriptionCache()
+        source_hash = transcription_cache.get_source_hash(self.file_path)
+        audio = self.load_audio(content_hash=source_hash)
+
+        transcription_settings = self.get_transcription_settings()
+        audio_hash = None
+        if transcription_cache.enabled:
+            audio_hash = TranscriptionCache.get_audio_hash(audio)
+            transcription_cache.put_source_audio_hash(source_hash, audio_hash)
+
+            transcript = transcription_cache.get_transcript(
+                audio_hash, transcription_settings
             )
+            if transcript is not None:
+                logging.debug(f"Reuse cached transcript of '{self.file_path}'")
+                return transcript
 
-            with TimeTaken("Transcribe audio"):
-                segments_str = "".join([segment.text for segment in segments])
-                transcript = segments_str.strip(" \n")
+        if self.transcription_mode == "split":
+            # use faster-whisper package in parallel processes (one per window of the audio)
+            transcript = self.transcribe_split(audio)
+        else:
+            # use faster-whisper package (reuse warm model of the worker process)
+            transcript = self.transcribe_checkpointed(audio)
+
+        if audio_hash:
+            transcription_cache.put_transcript(
+                audio_hash, transcription_settings, transcript
+            )
 
         return transcript
 
+    def transcribe_checkpointed(self, audio: np.ndarray) -> str:
+        """
+        Transcribe the audio streaming the completed segments to the checkpoint file.
+        If the checkpoint file exists, resume the transcription from its last completed timestamp.
+        """
+        model = self.load_model()
+        beam_size = self.get_beam_size()
+
+        with TranscriptionCheckpoint(
+            path=self.checkpoint_path, settings=self.get_checkpoint_settings()
+        ) as checkpoint:
+            resume_timestamp = checkpoint.last_timestamp
+            if resume_timestamp:
+                logging.info(
+                    f"Resuming transcription of '{self.file_path}' from {resume_timestamp:.2f} seconds"
+                )
+
+            offset = 0.0
+            if self.transcription_mode == "batched":
+                # Batched pipeline has no clip timestamps. Transcribe the remaining audio instead
+                if resume_timestamp:
+                    audio = audio[int(resume_timestamp * _SAMPLING_RATE) :]
+                    offset = resume_timestamp
+
+                # Run the VAD-split segments of the audio through the model in batches
+                segments, info = BatchedInferencePipeline(model=model).transcribe(
+                    audio,
+                    batch_size=self.batch_size,
+                    beam_size=beam_size,
+                    language="en",
+                    without_timestamps=True,
+                )
+            else:
+                segments, info = model.transcribe(
+                    audio,
+                    beam_size=beam_size,
+                    language="en",
+                    without_timestamps=True,
+                    # num_workers=1,
+                    condition_on_previous_text=False,
+                    clip_timestamps=[resume_timestamp] if resume_timestamp else "0",
+                )
+
+            for segment in segments:
+                checkpoint.append(
+                    offset + segment.start, offset + segment.end, segment.text
+                )
+
+            return checkpoint.text.strip(" \n")
+
+    def transcribe_split(self, audio: np.ndarray) -> str:
+        """Cut the audio at silences in windows and transcribe them in parallel processes."""
+        split_points = find_split_points(
+            speech_timestamps=get_speech_timestamps(audio, VadOptions()),
+            total_samples=len(audio),
+            window_samples=int(self.split_window_minutes * 60 * _SAMPLING_RATE),
+        )
+        windows = get_audio_windows(
+            split_points=split_points,
+            total_samples=len(audio),
+            overlap_samples=int(self.split_overlap_seconds * _SAMPLING_RATE),
+        )
+
+        # A single window is transcribed in this process (no window workers to start)
+        if len(windows) == 1:
+            return self.transcribe_checkpointed(audio)
+
+        # Split the cores of the transform worker between the window workers
+        model_settings = {
+            **self.get_model_settings(),
+            "cpu_threads": max(1, self.cpu_threads // self.split_workers),
+        }
+
+        executor = Mp3Transformer.get_window_pool(self.split_workers, model_settings)
+        try:
+            windows_segments = list(
+                executor.map(
+                    Mp3Transformer.transcribe_window,
+                    [
+                        {
+                            "model_settings": model_settings,
+                            "beam_size": self.get_beam_size(),
+                            # Pass the path of the cached audio (memory-mapped by the workers)
+                            **(
+                                {"audio_path": audio.filename}
+                                if isinstance(audio, np.memmap)
+                                else {"audio": audio[window.start : window.end]}
+                            ),
+                            "start": window.start,
+                            "end": window.end,
+                        }
+                        for window in windows
+                    ],
+                )
+            )
+        except BrokenProcessPool:
+            # Start a new pool for the next audio
+            Mp3Transformer.discard_window_pool()
+            raise
+
+        return merge_window_segments(
+            windows=windows,
+            windows_segments=windows_segments,
+            sampling_rate=_SAMPLING_RATE,
+        )
+
+    @staticmethod
+    def get_window_pool(
+        split_workers: int, model_settings: Dict[str, Any]
+    ) -> ProcessPoolExecutor:
+        """
+        Pool of window workers of the process, kept between audios so the window workers reuse
+        their loaded models. A pool with other settings is shut down first.
+        """
+        global _WINDOW_POOL, _WINDOW_POOL_KEY
+
+        window_pool_key = (split_workers, tuple(sorted(model_settings.items())))
+        if _WINDOW_POOL is not None and _WINDOW_POOL_KEY != window_pool_key:
+            Mp3Transformer.discard_window_pool()
+
+        if _WINDOW_POOL is None:
+            _WINDOW_POOL = ProcessPoolExecutor(
+                max_workers=split_workers,
+                initializer=Mp3Transformer.init_window_worker,
+                initargs=(model_settings,),
+            )
+            _WINDOW_POOL_KEY = window_pool_key
+
+            # Stop its workers when the process exits (ie: transform worker recycled), otherwise
+            # the exit waits for them forever (multiprocessing children don't run atexit handlers)
+            mp_util.Finalize(
+                None,
+                Mp3Transformer.discard_window_pool,
+                kwargs={"exiting": True},
+                exitpriority=10,
+            )
+
+        return _WINDOW_POOL
+
+    @staticmethod
+    def discard_window_pool(exiting: bool = False):
+        global _WINDOW_POOL, _WINDOW_POOL_KEY
+
+        if _WINDOW_POOL is not None:
+            _WINDOW_POOL.shutdown(wait=False, cancel_futures=True)
+
+            # The pool can't be shut down cleanly while the process exits (its queues are closed),
+            # terminate its idle workers (the only children of a transform worker)
+            if exiting:
+                for process in multiprocessing.active_children():
+                    process.terminate()
+        _WINDOW_POOL = None
+        _WINDOW_POOL_KEY = None
+
+    @staticmethod
+    def init_window_worker(model_settings: Dict[str, Any]):
+        """Window worker initializer. Load the whisper model once per worker process."""
+        Mp3Transformer.get_whisper_model(**model_settings)
+
+    @staticmethod
+    def transcribe_window(
+        window_arguments: Dict[str, Any],
+    ) -> List[Tuple[float, float, str]]:
+        """Transcribe a window of audio. Return the segments with absolute timestamps."""
+        audio: np.ndarray = window_arguments.get("audio", None)
+        if audio is None:
+            audio = np.load(window_arguments["audio_path"], mmap_mode="r")
+            audio = audio[window_arguments["start"] : window_arguments["end"]]
+        offset = window_arguments["start"] / _SAMPLING_RATE
+
+        model = Mp3Transformer.get_whisper_model(**window_arguments["model_settings"])
+        segments, _ = model.transcribe(
+            audio,
+            beam_size=window_arguments["beam_size"],
+            language="en",
+            without_timestamps=False,
+            condition_on_previous_text=False,
+        )
+
+        return [
+            (offset + segment.start, offset + segment.end, segment.text)
+            for segment in segments
+        ]
+
+    @classmethod
+    def preload(cls, **kwconfig):
+        """Load the whisper model in the process-wide cache (ie: in the worker initializer)."""
+        transformer = cls(file_path=None, **kwconfig)
+
+        # In split mode, the model is loaded by the window workers (or on the first audio with a
+        # single window)
+        if (
+            transformer.package == "faster-whisper"
+            and transformer.transcription_mode != "split"
+        ):
+            transformer.load_model()
+
+    def load_model(self) -> WhisperModel:
+        """Get the faster-whisper model of the transformer settings."""
+        return self.get_whisper_model(**self.get_model_settings())
+
+    def load_audio(self, content_hash: str = None) -> np.ndarray:
+        """Get the decoded audio from the cache (decode it only the first time)."""
+        return AudioCache().load_audio(
+            self.file_path, sampling_rate=_SAMPLING_RATE, content_hash=content_hash
+        )
+
+    def get_model_settings(self) -> Dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "device": self.device if self.device in ["cuda:0", "cpu"] else "auto",
+            "compute_type": self.compute_type,
+            "cpu_threads": self.cpu_threads,
+            "num_workers": self.num_workers,
+        }
+
+    def get_transcription_settings(self) -> Dict[str, Any]:
+        """Settings that change the transcript of an audio."""
+        return get_transcription_settings(
+            model_name=self.model_name,
+            package=self.package,
+            transcription_mode=self.transcription_mode,
+            beam_size=self.beam_size,
+            compute_type=self.compute_type_option,
+        )
+
+    def get_checkpoint_settings(self) -> Dict[str, Any]:
+        """Settings that invalidate the checkpoint of a transcription when changed."""
+        return {
+            "file_size": os.path.getsize(self.file_path),
+            **self.get_transcription_settings(),
+        }
+
+    def get_beam_size(self) -> int:
+        if self.beam_size:
+            return self.beam_size
+
+        return 1 if self.model_name.startswith("distil-") else 5
+
+    @staticmethod
+    def get_whisper_model(
+        model_name: str,
+        device: str,
+        compute_type: str,
+        cpu_threads: int,
+        num_workers: int = _DEFAULT_NUM_WORKERS,
+    ) -> WhisperModel:
+        """Get a loaded whisper model from the process-wide cache."""
+        return _WHISPER_MODEL_CACHE.get(
+            (model_name, device, compute_type, cpu_threads, num_workers),
+            lambda: WhisperModel(
+                model_name,
+                device=device,
+                compute_type=compute_type,
+                cpu_threads=cpu_threads,
+                num_workers=num_workers,
+            ),
+        )
+
     @staticmethod
     def check_device() -> Tuple[str, str]:
         """Check CUDA availability."""
@@ -1,34 +1,112 @@
 import os
+import gc
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib.metadata import PackageNotFoundError, version
+from multiprocessing import util as mp_util
+from typing import Any, Dict, List, Tuple
 from marker.converters.pdf import PdfConverter
 from marker.models import create_model_dict
 from marker.output import text_from_rendered
 from marker.config.parser import ConfigParser
+import torch
 
+from charmina.libs.model_cache import ModelCache
+from charmina.libs.pdf_page_cache import PdfPageCache
+from charmina.libs.pdf_pages import (
+    format_page_range,
+    get_page_count,
+    iget_page_hashes,
+    iget_page_texts,
+    is_usable_text_layer,
+    parse_page_range,
+    split_paginated_markdown,
+    text_to_markdown,
+)
 from charmina.modules.dataclasses import TransformConfig
 
 
+# marker models and converters (with their processors) loaded per process
+_ARTIFACT_CACHE = ModelCache(max_size=1)
+_CONVERTER_CACHE = ModelCache(max_size=1)
+
+# Pool of shard workers of the process (kept between PDFs, see `get_shard_pool`)
+_SHARD_POOL: ProcessPoolExecutor | None = None
+_SHARD_POOL_KEY: Tuple[Any, ...] | None = None
+
+_DEFAULT_CPU_THREADS = 4
+_DEFAULT_SHARD_WORKERS = 2
+_DEFAULT_WINDOW_SIZE = 100
+
+
 class PdfTransformer:
     """Default transformer.
 
+    Pages with a usable text layer (born-digital PDFs) are converted directly from it. Only the
+    scanned or low-quality pages are converted with marker (layout and OCR models).
+
+    Large documents can be split in shards of `shard_size` pages (page ranges), converted in
+    parallel processes and merged in page order. The shard workers are kept between PDFs, so the
+    marker models are loaded once per shard worker.
+
+    Marker converts `window_size` pages at a time, freeing the page images and document structures
+    between windows, so the memory used doesn't grow with the number of pages.
+
+    The markdown of the pages converted by marker is cached by page content and converter settings,
+    so a rerun only converts the missing or changed pages.
+
     Args:
         file_path: Path to the file to load.
+        text_layer: Use the text layer of the pages when usable. Default: True.
+        cpu_threads: Torch threads (split between the shard workers).
+        shard_size: Pages per shard converted in parallel. Default: 0 (disabled).
+        shard_workers: Number of processes converting the shards in parallel. Default: 2.
+        window_size: Pages converted by marker at a time. Default: 100 (0: all pages at once).
     """
 
     file_path: str
+    page_range: str
+    text_layer: bool
+    cpu_threads: int
+    shard_size: int
+    shard_workers: int
+    window_size: int
     config_parser: ConfigParser
+    page_cache: PdfPageCache
+    page_hashes: Dict[int, str]
+    details: Dict[str, str]
 
     def __init__(
         self,
         file_path: str,
         transform_config: TransformConfig = TransformConfig(),
+        text_layer: bool = True,
+        cpu_threads: int = None,
+        shard_size: int = None,
+        shard_workers: int = None,
+        window_size: int = None,
+        **_kwconfig,
     ):
         """Initialize with file path."""
         self.file_path = file_path
+        transform_config = transform_config or TransformConfig()
+        self.page_range = transform_config.page_range
+        self.text_layer = text_layer
+        self.cpu_threads = int(cpu_threads or _DEFAULT_CPU_THREADS)
+        self.shard_size = int(shard_size or 0)
+        self.shard_workers = int(shard_workers or _DEFAULT_SHARD_WORKERS)
+        self.window_size = int(
+            window_size if window_size is not None else _DEFAULT_WINDOW_SIZE
+        )
+        self.page_cache = PdfPageCache()
+        self.page_hashes = {}
+        self.details = {}
 
         self.config_parser = ConfigParser(
             {
                 "langugages": "en",
-                "page_range": transform_config.page_range,
                 "output_format": "markdown",  # [markdown|json|html]
                 "output_dir": None,
                 # "max_pages": self.max_pages,
@@ -42,7 +120,7 @@ class PdfTransformer:
                 "use_llm": False,
                 # "llm_service": "marker.services.gemini.GoogleGeminiService",
                 "disable_links": False,
-                "paginate_output": False,
+                "paginate_output": True,  # Split the output by page (see split_paginated_markdown)
                 # "page_separator": "------------------",
             }
         )
@@ -52,15 +130,257 @@ class PdfTransformer:
         if not os.path.exists(self.file_path):
             raise ValueError(f"Input file path does not exist: {self.file_path}")
 
-        converter = PdfConverter(
-            config=self.config_parser.generate_config_dict(),
-            artifact_dict=create_model_dict(),
-            processor_list=self.config_parser.get_processors(),
-            renderer=self.config_parser.get_renderer(),
-            # llm_service=self.config_parser.get_llm_service()
+        pages = parse_page_range(self.page_range, get_page_count(self.file_path))
+
+        # Fast path: pages with a usable text layer
+        pages_markdown: Dict[int, str] = {}
+        if self.text_layer:
+            for page_index, text in iget_page_texts(self.file_path, pages):
+                if is_usable_text_layer(text):
+                    pages_markdown[page_index] = text_to_markdown(text)
+        text_layer_pages = list(pages_markdown.keys())
+
+        # Scanned or low-quality pages (reuse the pages converted in previous runs)
+        cached_pages_markdown = self.get_cached_pages(
+            [page for page in pages if page not in pages_markdown]
+        )
+        pages_markdown.update(cached_pages_markdown)
+
+        marker_pages = [page for page in pages if page not in pages_markdown]
+        if self.use_shards(marker_pages):
+            pages_markdown.update(self.convert_shards(marker_pages))
+        elif marker_pages:
+            pages_markdown.update(self.convert_pages(marker_pages))
+
+        # Record the conversion path of the pages in the transformation file
+        self.details = {
+            "text_layer_pages": format_page_range(text_layer_pages),
+            "marker_pages": format_page_range(marker_pages),
+            "cached_pages": format_page_range(cached_pages_markdown.keys()),
+        }
+
+        return "\n\n".join(
+            pages_markdown[page] for page in pages if pages_markdown.get(page)
         )
+
+    def use_shards(self, pages: List[int]) -> bool:
+        return bool(
+            self.shard_size and self.shard_workers > 1 and len(pages) > self.shard_size
+        )
+
+    def convert_pages(self, pages: List[int]) -> Dict[int, str]:
+        """
+        Convert the pages with marker in windows of `window_size` pages. Return the markdown of
+        each page.
+        """
+        window_size = self.window_size or len(pages) or 1
+
+        pages_markdown: Dict[int, str] = {}
+        for index in range(0, len(pages), window_size):
+            pages_markdown.update(
+                self.convert_window(pages[index : index + window_size])
+            )
+
+            # Release the page images and document of the window before the next one
+            if window_size < len(pages):
+                PdfTransformer.free_memory()
+
+        return pages_markdown
+
+    def convert_window(self, pages: List[int]) -> Dict[int, str]:
+        """Convert the pages with marker in a single call. Return the markdown of each page."""
+        converter = self.get_converter(page_range=pages)
         rendered = converter(self.file_path)
         output_text, _, images = text_from_rendered(rendered)
         # output_metadata = rendered.metadata or {}
 
-        return output_text
+        # Cache the pages as soon as they are converted (kept if a later window fails)
+        pages_markdown = split_paginated_markdown(output_text)
+        self.put_cached_pages(pages_markdown)
+
+        return pages_markdown
+
+    def get_cached_pages(self, pages: List[int]) -> Dict[int, str]:
+        """Get the markdown of the pages converted with the same settings in previous runs."""
+        if not self.page_cache.enabled or not pages:
+            return {}
+
+        return self.page_cache.get_pages(
+            self.get_page_hashes(pages), self.get_page_cache_settings()
+        )
+
+    def put_cached_pages(self, pages_markdown: Dict[int, str]):
+        if not self.page_cache.enabled or not pages_markdown:
+            return
+
+        self.page_cache.put_pages(
+            self.get_page_hashes(list(pages_markdown.keys())),
+            self.get_page_cache_settings(),
+            pages_markdown,
+        )
+
+    def get_page_hashes(self, pages: List[int]) -> Dict[int, str]:
+        """Hashes of the content of the pages (computed once per page)."""
+        missing_pages = [page for page in pages if page not in self.page_hashes]
+        if missing_pages:
+            self.page_hashes.update(iget_page_hashes(self.file_path, missing_pages))
+
+        return {page: self.page_hashes[page] for page in pages}
+
+    def get_page_cache_settings(self) -> Dict[str, Any]:
+        """Settings that change the markdown of a converted page."""
+        try:
+            marker_version = version("marker-pdf")
+        except PackageNotFoundError:
+            marker_version = None
+
+        return {
+            "config": self.config_parser.generate_config_dict(),
+            "marker_version": marker_version,
+        }
+
+    def convert_shards(self, pages: List[int]) -> Dict[int, str]:
+        """Split the pages in page ranges of `shard_size` and convert them in parallel processes."""
+        shard_page_ranges = [
+            format_page_range(pages[index : index + self.shard_size])
+            for index in range(0, len(pages), self.shard_size)
+        ]
+
+        # Split the cores of the transform worker between the shard workers
+        shard_cpu_threads = max(1, self.cpu_threads // self.shard_workers)
+
+        executor = PdfTransformer.get_shard_pool(self.shard_workers, shard_cpu_threads)
+        pages_markdown: Dict[int, str] = {}
+        try:
+            for shard_pages_markdown in executor.map(
+                PdfTransformer.convert_shard,
+                [self.file_path] * len(shard_page_ranges),
+                shard_page_ranges,
+                [self.window_size] * len(shard_page_ranges),
+            ):
+                pages_markdown.update(shard_pages_markdown)
+        except BrokenProcessPool:
+            # Start a new pool for the next PDF
+            PdfTransformer.discard_shard_pool()
+            raise
+
+        return pages_markdown
+
+    @staticmethod
+    def get_shard_pool(shard_workers: int, cpu_threads: int) -> ProcessPoolExecutor:
+        """
+        Pool of shard workers of the process, kept between PDFs so the shard workers reuse their
+        loaded models. A pool with other settings is shut down first.
+        """
+        global _SHARD_POOL, _SHARD_POOL_KEY
+
+        shard_pool_key = (shard_workers, cpu_threads)
+        if _SHARD_POOL is not None and _SHARD_POOL_KEY != shard_pool_key:
+            PdfTransformer.discard_shard_pool()
+
+        if _SHARD_POOL is None:
+            _SHARD_POOL = ProcessPoolExecutor(
+                max_workers=shard_workers,
+                initializer=PdfTransformer.init_shard_worker,
+                initargs=(cpu_threads,),
+            )
+            _SHARD_POOL_KEY = shard_pool_key
+
+            # Stop its workers when the process exits (ie: transform worker recycled), otherwise
+            # the exit waits for them forever (multiprocessing children don't run atexit handlers)
+            mp_util.Finalize(
+                None,
+                PdfTransformer.discard_shard_pool,
+                kwargs={"exiting": True},
+                exitpriority=10,
+            )
+
+        return _SHARD_POOL
+
+    @staticmethod
+    def discard_shard_pool(exiting: bool = False):
+        global _SHARD_POOL, _SHARD_POOL_KEY
+
+        if _SHARD_POOL is not None:
+            _SHARD_POOL.shutdown(wait=False, cancel_futures=True)
+
+            # The pool can't be shut down cleanly while the process exits (its queues are closed),
+            # terminate its idle workers (the only children of a transform worker)
+            if exiting:
+                for process in multiprocessing.active_children():
+                    process.terminate()
+        _SHARD_POOL = None
+        _SHARD_POOL_KEY = None
+
+    @staticmethod
+    def init_shard_worker(cpu_threads: int):
+        """Shard worker initializer. Load the marker models once per worker process."""
+        PdfTransformer.preload(cpu_threads=cpu_threads)
+
+    @staticmethod
+    def convert_shard(
+        file_path: str, page_range: str, window_size: int = None
+    ) -> Dict[int, str]:
+        """Convert the pages of a page range with marker. Return the markdown of each page."""
+        transformer = PdfTransformer(
+            file_path=file_path,
+            transform_config=TransformConfig(page_range=page_range),
+            text_layer=False,
+            window_size=window_size,
+        )
+
+        return transformer.convert_pages(
+            parse_page_range(transformer.page_range, get_page_count(file_path))
+        )
+
+    @classmethod
+    def preload(cls, cpu_threads: int = None, **_kwconfig):
+        """Load the marker models and converter in the process-wide cache (ie: in the worker initializer)."""
+        if cpu_threads:
+            torch.set_num_threads(cpu_threads)
+
+        # With shards, the models are loaded by the shard workers (and on demand for small PDFs)
+        transformer = cls(file_path=None, cpu_threads=cpu_threads, **_kwconfig)
+        if transformer.shard_size and transformer.shard_workers > 1:
+            return
+
+        transformer.get_converter()
+
+    def get_converter(self, page_range: List[int] = None) -> PdfConverter:
+        """
+        Get the marker converter of the transformer settings from the process-wide cache, so the
+        processors and renderer are built once per worker and reused by every PDF.
+        """
+        config = self.config_parser.generate_config_dict()
+
+        converter: PdfConverter = _CONVERTER_CACHE.get(
+            json.dumps(config, sort_keys=True, default=str),
+            lambda: PdfConverter(
+                config=config,
+                artifact_dict=self.get_artifact_dict(),
+                processor_list=self.config_parser.get_processors(),
+                renderer=self.config_parser.get_renderer(),
+                # llm_service=self.config_parser.get_llm_service()
+            ),
+        )
+
+        # Page range is read from the converter config by the document provider on every call
+        if page_range:
+            converter.config["page_range"] = page_range
+        else:
+            converter.config.pop("page_range", None)
+
+        return converter
+
+    @staticmethod
+    def free_memory():
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        elif hasattr(torch.backends, "mps") and torch.backends.mps.is_available():
+            torch.mps.empty_cache()
+
+    @staticmethod
+    def get_artifact_dict() -> dict:
+        """Get the marker models (layout, OCR, table recognition, etc) from the process-wide cache."""
+        return _ARTIFACT_CACHE.get("marker", create_model_dict)